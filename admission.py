@@ -0,0 +1,299 @@
+# admission.py
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Set
+
+from cluster import SharedSlots
+from scheduler import InstanceScheduler, StreamTicket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADMISSION_CONFIG = {
+    "enabled": True,
+    "default_max_concurrent": 4,   # Streams per instance unless it sets "max_concurrent"
+    "max_queue_per_model": 16,     # Waiting requests per model
+    "max_queue": 64,               # Waiting requests in total
+    "queue_timeout": 60,           # Seconds a request may wait for a slot
+    "retry_after": 5               # Seconds suggested to rejected clients
+}
+
+
+class QueueFull(Exception):
+    """The request was rejected because the wait queue is full."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """The request waited queue_timeout seconds without getting a slot."""
+
+
+class Admission:
+    """A request's claim on a stream slot: granted at once or waiting in the queue."""
+
+    def __init__(self, controller: 'AdmissionController', model: str, candidates: List[Dict], warm: Set[str]):
+        self.controller = controller
+        self.model = model
+        self.candidates = candidates
+        self.warm = warm
+        self.enqueued = time.perf_counter()
+        self.ticket: Optional[StreamTicket] = None
+        self.done = False  # Granted, withdrawn or cancelled
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def granted(self) -> bool:
+        return self.ticket is not None
+
+    def _grant(self, ticket: StreamTicket):
+        # Caller holds the controller lock
+        self.ticket = ticket
+        self.done = True
+        self._event.set()
+        for callback in self._callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Call 'callback' (from any thread) once the slot is granted."""
+        with self.controller._lock:
+            if not self.granted:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def position(self) -> int:
+        """1-based place in this model's queue; 0 once granted."""
+        return self.controller.position(self)
+
+    def wait(self, timeout: float) -> bool:
+        if not self.granted:
+            self.controller.dispatch()
+        return self._event.wait(timeout)
+
+    def _deadline_passed(self) -> bool:
+        if time.perf_counter() - self.enqueued < self.controller.queue_timeout:
+            return False
+        # Withdrawing can lose a race with a grant, in which case we keep the slot
+        return self.controller.withdraw(self, 'timed_out')
+
+    def updates(self, interval: float = 1.0):
+        """Yield the queue position whenever it changes until a slot is granted (sync callers)."""
+        last = None
+        while not self.granted:
+            position = self.position()
+            if position and position != last:
+                last = position
+                yield position
+            if self._deadline_passed():
+                raise QueueTimeout(f"No capacity for {self.model} within {self.controller.queue_timeout}s")
+            self.wait(interval)
+
+    async def aupdates(self, interval: float = 1.0):
+        """Yield the queue position whenever it changes until a slot is granted (asyncio callers)."""
+        loop = asyncio.get_event_loop()
+        granted = loop.create_future()
+
+        def wake():
+            if not granted.done():
+                granted.set_result(True)
+        self.add_callback(lambda: loop.call_soon_threadsafe(wake))
+
+        last = None
+        while not self.granted:
+            position = self.position()
+            if position and position != last:
+                last = position
+                yield position
+            if self._deadline_passed():
+                raise QueueTimeout(f"No capacity for {self.model} within {self.controller.queue_timeout}s")
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), interval)
+            except asyncio.TimeoutError:
+                self.controller.dispatch()
+
+    def cancel(self):
+        """Leave the queue, or give the slot back if it was granted."""
+        if not self.controller.withdraw(self, 'cancelled') and self.ticket:
+            self.ticket.release()
+
+
+class AdmissionController:
+    """Caps concurrent streams per instance and queues the overflow.
+
+    Waiting requests sit in a bounded FIFO queue per model. When a stream
+    ends, the freed slot goes to the head of a model queue that can use that
+    instance, rotating between models so a busy model cannot starve the
+    others. Requests beyond the queue bounds are rejected at once.
+
+    With 'slots' (cluster.SharedSlots), every stream also takes a slot
+    counted across all worker processes, so together they stay within each
+    instance's limit. Slots freed by another worker are picked up when
+    waiting requests poll dispatch().
+    """
+
+    def __init__(self, scheduler: InstanceScheduler, settings: Optional[Dict] = None,
+                 available: Optional[Callable[[str], bool]] = None, slots: Optional[SharedSlots] = None):
+        settings = {**DEFAULT_ADMISSION_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        self.default_max_concurrent = settings['default_max_concurrent']
+        self.max_queue_per_model = settings['max_queue_per_model']
+        self.max_queue = settings['max_queue']
+        self.queue_timeout = settings['queue_timeout']
+        self.retry_after = settings['retry_after']
+        self.slots = slots if self.enabled else None
+        self.scheduler = scheduler
+        self.available = available or (lambda url: True)
+        self._lock = threading.Lock()
+        # Model queues in rotation order; a served model moves to the back
+        self._queues: 'OrderedDict[str, deque[Admission]]' = OrderedDict()
+        self._waiting = 0
+        self.counts = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0, 'cancelled': 0}
+        self.max_wait = 0.0
+        scheduler.add_release_listener(self._released)
+
+    def limit(self, instance: Dict) -> Optional[int]:
+        """The instance's stream slots."""
+        if not self.enabled:
+            return None
+        return instance.get('max_concurrent', self.default_max_concurrent)
+
+    def _reserve(self, instance: Dict) -> bool:
+        return self.slots.take(instance['url'], self.limit(instance))
+
+    def _acquire(self, admission: Admission) -> Optional[StreamTicket]:
+        candidates = [instance for instance in admission.candidates if self.available(instance['url'])]
+        return self.scheduler.acquire(candidates, admission.warm, self.limit, self._reserve if self.slots else None)
+
+    def _released(self, url: str):
+        if self.slots:
+            self.slots.release(url)
+        self.dispatch()
+
+    def _reject_reason(self, model: str) -> Optional[str]:
+        # Caller holds self._lock
+        if self._waiting >= self.max_queue:
+            return "Server is busy, all queues are full"
+        if len(self._queues.get(model, ())) >= self.max_queue_per_model:
+            return f"Server is busy, the queue for {model} is full"
+        return None
+
+    def check(self, model: str, candidates: List[Dict]):
+        """Raise QueueFull if a request for 'model' would be rejected right now."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self._queues.get(model) and self.scheduler.has_capacity(candidates, self.limit):
+                return
+            reason = self._reject_reason(model)
+        if reason:
+            raise QueueFull(reason, self.retry_after)
+
+    def enqueue(self, model: str, candidates: List[Dict], warm: Optional[Set[str]] = None) -> Admission:
+        """Take a slot now, or a place in the queue. Raises QueueFull when the queue is full."""
+        if not candidates:
+            raise Exception("No healthy Ollama instance available")
+        admission = Admission(self, model, candidates, warm or set())
+        with self._lock:
+            # Requests already waiting for this model go first
+            ticket = None if self._queues.get(model) else self._acquire(admission)
+            if ticket:
+                self.counts['admitted'] += 1
+                admission._grant(ticket)
+                return admission
+            if not self.enabled:
+                raise Exception("No healthy Ollama instance available")
+            reason = self._reject_reason(model)
+            if reason:
+                self.counts['rejected'] += 1
+                raise QueueFull(reason, self.retry_after)
+            self._queues.setdefault(model, deque()).append(admission)
+            self._waiting += 1
+            self.counts['queued'] += 1
+        logger.debug(f"Queued request for {model} at position {admission.position()}")
+        return admission
+
+    def try_acquire(self, model: str, candidates: List[Dict], warm: Optional[Set[str]] = None) -> Optional[Admission]:
+        """Take a free slot now or return None; never queues.
+
+        Used for optional extra streams (hedges) that must not take capacity
+        from requests waiting for this model.
+        """
+        if not candidates:
+            return None
+        admission = Admission(self, model, candidates, warm or set())
+        with self._lock:
+            if self._queues.get(model):
+                return None
+            ticket = self._acquire(admission)
+            if ticket is None:
+                return None
+            self.counts['admitted'] += 1
+            admission._grant(ticket)
+        return admission
+
+    def dispatch(self):
+        """Hand free slots to waiting requests."""
+        with self._lock:
+            progress = True
+            while progress and self._waiting:
+                progress = False
+                for model in list(self._queues):
+                    queue = self._queues[model]
+                    ticket = self._acquire(queue[0])
+                    if ticket is None:
+                        continue
+                    admission = queue.popleft()
+                    self._waiting -= 1
+                    self.counts['admitted'] += 1
+                    self.max_wait = max(self.max_wait, time.perf_counter() - admission.enqueued)
+                    if queue:
+                        self._queues.move_to_end(model)
+                    else:
+                        del self._queues[model]
+                    admission._grant(ticket)
+                    progress = True
+                    break
+
+    def withdraw(self, admission: Admission, reason: str) -> bool:
+        """Remove a waiting request; False if it was already granted or gone."""
+        with self._lock:
+            queue = self._queues.get(admission.model)
+            if admission.done or not queue or admission not in queue:
+                return False
+            queue.remove(admission)
+            if not queue:
+                del self._queues[admission.model]
+            self._waiting -= 1
+            admission.done = True
+            self.counts[reason] += 1
+            return True
+
+    def position(self, admission: Admission) -> int:
+        with self._lock:
+            queue = self._queues.get(admission.model)
+            if admission.done or not queue:
+                return 0
+            try:
+                return queue.index(admission) + 1
+            except ValueError:
+                return 0
+
+    def depth(self) -> Dict[str, int]:
+        with self._lock:
+            return {model: len(queue) for model, queue in self._queues.items()}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'waiting': self._waiting,
+                'queues': {model: len(queue) for model, queue in self._queues.items()},
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+                **self.counts
+            }
@@ -1,15 +1,43 @@
 # app.py
-from flask import Flask, request, jsonify, render_template, Response, jsonify
-from config import get_current_theme, set_theme, load_config
+from startup import startup, DEFAULT_STARTUP_CONFIG
+from flask import Flask, request, jsonify, render_template, Response, jsonify, send_file
+from config import get_current_theme, set_theme, load_config, ConfigFile, watcher
 import requests
 from datetime import datetime
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from translator import TranslationService
-import json
+from connection_pool import ConnectionPoolManager, abort_connection, watch_checkouts
+from scheduler import InstanceScheduler, StreamTicket
+from health_monitor import HealthMonitor, StillDiscovering
+from model_inventory import ModelInventory, normalize_model_name
+from conversation_store import create_conversation_store, new_conversation
+from context_window import ContextWindow
+from streaming_translation import StreamingTranslation, DEFAULT_STREAMING_TRANSLATION_CONFIG
+from metrics import ChatMetrics, RequestTimings
+from admission import AdmissionController, Admission, QueueFull
+from response_cache import ResponseCache
+from failover import Failover, StreamInterrupted
+from warmup import WarmupManager, PullJob
+from stream_relay import ChunkBatcher, DEFAULT_STREAM_RELAY_CONFIG, batched, dumps, flush_window, iter_ndjson
+from hedging import Abort, HedgePolicy, race
+from batch import BatchRunner
+from cluster import ClusterSync, SharedSlots
+from markdown_stream import IncrementalMarkdown, DEFAULT_MARKDOWN_CONFIG
+from static_assets import AssetManifest, CompressedBody, PageCache
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from contextlib import nullcontext
+from functools import partial
+import os
+import threading
 import time
+import uuid
 
-app = Flask(__name__)
+startup.record('imports', time.perf_counter() - startup.started)
+
+# Static files are served by serve_static() below, under fingerprinted names
+app = Flask(__name__, static_folder=None)
 
 PORT = 5012
 
@@ -17,166 +45,344 @@ PORT = 5012
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-with open('ollama_config.json', 'r') as f:
-    config = json.load(f)
-    
+# OLLAMA_CONFIG points at another instance file, e.g. benchmarks/mock_ollama_config.json
+OLLAMA_CONFIG_PATH = os.environ.get('OLLAMA_CONFIG', 'ollama_config.json')
+
+# Worker processes serving this app, set by serve.py; state they must agree on is shared
+WORKERS = int(os.environ.get('LLM_CHAT_WORKERS', '1'))
+
+with startup.phase('config'):
+    # Parsed once and cached; edits to the instance list are applied without a restart
+    ollama_config = watcher.watch(ConfigFile(OLLAMA_CONFIG_PATH, validate=lambda data: 'ollama_instances' in data))
+    config = ollama_config.get()
+
 OLLAMA_INSTANCES = config['ollama_instances']
 
-# Store conversation history per session
-conversations: Dict[str, Dict] = {}
+startup_settings = {**DEFAULT_STARTUP_CONFIG, **config.get('startup', {})}
+
+conversation_settings = config.get('conversation_store', {})
+if WORKERS > 1 and conversation_settings.get('backend', 'memory') == 'memory':
+    logger.warning("The memory conversation store is per process, using sqlite so all workers share sessions")
+    conversation_settings = {**conversation_settings, 'backend': 'sqlite'}
+
+with startup.phase('stores'):
+    # Store conversation history per session
+    conversations = create_conversation_store(conversation_settings)
+
+    # Lazy: the backend and its packages load on first use (or from the prewarm thread)
+    translator = TranslationService(config.get('translation'), lazy=startup_settings['lazy'])
 
-translator = TranslationService()
+    context_window = ContextWindow(config.get('context_window'))
+
+with startup.phase('static_assets'):
+    static_settings = config.get('static_assets', {})
+    assets = AssetManifest(os.path.join(app.root_path, 'static'), settings=static_settings).build()
+    # The index page per theme, rendered again only when the theme's stylesheet or the model list changes
+    index_pages = PageCache(static_settings)
+
+app.jinja_env.globals['asset_url'] = assets.url
+
+# Ollama sampling options sent with every chat, e.g. {"temperature": 0, "seed": 42}
+chat_options = config.get('chat_options', {})
+
+response_cache = ResponseCache(config.get('response_cache'))
+
+failover_settings = config.get('failover')
+
+streaming_translation_settings = {**DEFAULT_STREAMING_TRANSLATION_CONFIG, **config.get('streaming_translation', {})}
+translation_executor = ThreadPoolExecutor(max_workers=streaming_translation_settings['max_workers'],
+                                          thread_name_prefix='translate')
+
+stream_relay_settings = {**DEFAULT_STREAM_RELAY_CONFIG, **config.get('stream_relay', {})}
+markdown_settings = {**DEFAULT_MARKDOWN_CONFIG, **config.get('markdown', {})}
 
 class OllamaManager:
-    def __init__(self, instances):
+    def __init__(self, instances, pool_config: Optional[Dict] = None, scheduler_config: Optional[Dict] = None,
+                 health_config: Optional[Dict] = None, metrics_config: Optional[Dict] = None,
+                 admission_config: Optional[Dict] = None, warmup_config: Optional[Dict] = None,
+                 hedging_config: Optional[Dict] = None, slots: Optional[SharedSlots] = None):
         self.instances = sorted(instances, key=lambda x: x['priority'])
-        self.current_instance = None
-        self.last_health_check = {}
-        self.cached_models = None
-        self.last_models_check = 0
-        self.models_cache_ttl = 30  # seconds
-        self.failed_instances = set()  # Track failed instances
-        self.failed_instance_ttl = 60  # Seconds to wait before retrying failed instance
+        self.pools = ConnectionPoolManager(self.instances, pool_config)
+        self.scheduler = InstanceScheduler(scheduler_config)
+        self.health = HealthMonitor(self.instances, self._check_instance_health, health_config)
+        self.inventory = ModelInventory()
+        self.warmup = WarmupManager(self.pools, self.inventory, self._refresh_inventory, warmup_config)
+        self.health.add_state_listener(self.warmup.on_circuit_change)
+        self.admission = AdmissionController(self.scheduler, admission_config, self.health.is_available, slots)
+        self.hedging = HedgePolicy(hedging_config)
+        self.metrics = ChatMetrics(
+            metrics_config,
+            in_flight=lambda: {url: load['in_flight'] for url, load in self.scheduler.snapshot().items()},
+            circuits=lambda: {url: entry['state'] for url, entry in self.health.snapshot.items()},
+            queued=self.admission.depth
+        )
 
-    def _check_instance_health(self, instance_url: str) -> bool:
-        """Check if an Ollama instance is healthy."""
-        # Skip health check if instance recently failed
-        if instance_url in self.failed_instances:
-            logger.debug(f"Skipping recently failed instance: {instance_url}")
+    def _refresh_inventory(self, instance_url: str) -> bool:
+        """Refresh an instance's installed (/api/tags) and loaded (/api/ps) models."""
+        response = self.pools.get(instance_url, '/api/tags', kind='health')
+        logger.debug(f"Tags response from {instance_url}: {response.status_code}")
+        if response.status_code != 200:
             return False
 
+        installed = [model['name'] for model in response.json().get('models', [])]
+        loaded = None
         try:
-            # Reduce timeout to 2 seconds
-            response = requests.get(f"{instance_url}/api/tags", timeout=2)
-            logger.info(f"Health check response from {instance_url}: {response.status_code}")
-            
-            if response.status_code == 200:
-                # Cache models when we get a successful health check
-                data = response.json()
-                if 'models' in data:
-                    self.cached_models = [model['name'] for model in data['models']]
-                    self.last_models_check = time.time()
-                    logger.info(f"Cached models during health check: {self.cached_models}")
-                # Clear from failed instances if it was there
-                self.failed_instances.discard(instance_url)
-                return True
-            
-            self.failed_instances.add(instance_url)
-            return False
-            
+            ps_response = self.pools.get(instance_url, '/api/ps', kind='health')
+            if ps_response.status_code == 200:
+                loaded = [model['name'] for model in ps_response.json().get('models', [])]
         except requests.exceptions.RequestException as e:
+            logger.debug(f"Could not list loaded models on {instance_url}: {str(e)}")
+        self.inventory.update(instance_url, installed, loaded)
+        return True
+
+    def _check_instance_health(self, instance_url: str) -> bool:
+        """Probe an Ollama instance; called from the background health monitor."""
+        started = time.perf_counter()
+        healthy = False
+        try:
+            healthy = self._refresh_inventory(instance_url)
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Health check failed for {instance_url}: {str(e)}")
-            self.failed_instances.add(instance_url)
-            return False
+        self.metrics.observe_probe(instance_url, time.perf_counter() - started, healthy)
+        return healthy
+
+    def start_health_monitor(self):
+        self.health.start()
+
+    def stop_health_monitor(self):
+        self.health.stop()
+
+    def get_healthy_instances(self) -> List[Dict]:
+        """Get all instances whose circuit is closed, in priority order.
+
+        Reads the health monitor's snapshot, so it never blocks on a probe.
+        """
+        healthy = [instance for instance in self.instances if self.health.is_available(instance['url'])]
+        if not healthy:
+            logger.error("No healthy instances available")
+        return healthy
 
     def get_healthy_instance(self) -> Optional[Dict]:
         """Get the highest priority healthy instance."""
-        current_time = time.time()
-        
-        # If we have a current instance and it was checked recently, return it
-        if self.current_instance and (current_time - self.last_health_check.get(self.current_instance['url'], 0)) <= 30:
-            return self.current_instance
-        
-        # Clear old failed instances
-        self.failed_instances = {url for url in self.failed_instances 
-                               if (current_time - self.last_health_check.get(url, 0)) <= self.failed_instance_ttl}
-        
-        for instance in self.instances:
-            # Skip recently failed instances
-            if instance['url'] in self.failed_instances:
-                continue
-                
-            # Only check health if we haven't checked in the last 30 seconds
-            if (current_time - self.last_health_check.get(instance['url'], 0)) > 30:
-                is_healthy = self._check_instance_health(instance['url'])
-                self.last_health_check[instance['url']] = current_time
-                
-                if is_healthy:
-                    self.current_instance = instance
-                    logger.info(f"Using Ollama instance: {instance['name']} at {instance['url']}")
-                    return instance
-                else:
-                    logger.warning(f"Instance {instance['name']} at {instance['url']} is not healthy")
-        
-        # If no healthy instance found, try to use the last known good instance
-        if self.current_instance:
-            logger.warning("No healthy instances found, using last known good instance")
-            return self.current_instance
-            
-        logger.error("No healthy instances available")
-        return None
+        healthy = self.get_healthy_instances()
+        return healthy[0] if healthy else None
 
     def get_available_models(self) -> List[str]:
-        """Get list of available models from cache or current Ollama instance."""
-        # First try to return cached models
-        if self.cached_models:
-            logger.info(f"Returning cached models: {self.cached_models}")
-            return self.cached_models
-            
-        # If no cache, try to get fresh models
-        instance = self.get_healthy_instance()
-        if not instance:
-            logger.error("No healthy instance available")
-            return []
-        
-        try:
-            response = requests.get(f"{instance['url']}/api/tags", timeout=2)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'models' in data:
-                    self.cached_models = [model['name'] for model in data['models']]
-                    self.last_models_check = time.time()
-                    logger.info(f"Found models: {self.cached_models}")
-                    return self.cached_models
-                    
-        except Exception as e:
-            logger.error(f"Error getting models: {str(e)}")
-        
-        return []
-    
-    def ensure_model_running(self) -> Optional[str]:
-        """Ensure a model is running on the current instance."""
+        """Get models installed on healthy instances, already-loaded models first.
+
+        Reads the inventory the health monitor keeps, so it never probes;
+        until the first probes have answered it may be empty.
+        """
+        healthy = self.get_healthy_instances()
+        return self.inventory.all_models(instance['url'] for instance in healthy)
+
+    def discovering(self) -> bool:
+        """Whether some instance has not answered its first health probe yet."""
+        snapshot = self.health.snapshot
+        return any(snapshot.get(instance['url'], {}).get('state', 'unknown') == 'unknown'
+                   for instance in self.instances)
+
+    def wait_discovered(self, timeout: float) -> bool:
+        """Block until every instance answered its first probe; False if 'timeout' seconds passed first."""
+        deadline = time.monotonic() + timeout
+        while self.discovering():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def get_model_inventory(self) -> List[Dict]:
+        """Installed and loaded models per instance."""
+        snapshot = self.inventory.snapshot
+        return [{
+            'name': instance['name'],
+            'url': instance['url'],
+            'installed': list(snapshot.get(instance['url'], {}).get('installed', ())),
+            'loaded': list(snapshot.get(instance['url'], {}).get('loaded', ()))
+        } for instance in self.instances]
+
+    def ensure_model_running(self, model: Optional[str] = None) -> Optional[str]:
+        """Resolve the model to use, preferring one that is already loaded somewhere."""
         models = self.get_available_models()
         if not models:
-            instance = self.get_healthy_instance()
-            if not instance:
-                return None
-                
-            try:
-                response = requests.post(
-                    f"{instance['url']}/api/pull",
-                    json={"name": "llama2"}
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Successfully pulled llama2 model on {instance['name']}")
-                    return "llama2"
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error pulling model: {str(e)}")
-                return None
+            # Pull the default model in the background, but only onto an instance known to have none;
+            # one that has not answered its first probe yet is still being discovered
+            known = self.inventory.snapshot
+            instance = next((instance for instance in self.get_healthy_instances() if instance['url'] in known), None)
+            if instance:
+                self.warmup.pull_default(instance['url'])
+            return None
         
+        if model:
+            wanted = normalize_model_name(model)
+            return model if any(normalize_model_name(name) == wanted for name in models) else None
         return models[0] if models else None
 
-    def get_chat_response(self, messages: List[Dict], stream: bool = True):
-        """Get chat response from current Ollama instance."""
-        instance = self.get_healthy_instance()
-        if not instance:
-            raise Exception("No healthy Ollama instance available")
-            
-        model = self.ensure_model_running()
-        if not model:
-            raise Exception("No model available")
-            
-        return requests.post(
-            f"{instance['url']}/api/chat",
-            json={
-                "model": model,
-                "messages": messages,
-                "stream": stream
-            },
-            stream=stream
-        )
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        """Like ensure_model_running(), but raises why no model can be used.
+
+        Raises StillDiscovering if the model may yet turn up on an instance
+        that has not answered its first probe.
+        """
+        resolved = self.ensure_model_running(model)
+        if not resolved:
+            if not model and self.warmup.active_pulls():
+                raise Exception("No model is installed yet, one is being pulled (see /api/pulls)")
+            if self.discovering():
+                raise StillDiscovering()
+            raise Exception(f"Model {model} is not available" if model else "No model available")
+        return resolved
+
+    def _candidates(self, model: Optional[str], exclude: Optional[set] = None) -> Tuple[str, List[Dict], set]:
+        """Resolve the model and the healthy instances that have it; loaded ones are 'warm'."""
+        resolved = self.resolve_model(model)
+        candidates = [instance for instance in self.get_healthy_instances()
+                      if self.inventory.has_model(instance['url'], resolved) is not False
+                      and instance['url'] not in (exclude or ())]
+        warm = {instance['url'] for instance in candidates if self.inventory.is_loaded(instance['url'], resolved)}
+        return resolved, candidates, warm
+
+    def check_admission(self, model: Optional[str] = None):
+        """Raise QueueFull if a chat for this model would be rejected right now."""
+        resolved, candidates, _ = self._candidates(model)
+        self.admission.check(resolved, candidates)
+
+    def admit(self, model: Optional[str] = None, timings: Optional[RequestTimings] = None,
+              exclude: Optional[set] = None) -> Admission:
+        """Claim a stream slot on an instance that has the model, or a place in its queue.
+
+        Instances whose URL is in 'exclude' are skipped. Raises QueueFull when
+        the queue is full. Cancel the admission if the request is abandoned
+        before its ticket is released. Never does network I/O (model lookup
+        reads the health and inventory snapshots, and shared slots are counted
+        in a local SQLite file), so the async mode calls it on the event loop.
+        """
+        timings = timings or RequestTimings()
+        with timings.span('health_check'):
+            resolved, candidates, warm = self._candidates(model, exclude)
+        with timings.span('select'):
+            return self.admission.enqueue(resolved, candidates, warm)
+
+    def hedge_admission(self, admission: Admission, exclude: Optional[set] = None) -> Optional[Admission]:
+        """A free slot for a duplicate of 'admission' on another instance with the model, or None.
+
+        Never queues, so hedges only use capacity nobody is waiting for.
+        """
+        primary = admission.ticket.instance['url']
+        candidates = [instance for instance in self.get_healthy_instances()
+                      if instance['url'] != primary and instance['url'] not in (exclude or ())
+                      and self.inventory.has_model(instance['url'], admission.model) is not False]
+        warm = {instance['url'] for instance in candidates if self.inventory.is_loaded(instance['url'], admission.model)}
+        return self.admission.try_acquire(admission.model, candidates, warm)
+
+    def prepare_chat_request(self, messages: List[Dict], stream: bool = True, model: Optional[str] = None,
+                             timings: Optional[RequestTimings] = None, admission: Optional[Admission] = None,
+                             options: Optional[Dict] = None) -> Tuple[StreamTicket, Dict]:
+        """Schedule the request on a healthy instance and build the /api/chat payload.
+
+        Only instances that have the model installed are considered, and ones
+        that already have it loaded in memory are preferred. Without an
+        'admission' from admit(), this waits in the queue for a slot. The
+        returned ticket counts as an in-flight stream until released.
+        """
+        timings = timings or RequestTimings()
+        if admission is None:
+            admission = self.admit(model, timings)
+            with timings.span('queue'):
+                for _ in admission.updates():
+                    pass  # Raises QueueTimeout if no slot frees up in time
+        ticket = admission.ticket
+        ticket.model = admission.model
+        timings.instance = ticket.instance['url']
+        timings.model = admission.model
+
+        self.warmup.record_use(admission.model)
+        payload = {
+            "model": admission.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.warmup.keep_alive(admission.model)
+        }
+        if options:
+            payload["options"] = options
+        return ticket, payload
+
+    def get_chat_response(self, messages: List[Dict], stream: bool = True, model: Optional[str] = None,
+                          timings: Optional[RequestTimings] = None, admission: Optional[Admission] = None,
+                          options: Optional[Dict] = None,
+                          abort: Optional[Abort] = None) -> Tuple[requests.Response, StreamTicket]:
+        """Get chat response from the scheduled Ollama instance.
+
+        A request cut off by 'abort' (a hedge race it lost) is not held against the instance.
+        """
+        timings = timings or RequestTimings()
+        ticket, payload = self.prepare_chat_request(messages, stream, model, timings, admission, options)
+        url = ticket.instance['url']
+        timings.request_sent()
+        try:
+            response = self.pools.post(
+                url,
+                '/api/chat',
+                json=payload,
+                stream=stream
+            )
+        except requests.exceptions.RequestException:
+            if abort is None or not abort.aborted:
+                self.health.report_failure(url)
+            ticket.release()
+            raise
+        except Exception:
+            ticket.release()
+            raise
+        self.health.report_success(url)
+        self.inventory.mark_loaded(url, ticket.model)
+        return response, ticket
+
+    def set_instances(self, instances: List[Dict]):
+        """Swap in a new instance list, keeping pools and health state of unchanged instances."""
+        instances = sorted(instances, key=lambda x: x['priority'])
+        previous = {instance['url']: instance for instance in self.instances}
+        for instance in instances:
+            old = previous.get(instance['url'])
+            if old is None or old.get('pool') != instance.get('pool'):
+                self.pools.add_instance(instance)
+        self.instances = instances
+        self.health.set_instances(instances)
+        removed = set(previous) - {instance['url'] for instance in instances}
+        for url in removed:
+            self.pools.remove_instance(url)
+            self.inventory.remove(url)
+        # Limits may have changed, so waiting requests might fit now
+        self.admission.dispatch()
+        logger.info(f"Instances reloaded: {[instance['name'] for instance in instances]}"
+                    + (f", removed {sorted(removed)}" if removed else ''))
+
+    def pull_model(self, model: str, instance: Optional[str] = None) -> List[PullJob]:
+        """Start background pulls of a model on one instance (URL or name) or on every healthy one."""
+        if instance:
+            targets = [i for i in self.instances if instance in (i['url'], i['name'])]
+        else:
+            targets = self.get_healthy_instances()
+        return [self.warmup.pull(model, target['url']) for target in targets]
+
+    def stream_failed(self, url: str, error: Exception):
+        """Record a chat stream that failed on 'url'.
+
+        An error status counts towards the circuit's failure threshold like any
+        failed request; a dropped or stalled stream means the instance died
+        mid-generation, so its circuit opens at once.
+        """
+        if getattr(error, 'response', None) is not None:
+            self.health.report_failure(url)
+        else:
+            logger.warning(f"Marking {url} down: {str(error) or type(error).__name__}")
+            self.health.mark_down(url)
+
+    def get_pool_stats(self) -> List[Dict]:
+        """Connection pool statistics for every configured instance."""
+        stats = self.pools.stats()
+        return [{'name': instance['name'], 'url': instance['url'], **stats.get(instance['url'], {})}
+                for instance in self.instances]
 
 class OllamaManager_Extensive:
     def __init__(self, instances):
@@ -291,13 +497,61 @@ class OllamaManager_Extensive:
         )
 
 # Initialize Ollama manager
-ollama_manager = OllamaManager(OLLAMA_INSTANCES)
+with startup.phase('ollama_manager'):
+    # Workers count their streams in one place, so together they respect each instance's max_concurrent
+    shared_slots = SharedSlots(config.get('cluster')) if WORKERS > 1 else None
+    ollama_manager = OllamaManager(OLLAMA_INSTANCES, config.get('connection_pool'), config.get('scheduler'),
+                                   config.get('health_monitor'), config.get('metrics'), config.get('admission'),
+                                   config.get('warmup'), config.get('hedging'), shared_slots)
+
+def record_discovery(url: str, previous: str, state: str):
+    """Health listener: note when each instance answered (or failed) its first probe."""
+    if previous == 'unknown':
+        startup.mark(f"discovered {url} ({state})")
+
+ollama_manager.health.add_state_listener(record_discovery)
+# Probes run in the background, so startup never waits on slow or missing hosts
+if WORKERS > 1:
+    # One worker probes and preloads for all; the others copy its health and model inventory
+    cluster = ClusterSync(ollama_manager.health, ollama_manager.inventory, config.get('cluster'), shared_slots)
+    cluster.start()
+else:
+    cluster = None
+    ollama_manager.start_health_monitor()
+
+def reload_ollama_config(new_config: Dict):
+    """Apply an edited ollama_config.json. Only the instance list takes effect without a restart."""
+    ollama_manager.set_instances(new_config['ollama_instances'])
+
+ollama_config.add_listener(reload_ollama_config)
+
+def send_body(body: CompressedBody, cache_control: str) -> Response:
+    """Send a precompressed body in the client's best encoding, or 304 if its copy is current."""
+    encoding, data, etag = body.select(request.headers.get('Accept-Encoding', ''))
+    headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding', 'ETag': f'"{etag}"'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(data, mimetype=body.mimetype, headers=headers)
+
+@app.route('/static/<path:filename>')
+def serve_static(filename):
+    asset, immutable = assets.lookup(filename)
+    if asset is None:
+        return jsonify({"error": "Not found"}), 404
+    # Plain names (from pages cached before a deploy) must be revalidated
+    return send_body(asset, f'public, max-age={assets.max_age}, immutable' if immutable else 'no-cache')
 
 @app.route('/')
 def home():
+    # Never waits for discovery: the page polls /api/models until models are known
     models = ollama_manager.get_available_models()
     theme_path = get_current_theme()
-    return render_template('index.html', models=models, theme_path=theme_path)
+    page = index_pages.get(theme_path, tuple(models), lambda: render_template(
+        'index.html', models=models, theme_path=assets.url(theme_path)))
+    # Browsers revalidate on every load; an unchanged page costs one small 304
+    return send_body(page, 'no-cache')
 
 @app.route('/api/theme', methods=['GET'])
 def get_theme():
@@ -315,8 +569,338 @@ def update_theme(theme_name):
 @app.route('/api/models', methods=['GET'])
 def get_models():
     models = ollama_manager.get_available_models()
-    logger.info(f"Available models: {models}")  # Add logging
-    return jsonify({"models": models})
+    logger.debug(f"Available models: {models}")
+    return jsonify({"models": models, "instances": ollama_manager.get_model_inventory(),
+                    "discovering": not models and ollama_manager.discovering()})
+
+def sse_event(payload: Dict) -> str:
+    """Format a payload as a server-sent event."""
+    return f"data: {dumps(payload)}\n\n"
+
+def begin_chat_turn(session_id: str, message: str, timings: Optional[RequestTimings] = None) -> Dict:
+    """Translate the user message to English and append it to the session history.
+
+    The message is tagged with a turn id, which finish_chat_turn() uses to
+    find it again in the session as it is by then.
+    """
+    timings = timings or RequestTimings(session_id)
+    logger.debug(f"Received message: {message}")
+    
+    # Detect and translate user message to English
+    with timings.span('translate_in'):
+        translated_message, detected_lang = translator.translate_to_english(message)
+    logger.debug(f"Translated to English: {translated_message} (from {detected_lang})")
+
+    # Add translated user message to history
+    user_message = {
+        "role": "user",
+        "content": translated_message,
+        "turn": uuid.uuid4().hex[:12]
+    }
+    context_window.message_tokens(user_message)
+
+    def append(conversation: Optional[Dict]) -> Dict:
+        # Initialize conversation history if it doesn't exist
+        conversation = conversation or new_conversation()
+
+        # Store the user's language preference if not already set
+        if not conversation['language']:
+            conversation['language'] = detected_lang
+            logger.debug(f"Set session language to: {detected_lang}")
+
+        conversation['messages'].append(user_message)
+        return conversation
+
+    conversation = conversations.update(session_id, append)
+    conversation['turn'] = user_message['turn']
+    return conversation
+
+def build_prompt(conversation: Dict, model: Optional[str] = None,
+                 timings: Optional[RequestTimings] = None) -> Tuple[str, List[Dict]]:
+    """Resolve the model and the token-budgeted message window for this turn."""
+    timings = timings or RequestTimings()
+    with timings.span('health_check'):
+        resolved = ollama_manager.resolve_model(model)
+    timings.model = resolved
+    return resolved, context_window.build(conversation, resolved)
+
+def finish_chat_turn(session_id: str, conversation: Dict, full_response: str, model: Optional[str] = None):
+    """Store the English assistant reply and trim the session history to the model's budget.
+
+    The reply goes right after its user message in the session as it is
+    now, so turns stored or a reset made while it streamed are kept. If the
+    user message is gone (the session was reset), the reply is dropped.
+    """
+    assistant_message = {
+        "role": "assistant",
+        "content": full_response
+    }
+    context_window.message_tokens(assistant_message)
+
+    def store_reply(current: Optional[Dict]) -> Optional[Dict]:
+        messages = current['messages'] if current else []
+        index = next((index for index, message in enumerate(messages)
+                      if message.get('turn') == conversation['turn']), None)
+        if index is None:
+            return None
+        messages.insert(index + 1, assistant_message)
+
+        # Limit conversation history
+        context_window.compact(current, model)
+        return current
+
+    if conversations.update(session_id, store_reply) is None:
+        logger.info(f"Session {session_id} was reset during the turn, not storing the reply")
+
+def reset_session(session_id: str):
+    """Clear a session's history while keeping its language."""
+    conversations.update(session_id, lambda conversation:
+                         new_conversation(conversation['language']) if conversation else None)
+
+def open_chat_stream(admission: Admission, messages: List[Dict], model: str, timings: RequestTimings,
+                     abort: Optional[Abort] = None):
+    """Send the chat on the admitted instance and read up to the first reply token.
+
+    Returns (response, ticket, chunks), where chunks still yields the chunks
+    read so far. The response is closed and the ticket released on errors.
+    'abort' (from a hedge race) shuts the connection down to unblock this
+    call, even while it still waits for the response headers.
+    """
+    def on_checkout(conn):
+        abort.on_abort(lambda: abort_connection(conn))
+
+    with watch_checkouts(on_checkout) if abort else nullcontext():
+        response, ticket = ollama_manager.get_chat_response(
+            messages,
+            model=model,
+            timings=timings,
+            admission=admission,
+            options=chat_options,
+            abort=abort
+        )
+    try:
+        if abort:
+            abort.on_abort(response.close)
+        response.raise_for_status()
+        # chunk_size=None hands over each network read as it arrives
+        chunks = iter_ndjson(response.iter_content(chunk_size=None))
+        head = []
+        for chunk in chunks:
+            head.append(chunk)
+            if chunk.get('done') or chunk.get('message', {}).get('content'):
+                break
+    except BaseException:
+        ticket.release()
+        response.close()
+        raise
+    return response, ticket, chain(head, chunks)
+
+def close_chat_stream(stream):
+    response, ticket, _ = stream
+    ticket.release()
+    response.close()
+
+def open_reply_stream(admission: Admission, messages: List[Dict], model: str, timings: RequestTimings,
+                      exclude: set):
+    """open_chat_stream(), hedged on a second instance if the first token is late.
+
+    Returns the admission whose stream won (a hedge's, possibly) and its stream.
+    """
+    hedging = ollama_manager.hedging
+    if not hedging.enabled:
+        return admission, open_chat_stream(admission, messages, model, timings)
+    timings.request_sent()
+    winner, stream, outcome = race(
+        lambda entrant, abort: open_chat_stream(entrant, messages, model, RequestTimings(), abort),
+        close_chat_stream,
+        admission,
+        lambda: ollama_manager.hedge_admission(admission, exclude),
+        hedging,
+        admission.model,
+        partial(report_race_failure, timings)
+    )
+    record_race(timings, winner, outcome)
+    return winner, stream
+
+def report_race_failure(timings: RequestTimings, failed: Admission, error: Exception):
+    """Report an entrant of a hedged race whose stream failed."""
+    url = failed.ticket.instance['url']
+    ollama_manager.stream_failed(url, error)
+    timings.failed_over.append(url)
+
+def record_race(timings: RequestTimings, winner: Admission, outcome: str):
+    """Note the outcome and the winner of a hedged race in the timings."""
+    timings.hedges.append(outcome)
+    timings.instance = winner.ticket.instance['url']
+    timings.model = winner.model
+
+def ollama_events(messages: List[Dict], model: str, timings: RequestTimings):
+    """Queue positions while waiting for a slot, then reply chunks streamed from Ollama.
+
+    If the instance fails mid-stream, the reply continues on another instance
+    from where it stopped, spliced into the same stream.
+    """
+    failover = Failover(messages, failover_settings)
+    try:
+        while True:
+            admission = ollama_manager.admit(model, timings, exclude=failover.failed)
+            url = None
+            try:
+                with timings.span('queue'):
+                    for position in admission.updates():
+                        yield 'queue_position', position
+                url = admission.ticket.instance['url']
+                admission, (response, ticket, chunks) = open_reply_stream(
+                    admission, failover.messages(), model, timings, failover.failed)
+                url = admission.ticket.instance['url']
+                try:
+                    done = False
+                    for chunk in chunks:
+                        if 'message' in chunk:
+                            content = chunk['message'].get('content', '')
+                            if content:
+                                ticket.first_token()
+                                timings.first_byte()
+                                failover.record(content)
+                                yield 'chunk', content
+                        done = chunk.get('done', False)
+                    if not done:
+                        raise StreamInterrupted(f"Stream from {url} ended before the reply was complete")
+                    return
+                finally:
+                    ticket.release()
+                    response.close()
+            except (requests.exceptions.RequestException, StreamInterrupted) as e:
+                if url is None:
+                    raise
+                ollama_manager.stream_failed(url, e)
+                timings.failed_over.append(url)
+                if not failover.should_retry(url, e):
+                    raise
+            finally:
+                admission.cancel()
+    finally:
+        timings.stream_ended()
+
+def run_batch_item(item: Dict) -> Dict:
+    """Answer one batch item like a chat turn, without a session: translate in, generate, translate back."""
+    timings = RequestTimings(f"batch:{item['id']}")
+    events = None
+    try:
+        if item.get('messages'):
+            history = [{'role': message['role'], 'content': message['content']} for message in item['messages']]
+        elif item.get('message'):
+            history = [{'role': 'user', 'content': item['message']}]
+        else:
+            raise ValueError("Item has no 'message' or 'messages'")
+
+        language = item.get('language')
+        with timings.span('translate_in'):
+            for message in history:
+                if message['role'] != 'system' and language != 'en':
+                    message['content'], detected = translator.translate_to_english(message['content'], language)
+                    language = language or detected
+        conversation = new_conversation(language or 'en')
+        conversation['messages'] = history
+
+        model_name, messages = build_prompt(conversation, item.get('model'), timings)
+        timings.source, events = response_cache.stream(
+            response_cache.key(model_name, messages, chat_options),
+            lambda: ollama_events(messages, model_name, timings)
+        )
+        reply = ''.join(content for kind, content in events if kind == 'chunk')
+        timings.bytes_streamed = len(reply.encode('utf-8'))
+
+        result = {'id': item['id'], 'line': item['line'], 'model': model_name, 'reply': reply,
+                  'language': conversation['language']}
+        if conversation['language'] != 'en' and reply:
+            with timings.span('translate_out'):
+                result['translation'] = translator.translate_from_english(reply, conversation['language'])
+        breakdown = timings.as_dict()
+        result.update({
+            'instance': timings.instance,
+            'source': timings.source,
+            'failed_over': timings.failed_over,
+            'timings': {'total_ms': breakdown['total_ms'], 'spans_ms': breakdown['spans_ms']}
+        })
+        return result
+    except (QueueFull, StillDiscovering):
+        timings.outcome = 'rejected'
+        raise
+    except Exception:
+        timings.outcome = 'error'
+        raise
+    finally:
+        if events is not None:
+            events.close()
+        ollama_manager.metrics.observe_request(timings)
+
+def stream_capacity() -> int:
+    """Stream slots across the healthy instances, the default batch concurrency."""
+    return sum(ollama_manager.admission.limit(instance) or ollama_manager.admission.default_max_concurrent
+               for instance in ollama_manager.get_healthy_instances())
+
+batch_runner = BatchRunner(run_batch_item, stream_capacity, config.get('batch'), ollama_manager.wait_discovered)
+
+def chunk_batcher(requested_ms=None) -> ChunkBatcher:
+    """Batcher for one client's reply, using its requested flush window (flush_ms) if any."""
+    return ChunkBatcher(flush_window(requested_ms, stream_relay_settings), stream_relay_settings['flush_chars'])
+
+def markdown_renderer(render=None) -> Optional[IncrementalMarkdown]:
+    """Server-side renderer for one stream if the client asked for render=html, else None."""
+    if render != 'html' or not markdown_settings['enabled']:
+        return None
+    return IncrementalMarkdown(markdown_settings)
+
+def rendered(renderer: Optional[IncrementalMarkdown], text: str, key: str = 'html') -> Dict:
+    """HTML fields for an SSE event: finished blocks to append ('html') and the tail to replace ('html_tail').
+
+    The tail is left out while it is not due for another render; the client keeps the previous one.
+    """
+    if renderer is None:
+        return {}
+    html, tail = renderer.feed(text)
+    return {key: html} if tail is None else {key: html, f'{key}_tail': tail}
+
+def rendered_end(renderer: Optional[IncrementalMarkdown], key: str = 'html', text: str = '') -> Dict:
+    """HTML fields once the text is complete: the rest as finished blocks and an empty tail."""
+    if renderer is None:
+        return {}
+    return {key: renderer.finish(text), f'{key}_tail': ''}
+
+def start_streaming_translation(conversation: Dict, submit=translation_executor.submit) -> Optional[StreamingTranslation]:
+    """Sentence-level translator for the reply, or None if the session is English or it is disabled."""
+    target_lang = conversation['language']
+    if target_lang == 'en' or not streaming_translation_settings['enabled']:
+        return None
+    return StreamingTranslation(
+        lambda text: translator.translate_from_english(text, target_lang),
+        submit,
+        streaming_translation_settings['min_chars']
+    )
+
+def get_instance_status() -> List[Dict]:
+    """Health status of every configured Ollama instance."""
+    status = []
+    load = ollama_manager.scheduler.snapshot()
+    health = ollama_manager.health.snapshot
+    for instance in ollama_manager.instances:
+        instance_load = load.get(instance['url'], {})
+        instance_health = health.get(instance['url'], {})
+        state = instance_health.get('state', 'unknown')
+        status.append({
+            'name': instance['name'],
+            'url': instance['url'],
+            'status': 'unknown' if state == 'unknown' else ('healthy' if instance_health['healthy'] else 'unhealthy'),
+            'circuit': state,
+            'last_check': instance_health.get('last_check'),
+            'probe_latency_ms': instance_health.get('latency_ms'),
+            'priority': instance['priority'],
+            'in_flight': instance_load.get('in_flight', 0),
+            'max_concurrent': ollama_manager.admission.limit(instance),
+            'ewma_ttft_ms': instance_load.get('ewma_ttft_ms')
+        })
+    return status
 
 @app.route('/api/chat', methods=['GET', 'POST'])
 def chat():
@@ -324,88 +908,119 @@ def chat():
         if request.method == 'GET':
             message = request.args.get('message')
             session_id = request.args.get('session_id', 'default')
+            model = request.args.get('model')
+            flush_ms = request.args.get('flush_ms')
+            render = request.args.get('render')
         else:  # POST
             data = request.json
             message = data.get('message')
             session_id = data.get('session_id', 'default')
+            model = data.get('model')
+            flush_ms = data.get('flush_ms')
+            render = data.get('render')
 
         if not message:
             return jsonify({"error": "No message provided"}), 400
+        if model and not ollama_manager.ensure_model_running(model):
+            return jsonify({"error": f"Model {model} is not available"}), 400
+        try:
+            ollama_manager.check_admission(model)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
         
-        # Initialize conversation history if it doesn't exist
-        if session_id not in conversations:
-            conversations[session_id] = {
-                'messages': [],
-                'language': None
-            }
-
-        logger.info(f"Received message: {message}")
-        
-        # Detect and translate user message to English
-        translated_message, detected_lang = translator.translate_to_english(message)
-        logger.info(f"Translated to English: {translated_message} (from {detected_lang})")
-        
-        # Store the user's language preference if not already set
-        if not conversations[session_id]['language']:
-            conversations[session_id]['language'] = detected_lang
-            logger.info(f"Set session language to: {detected_lang}")
-
-        # Add translated user message to history
-        conversations[session_id]['messages'].append({
-            "role": "user",
-            "content": translated_message
-        })
+        timings = RequestTimings(session_id)
+        conversation = begin_chat_turn(session_id, message, timings)
+        batcher = chunk_batcher(flush_ms)
+        # With render=html, the English reply and its translation are rendered here, block by block
+        renderer = markdown_renderer(render)
+        translation_renderer = markdown_renderer(render)
 
         def generate():
+            events = None
+            streaming = None
+
+            def relay(text: str):
+                timings.bytes_streamed += len(text.encode('utf-8'))
+                # Send the English chunk
+                yield sse_event({'chunk': text, **rendered(renderer, text)})
+                if streaming:
+                    streaming.feed(text)
+                    for piece in streaming.ready():
+                        yield sse_event({'translation_chunk': piece,
+                                         **rendered(translation_renderer, piece, 'translation_html')})
+
             try:
-                # Get response from Ollama
-                response = ollama_manager.get_chat_response(
-                    conversations[session_id]['messages']
+                # Get response from Ollama, the response cache or an identical request in flight
+                model_name, messages = build_prompt(conversation, model, timings)
+                timings.source, events = response_cache.stream(
+                    response_cache.key(model_name, messages, chat_options),
+                    lambda: ollama_events(messages, model_name, timings)
                 )
+                # Flushed on time even while the model pauses
+                events = batched(events, batcher)
                 
-                full_response = ""
+                parts = []
+                streaming = start_streaming_translation(conversation)
                 
-                # Stream the English response first
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line.decode('utf-8'))
-                        if 'message' in chunk:
-                            content = chunk['message'].get('content', '')
-                            if content:
-                                full_response += content
-                                # Send the English chunk
-                                yield f"data: {json.dumps({'chunk': content})}\n\n"
+                # Stream the English response in flush windows, translating finished sentences alongside
+                for kind, content in events:
+                    if kind == 'queue_position':
+                        yield sse_event({'queue_position': content})
+                        continue
+                    parts.append(content)
+                    yield from relay(content)
+                full_response = ''.join(parts)
+                if renderer:
+                    yield sse_event(rendered_end(renderer))
+
+                if streaming:
+                    with timings.span('translate_out'):
+                        streaming.finish()
+                        for piece in streaming.drain():
+                            yield sse_event({'translation_chunk': piece,
+                                             **rendered(translation_renderer, piece, 'translation_html')})
+                    # Send the complete translated version
+                    yield sse_event({'translation': streaming.text(),
+                                     **rendered_end(translation_renderer, 'translation_html')})
 
-                if full_response:
+                elif full_response:
                     # Get the target language from the session
-                    target_lang = conversations[session_id]['language']
-                    logger.info(f"Translating full response to {target_lang}")
+                    target_lang = conversation['language']
                     
                     # Translate the complete response back to original language
                     if target_lang != 'en':
-                        translated_response = translator.translate_from_english(
-                            full_response,
-                            target_lang
-                        )
-                        logger.info("Translation completed")
+                        logger.debug(f"Translating full response to {target_lang}")
+                        with timings.span('translate_out'):
+                            translated_response = translator.translate_from_english(
+                                full_response,
+                                target_lang
+                            )
                         # Send the translated version
-                        yield f"data: {json.dumps({'translation': translated_response})}\n\n"
+                        yield sse_event({'translation': translated_response,
+                                         **rendered_end(translation_renderer, 'translation_html', translated_response)})
 
                 # Store the English version in conversation history
-                conversations[session_id]['messages'].append({
-                    "role": "assistant",
-                    "content": full_response
-                })
+                finish_chat_turn(session_id, conversation, full_response, model_name)
 
-                # Limit conversation history
-                if len(conversations[session_id]['messages']) > 20:
-                    conversations[session_id]['messages'] = conversations[session_id]['messages'][-20:]
-
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                yield sse_event({'done': True})
 
+            except GeneratorExit:
+                timings.outcome = 'cancelled'
+                raise
+            except QueueFull as e:
+                timings.outcome = 'rejected'
+                yield sse_event({'error': str(e), 'retry_after': e.retry_after})
             except Exception as e:
+                timings.outcome = 'error'
                 logger.error(f"Error in generate: {str(e)}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                text = batcher.flush()
+                if text:
+                    yield sse_event({'chunk': text})
+                yield sse_event({'error': str(e)})
+            finally:
+                if events is not None:
+                    events.close()
+                ollama_manager.metrics.observe_request(timings)
                 
         return Response(generate(), mimetype='text/event-stream')
 
@@ -417,28 +1032,142 @@ def chat():
 def reset_conversation():
     data = request.json
     session_id = data.get('session_id', 'default')
-    if session_id in conversations:
-        lang = conversations[session_id]['language']
-        conversations[session_id] = {
-            'messages': [],
-            'language': lang
-        }
+    reset_session(session_id)
     return jsonify({"status": "success"})
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Get status of all Ollama instances."""
-    status = []
-    for instance in OLLAMA_INSTANCES:
-        is_healthy = ollama_manager._check_instance_health(instance['url'])
-        status.append({
-            'name': instance['name'],
-            'url': instance['url'],
-            'status': 'healthy' if is_healthy else 'unhealthy',
-            'priority': instance['priority']
-        })
-    return jsonify({'instances': status})
+    """Get status of all Ollama instances from the latest health snapshot."""
+    return jsonify({'instances': get_instance_status()})
+
+@app.route('/api/queue', methods=['GET'])
+def get_queue_stats():
+    """Get admission control statistics: waiting requests per model and totals."""
+    return jsonify(ollama_manager.admission.stats())
+
+@app.route('/api/warmup', methods=['GET'])
+def get_warmup_stats():
+    """Get preload models, per-model keep_alive and recent traffic."""
+    return jsonify(ollama_manager.warmup.stats())
+
+@app.route('/api/hedging', methods=['GET'])
+def get_hedging_stats():
+    """Get hedged dispatch outcomes and the current hedge delay per model."""
+    return jsonify(ollama_manager.hedging.stats())
+
+@app.route('/api/pulls', methods=['GET'])
+def get_pulls():
+    """Get background model pull jobs, newest first."""
+    return jsonify({'jobs': ollama_manager.warmup.jobs()})
+
+@app.route('/api/pulls', methods=['POST'])
+def start_pull():
+    """Start pulling a model in the background on one instance or all healthy ones."""
+    data = request.json or {}
+    model = data.get('model')
+    if not model:
+        return jsonify({'error': 'No model provided'}), 400
+    jobs = ollama_manager.pull_model(model, data.get('instance'))
+    if not jobs:
+        return jsonify({'error': 'No matching healthy instance'}), 404
+    return jsonify({'jobs': [job.as_dict() for job in jobs]}), 202
+
+@app.route('/api/pulls/<job_id>', methods=['GET'])
+def get_pull(job_id):
+    """Get the progress of one pull job."""
+    job = ollama_manager.warmup.job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown pull job'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/api/batch', methods=['GET'])
+def get_batch_jobs():
+    """Get batch jobs with progress and throughput, newest first."""
+    return jsonify({'jobs': batch_runner.jobs()})
+
+@app.route('/api/batch', methods=['POST'])
+def start_batch():
+    """Start a batch job for a JSONL body or an uploaded 'file'."""
+    upload = request.files.get('file')
+    data = upload.read() if upload else request.get_data()
+    if not data.strip():
+        return jsonify({'error': 'No JSONL input provided'}), 400
+    job = batch_runner.submit(data, request.args.get('concurrency', type=int))
+    return jsonify(job.as_dict()), 202
+
+@app.route('/api/batch/<job_id>', methods=['GET'])
+def get_batch_job(job_id):
+    """Get the progress of one batch job."""
+    job = batch_runner.job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown batch job'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/api/batch/<job_id>/results', methods=['GET'])
+def get_batch_results(job_id):
+    """Download the results written so far, one JSON object per line."""
+    _, output_path = batch_runner.job_paths(job_id)
+    if not os.path.exists(output_path):
+        return jsonify({'error': 'Unknown batch job'}), 404
+    return send_file(os.path.abspath(output_path), mimetype='application/x-ndjson')
+
+@app.route('/api/batch/<job_id>/resume', methods=['POST'])
+def resume_batch(job_id):
+    """Continue a stopped or crashed job, skipping the items that already have results."""
+    job = batch_runner.resume(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or still running batch job'}), 409
+    return jsonify(job.as_dict()), 202
+
+@app.route('/api/sessions', methods=['GET'])
+def get_session_stats():
+    """Get conversation store statistics."""
+    return jsonify(conversations.stats())
+
+@app.route('/api/response_cache', methods=['GET'])
+def get_response_cache_stats():
+    """Get response cache and request coalescing statistics."""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/translations', methods=['GET'])
+def get_translation_stats():
+    """Get translation cache statistics."""
+    return jsonify({'backend': translator.backend_name, 'cache': translator.cache_stats()})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: per-stage latency histograms, in-flight streams, probes."""
+    return Response(ollama_manager.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/timings', methods=['GET'])
+def get_request_timings():
+    """Per-request latency breakdown of the most recent chat turns."""
+    limit = request.args.get('limit', type=int)
+    return jsonify({'requests': ollama_manager.metrics.recent(limit)})
+
+@app.route('/api/cluster', methods=['GET'])
+def get_cluster_stats():
+    """Get this worker's role in a multi-worker deployment."""
+    if cluster is None:
+        return jsonify({'workers': WORKERS, 'leader': True})
+    return jsonify({'workers': WORKERS, **cluster.stats()})
+
+@app.route('/api/startup', methods=['GET'])
+def get_startup_report():
+    """Time to serve, per startup phase, and the initialization deferred past it."""
+    return jsonify(startup.report())
+
+@app.route('/api/pools', methods=['GET'])
+def get_pool_stats():
+    """Get connection pool statistics for all Ollama instances."""
+    return jsonify({'pools': ollama_manager.get_pool_stats()})
+
+startup.ready()
+if startup_settings['lazy'] and startup_settings['prewarm']:
+    threading.Thread(target=translator.warm, name='translator-prewarm', daemon=True).start()
+threading.Thread(target=assets.warm, name='assets-prewarm', daemon=True).start()
 
 if __name__ == '__main__':
     logger.info("Starting Ollama chat application...")
-    app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
+    # The debug reloader imports everything twice; the systemd unit sets FLASK_ENV=production
+    app.run(host='0.0.0.0', port=PORT, debug=os.environ.get('FLASK_ENV') != 'production')
\ No newline at end of file
@@ -0,0 +1,459 @@
+# asgi_app.py
+"""Asyncio serving mode for the chat API.
+
+Serves /api/chat, /api/models, /api/status and /api/reset natively on the
+event loop and proxies Ollama's NDJSON stream with an async HTTP client, so
+an open stream costs a coroutine instead of a worker thread. Every other
+route (index page, theme, static files) is delegated to the Flask app.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5012
+The Flask server (python3 app.py) remains available as the fallback mode.
+"""
+import asyncio
+import io
+import json
+import logging
+import sys
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+
+from metrics import RequestTimings
+from admission import Admission, QueueFull
+from failover import Failover, StreamInterrupted
+from stream_relay import abatched, aiter_ndjson
+from hedging import arace
+from app import (
+    app as flask_app, ollama_manager, translator, response_cache, chat_options, failover_settings, PORT,
+    sse_event, begin_chat_turn, build_prompt, finish_chat_turn, reset_session, get_instance_status,
+    start_streaming_translation, translation_executor, chunk_batcher, record_race, report_race_failure,
+    markdown_renderer, rendered, rendered_end
+)
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no')
+]
+
+# httpx 0.13 raises timeouts and transport errors outside the HTTPError hierarchy
+UPSTREAM_ERRORS = (httpx.HTTPError, httpx.NetworkError, httpx.ProtocolError,
+                   httpx.ConnectTimeout, httpx.ReadTimeout, httpx.WriteTimeout, httpx.PoolTimeout)
+
+
+def _make_client() -> httpx.AsyncClient:
+    """Build the shared async client, sized for many concurrent open streams."""
+    settings = ollama_manager.pools.defaults
+    max_connections = settings.get('async_max_connections', 1000)
+    max_keepalive = settings['pool_maxsize'] * max(len(ollama_manager.instances), 1)
+    if hasattr(httpx, 'Limits'):
+        return httpx.AsyncClient(limits=httpx.Limits(
+            max_keepalive_connections=max_keepalive, max_connections=max_connections))
+    return httpx.AsyncClient(pool_limits=httpx.PoolLimits(
+        max_keepalive=max_keepalive, max_connections=max_connections))
+
+
+async def run_sync(func, *args):
+    """Run a blocking call on the default thread pool."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+async def read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, payload: Dict, status: int = 200, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                   + (headers or [])
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _resume(head: List[Dict], chunks):
+    """The chunks already read, then the rest of the stream."""
+    for chunk in head:
+        yield chunk
+    async for chunk in chunks:
+        yield chunk
+
+
+async def close_chat_stream(stream):
+    response, ticket, _ = stream
+    ticket.release()
+    await response.aclose()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+class AsyncChatApp:
+    """ASGI application for the streaming chat routes."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.client: Optional[httpx.AsyncClient] = None
+        self.routes = {
+            ('GET', '/api/chat'): self.chat,
+            ('POST', '/api/chat'): self.chat,
+            ('GET', '/api/models'): self.models,
+            ('GET', '/api/status'): self.status,
+            ('POST', '/api/reset'): self.reset
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+        try:
+            await handler(scope, receive, send)
+        except Exception as e:
+            logger.error(f"Error handling {scope['path']}: {str(e)}")
+            await send_json(send, {'error': str(e)}, 500)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.client = _make_client()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.client:
+                    await self.client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def models(self, scope, receive, send):
+        models = ollama_manager.get_available_models()
+        await send_json(send, {'models': models, 'instances': ollama_manager.get_model_inventory(),
+                               'discovering': not models and ollama_manager.discovering()})
+
+    async def status(self, scope, receive, send):
+        status = get_instance_status()
+        await send_json(send, {'instances': status})
+
+    async def reset(self, scope, receive, send):
+        data = json.loads(await read_body(receive) or b'{}')
+        await run_sync(reset_session, data.get('session_id', 'default'))
+        await send_json(send, {'status': 'success'})
+
+    async def chat(self, scope, receive, send):
+        if scope['method'] == 'GET':
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            message = query.get('message', [None])[0]
+            session_id = query.get('session_id', ['default'])[0]
+            model = query.get('model', [None])[0]
+            flush_ms = query.get('flush_ms', [None])[0]
+            render = query.get('render', [None])[0]
+        else:  # POST
+            data = json.loads(await read_body(receive) or b'{}')
+            message = data.get('message')
+            session_id = data.get('session_id', 'default')
+            model = data.get('model')
+            flush_ms = data.get('flush_ms')
+            render = data.get('render')
+
+        if not message:
+            await send_json(send, {'error': 'No message provided'}, 400)
+            return
+        if model and not await run_sync(ollama_manager.ensure_model_running, model):
+            await send_json(send, {'error': f'Model {model} is not available'}, 400)
+            return
+        try:
+            await run_sync(ollama_manager.check_admission, model)
+        except QueueFull as e:
+            await send_json(send, {'error': str(e)}, 503, [(b'retry-after', str(e.retry_after).encode())])
+            return
+
+        timings = RequestTimings(session_id)
+        conversation = await run_sync(begin_chat_turn, session_id, message, timings)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+        stream_task = asyncio.ensure_future(self.generate(send, session_id, conversation, model, timings, flush_ms, render))
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect(receive))
+        done, pending = await asyncio.wait(
+            {stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if stream_task in done:
+            await send({'type': 'http.response.body', 'body': b''})
+        else:
+            logger.info(f"Client disconnected from session {session_id}, cancelled upstream stream")
+
+    async def open_chat_stream(self, admission: Admission, messages: List[Dict], model: str,
+                               timings: RequestTimings):
+        """Send the chat on the admitted instance and read up to the first reply token.
+
+        Returns (response, ticket, chunks) like app.open_chat_stream(). The
+        response is closed and the ticket released on errors and cancellation.
+        """
+        ticket, payload = await run_sync(ollama_manager.prepare_chat_request, messages,
+                                         True, model, timings, admission, chat_options)
+        url = ticket.instance['url']
+        if self.client is None:
+            self.client = _make_client()
+        connect_timeout, read_timeout = ollama_manager.pools.timeout(url, 'read')
+        timeout = httpx.Timeout((connect_timeout, read_timeout, connect_timeout, None))
+        timings.request_sent()
+        response = None
+        try:
+            request = self.client.build_request('POST', f"{url}/api/chat", json=payload)
+            response = await self.client.send(request, stream=True, timeout=timeout)
+            response.raise_for_status()
+            ollama_manager.health.report_success(url)
+            ollama_manager.inventory.mark_loaded(url, ticket.model)
+            chunks = aiter_ndjson(response.aiter_bytes())
+            head = []
+            async for chunk in chunks:
+                head.append(chunk)
+                if chunk.get('done') or chunk.get('message', {}).get('content'):
+                    break
+        except BaseException:
+            ticket.release()
+            if response is not None:
+                await response.aclose()
+            raise
+        return response, ticket, _resume(head, chunks)
+
+    async def open_reply_stream(self, admission: Admission, messages: List[Dict], model: str,
+                                timings: RequestTimings, exclude: set):
+        """open_chat_stream(), hedged on a second instance if the first token is late."""
+        hedging = ollama_manager.hedging
+        if not hedging.enabled:
+            return admission, await self.open_chat_stream(admission, messages, model, timings)
+        timings.request_sent()
+        winner, stream, outcome = await arace(
+            lambda entrant: self.open_chat_stream(entrant, messages, model, RequestTimings()),
+            close_chat_stream,
+            admission,
+            lambda: ollama_manager.hedge_admission(admission, exclude),
+            hedging,
+            admission.model,
+            partial(report_race_failure, timings)
+        )
+        record_race(timings, winner, outcome)
+        return winner, stream
+
+    async def ollama_events(self, messages: List[Dict], model: str, timings: RequestTimings):
+        """Yield queue positions while waiting for a slot, then content pieces from an
+        Ollama /api/chat NDJSON stream, failing over mid-stream like the Flask mode.
+        """
+        failover = Failover(messages, failover_settings)
+        try:
+            while True:
+                # Called on the loop so a cancellation cannot strand a granted slot in a worker thread;
+                # admit() only reads the health and inventory snapshots, so it never blocks the loop
+                admission = ollama_manager.admit(model, timings, exclude=failover.failed)
+                url = None
+                try:
+                    with timings.span('queue'):
+                        async for position in admission.aupdates():
+                            yield 'queue_position', position
+                    url = admission.ticket.instance['url']
+                    admission, (response, ticket, chunks) = await self.open_reply_stream(
+                        admission, failover.messages(), model, timings, failover.failed)
+                    url = admission.ticket.instance['url']
+                    try:
+                        done = False
+                        async for chunk in chunks:
+                            if 'message' in chunk:
+                                content = chunk['message'].get('content', '')
+                                if content:
+                                    ticket.first_token()
+                                    timings.first_byte()
+                                    failover.record(content)
+                                    yield 'chunk', content
+                            done = chunk.get('done', False)
+                        if not done:
+                            raise StreamInterrupted(f"Stream from {url} ended before the reply was complete")
+                        return
+                    finally:
+                        ticket.release()
+                        await response.aclose()
+                except UPSTREAM_ERRORS + (StreamInterrupted,) as e:
+                    if url is None:
+                        raise
+                    ollama_manager.stream_failed(url, e)
+                    timings.failed_over.append(url)
+                    if not failover.should_retry(url, e):
+                        raise
+                finally:
+                    admission.cancel()
+        finally:
+            timings.stream_ended()
+
+    async def generate(self, send, session_id: str, conversation: Dict, model: Optional[str] = None,
+                       timings: Optional[RequestTimings] = None, flush_ms=None, render=None):
+        async def emit(payload: Dict):
+            await send({'type': 'http.response.body', 'body': sse_event(payload).encode('utf-8'), 'more_body': True})
+
+        async def relay(text: str):
+            timings.bytes_streamed += len(text.encode('utf-8'))
+            await emit({'chunk': text, **rendered(renderer, text)})
+            if streaming:
+                streaming.feed(text)
+                for piece in streaming.ready():
+                    await emit({'translation_chunk': piece,
+                                **rendered(translation_renderer, piece, 'translation_html')})
+
+        timings = timings or RequestTimings(session_id)
+        batcher = chunk_batcher(flush_ms)
+        renderer = markdown_renderer(render)
+        translation_renderer = markdown_renderer(render)
+        events = None
+        streaming = None
+        try:
+            full_response = []
+            loop = asyncio.get_event_loop()
+            streaming = start_streaming_translation(
+                conversation, lambda func, *args: loop.run_in_executor(translation_executor, func, *args))
+            model_name, messages = await run_sync(build_prompt, conversation, model, timings)
+            timings.source, events = response_cache.astream(
+                response_cache.key(model_name, messages, chat_options),
+                lambda: self.ollama_events(messages, model_name, timings)
+            )
+            # Flushed on time even while the model pauses
+            events = abatched(events, batcher)
+            async for kind, content in events:
+                if kind == 'queue_position':
+                    await emit({'queue_position': content})
+                    continue
+                full_response.append(content)
+                await relay(content)
+            if renderer:
+                await emit(rendered_end(renderer))
+
+            full_text = ''.join(full_response)
+            if streaming:
+                with timings.span('translate_out'):
+                    streaming.finish()
+                    async for piece in streaming.adrain():
+                        await emit({'translation_chunk': piece,
+                                    **rendered(translation_renderer, piece, 'translation_html')})
+                await emit({'translation': streaming.text(),
+                            **rendered_end(translation_renderer, 'translation_html')})
+            elif full_text:
+                target_lang = conversation['language']
+                if target_lang != 'en':
+                    with timings.span('translate_out'):
+                        translated_response = await run_sync(
+                            translator.translate_from_english, full_text, target_lang)
+                    await emit({'translation': translated_response,
+                                **rendered_end(translation_renderer, 'translation_html', translated_response)})
+
+            await run_sync(finish_chat_turn, session_id, conversation, full_text, model_name)
+            await emit({'done': True})
+
+        except asyncio.CancelledError:
+            timings.outcome = 'cancelled'
+            raise
+        except QueueFull as e:
+            timings.outcome = 'rejected'
+            await emit({'error': str(e), 'retry_after': e.retry_after})
+        except Exception as e:
+            timings.outcome = 'error'
+            logger.error(f"Error in generate: {str(e)}")
+            text = batcher.flush()
+            if text:
+                await emit({'chunk': text})
+            await emit({'error': str(e)})
+        finally:
+            if events is not None:
+                await events.aclose()
+            ollama_manager.metrics.observe_request(timings)
+
+
+class WSGIFallback:
+    """Minimal bridge that runs the Flask app for non-streaming routes."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def _environ(self, scope, body: bytes) -> Dict:
+        server = scope.get('server') or ('localhost', PORT)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            key = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key != 'CONTENT_LENGTH':
+                key = f'HTTP_{key}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run(self, environ: Dict) -> Tuple[int, List, bytes]:
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], body
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(receive)
+        status, headers, body = await run_sync(self._run, self._environ(scope, body))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = AsyncChatApp(WSGIFallback(flask_app))
+
+if __name__ == '__main__':
+    import uvicorn
+    logger.info("Starting Ollama chat application (async mode)...")
+    uvicorn.run(app, host='0.0.0.0', port=PORT)
@@ -0,0 +1,307 @@
+# batch.py
+"""Offline batch chats: a JSONL file of conversations in, a JSONL file of replies out.
+
+    python batch.py prompts.jsonl replies.jsonl --concurrency 8
+
+Each input line is {"id": ..., "message": "..."} or {"id": ..., "messages":
+[...]}, optionally with "model" and "language" (detected when missing). The
+items go through the same admission queue, failover, hedging and
+translation as /api/chat, a bounded number at a time. Every result is
+appended to the output as soon as it is done, so running the same command
+again after a crash resumes where it stopped: ids already in the output are
+skipped. POST /api/batch runs the same job inside the server.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from admission import QueueFull
+from health_monitor import StillDiscovering
+from stream_relay import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONFIG = {
+    "concurrency": 0,                # Items in flight; 0 means one per stream slot on the healthy instances
+    "output_dir": "batch_results",   # Input and result files of jobs started with POST /api/batch
+    "retry_failed": True,            # On resume, run items whose previous result was an error again
+    "history": 20,                   # Finished jobs kept for /api/batch
+    "discovery_timeout": 30          # Seconds a job waits for every instance to answer its first probe
+}
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def read_items(path: str) -> Iterator[Dict]:
+    """Items of a JSONL file, read lazily; each gets its 'line' and an 'id' (the line number if missing).
+
+    Lines that are not valid JSON objects come back with an 'error' instead.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                yield {'id': line_no, 'line': line_no, 'error': f"Invalid input line: {str(e)}"}
+                continue
+            item.setdefault('id', line_no)
+            item['line'] = line_no
+            yield item
+
+
+def completed_ids(path: str, retry_failed: bool = True) -> Set:
+    """Ids that already have a result in an output file.
+
+    A line torn by a crash is cut off, so new results start on a fresh line.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            logger.warning(f"Dropping an incomplete last line of {path}")
+            f.truncate(end)
+    done = set()
+    for line in data[:end].splitlines():
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if retry_failed and result.get('error'):
+            continue
+        done.add(result.get('id'))
+    return done
+
+
+class BatchJob:
+    """One run of an input file into an output file, with its counters."""
+
+    def __init__(self, input_path: str, output_path: str, concurrency: Optional[int] = None,
+                 job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0  # Already in the output from an earlier run
+        self.reply_chars = 0
+        self.item_seconds = 0.0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def record(self, result: Dict):
+        if result.get('error'):
+            self.failed += 1
+        else:
+            self.completed += 1
+            self.reply_chars += len(result.get('reply', ''))
+        self.item_seconds += result.get('timings', {}).get('total_ms', 0.0) / 1000
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self) -> Dict:
+        elapsed = self.elapsed()
+        processed = self.completed + self.failed
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'input': self.input_path,
+            'output': self.output_path,
+            'concurrency': self.concurrency,
+            'completed': self.completed,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'elapsed_s': round(elapsed, 2),
+            'throughput': {
+                'items_per_s': round(processed / elapsed, 3) if elapsed else 0.0,
+                'reply_chars_per_s': round(self.reply_chars / elapsed, 1) if elapsed else 0.0,
+                'avg_item_ms': round(self.item_seconds / processed * 1000, 1) if processed else None
+            },
+            'created': self.created,
+            'finished': self.finished
+        }
+
+
+class BatchRunner:
+    """Runs batch jobs with a bounded number of items in flight.
+
+    'run_item(item)' answers one item and returns its result line; it may
+    raise QueueFull or StillDiscovering, in which case the item waits and is
+    tried again. 'capacity()' gives the default concurrency when none is
+    configured. 'wait_discovered(timeout)' blocks until the instances have
+    been probed once, so a job started right after launch neither sizes
+    itself on nor fails against an empty model inventory.
+    """
+
+    def __init__(self, run_item: Callable[[Dict], Dict], capacity: Callable[[], int],
+                 settings: Optional[Dict] = None, wait_discovered: Optional[Callable[[float], bool]] = None):
+        settings = {**DEFAULT_BATCH_CONFIG, **(settings or {})}
+        self.concurrency = settings['concurrency']
+        self.output_dir = settings['output_dir']
+        self.retry_failed = settings['retry_failed']
+        self.history = settings['history']
+        self.discovery_timeout = settings['discovery_timeout']
+        self.run_item = run_item
+        self.capacity = capacity
+        self.wait_discovered = wait_discovered
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, BatchJob]' = OrderedDict()
+
+    def job_paths(self, job_id: str) -> List[str]:
+        """Input and output file of a server-side job."""
+        return [os.path.join(self.output_dir, f"{job_id}.input.jsonl"),
+                os.path.join(self.output_dir, f"{job_id}.jsonl")]
+
+    def submit(self, data: bytes, concurrency: Optional[int] = None) -> BatchJob:
+        """Store an uploaded JSONL file and start a job for it."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex[:12]
+        input_path, output_path = self.job_paths(job_id)
+        with open(input_path, 'wb') as f:
+            f.write(data)
+        return self.start(BatchJob(input_path, output_path, concurrency, job_id))
+
+    def resume(self, job_id: str) -> Optional[BatchJob]:
+        """Run a stopped or crashed server-side job again; None if it is unknown or still running."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            return None
+        input_path, output_path = self.job_paths(job_id)
+        if not os.path.exists(input_path):
+            return None
+        return self.start(BatchJob(input_path, output_path, job.concurrency if job else None, job_id))
+
+    def start(self, job: BatchJob) -> BatchJob:
+        """Run a job on a background thread."""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._jobs.move_to_end(job.id)
+            finished = [key for key, old in self._jobs.items() if not old.active]
+            for key in finished[:max(len(finished) - self.history, 0)]:
+                del self._jobs[key]
+        threading.Thread(target=self.run, args=(job,), name=f"batch-{job.id}", daemon=True).start()
+        logger.info(f"Started batch job {job.id} ({job.input_path})")
+        return job
+
+    def run(self, job: BatchJob) -> BatchJob:
+        """Process the job's input, appending each result to its output as soon as it is done."""
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            done = completed_ids(job.output_path, self.retry_failed)
+            discovery_deadline = time.monotonic() + self.discovery_timeout
+            if self.wait_discovered and not self.wait_discovered(self.discovery_timeout):
+                logger.warning(f"Batch job {job.id}: some instances have not answered their first probe "
+                               f"after {self.discovery_timeout}s, starting anyway")
+            job.concurrency = max(job.concurrency or self.concurrency or self.capacity(), 1)
+            slots = threading.BoundedSemaphore(job.concurrency)
+            write_lock = threading.Lock()
+
+            with open(job.output_path, 'a', encoding='utf-8') as out:
+                def process(item: Dict):
+                    try:
+                        result = item if 'error' in item else self._answer(item, discovery_deadline)
+                        with write_lock:
+                            out.write(dumps(result) + '\n')
+                            out.flush()
+                            job.record(result)
+                    finally:
+                        slots.release()
+
+                with ThreadPoolExecutor(max_workers=job.concurrency, thread_name_prefix='batch') as pool:
+                    for item in read_items(job.input_path):
+                        if item['id'] in done:
+                            job.skipped += 1
+                            continue
+                        slots.acquire()  # Keeps memory flat however long the input is
+                        pool.submit(process, item)
+            job.status = DONE
+            logger.info(f"Batch job {job.id} done: {job.completed} completed, {job.failed} failed, "
+                        f"{job.skipped} skipped in {job.elapsed():.1f}s")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"Batch job {job.id} failed: {str(e)}")
+        finally:
+            job.finished = time.time()
+        return job
+
+    def _answer(self, item: Dict, discovery_deadline: float) -> Dict:
+        while True:
+            try:
+                return self.run_item(item)
+            except QueueFull as e:
+                time.sleep(e.retry_after)
+            except StillDiscovering as e:
+                if time.monotonic() >= discovery_deadline:
+                    return {'id': item['id'], 'line': item['line'], 'error': str(e)}
+                time.sleep(e.retry_after)
+            except Exception as e:
+                return {'id': item['id'], 'line': item['line'], 'error': str(e)}
+
+    def job(self, job_id: str) -> Optional[BatchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Dict]:
+        """Batch jobs, newest first."""
+        with self._lock:
+            return [job.as_dict() for job in reversed(self._jobs.values())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSONL file of conversations')
+    parser.add_argument('output', help='JSONL file the results are appended to; also the resume checkpoint')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Items in flight (default: batch.concurrency, else one per stream slot)')
+    parser.add_argument('--summary', default=None, help='Also write the job summary to this JSON file')
+    args = parser.parse_args()
+
+    # Loads the instance config and starts the health monitor, like the server does
+    from app import batch_runner, ollama_manager
+
+    try:
+        job = batch_runner.run(BatchJob(args.input, args.output, args.concurrency))
+    finally:
+        # No probe may still be running, or starting warmups, while the interpreter exits
+        ollama_manager.stop_health_monitor()
+    summary = job.as_dict()
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0 if job.status == DONE else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
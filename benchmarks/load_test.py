@@ -0,0 +1,172 @@
+# benchmarks/load_test.py
+"""Drive /api/chat with concurrent SSE sessions and report latency percentiles.
+
+    python benchmarks/load_test.py --url http://localhost:5012 --sessions 50 --requests 500 \\
+        --report results.json --baseline previous.json
+
+Each session is a thread with its own session_id that sends chats one after
+another until the request budget (or --duration) is used up. The report
+holds time-to-first-chunk, inter-chunk latency, request duration,
+throughput and error rate; --baseline prints how each metric moved.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import compare, latency_summary, write_report  # noqa: E402
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ttfc = []
+        self.inter_chunk = []
+        self.durations = []
+        self.completed = 0
+        self.chunks = 0
+        self.errors = Counter()
+
+    def record(self, ttfc, gaps, duration, chunks, error):
+        with self.lock:
+            self.chunks += chunks
+            if error:
+                self.errors[error] += 1
+                return
+            self.completed += 1
+            self.ttfc.append(ttfc)
+            self.inter_chunk.extend(gaps)
+            self.durations.append(duration)
+
+
+def chat(http: requests.Session, args, session_id: str, results: Results):
+    params = {'session_id': session_id, 'message': args.message}
+    if args.model:
+        params['model'] = args.model
+    if args.flush_ms is not None:
+        params['flush_ms'] = args.flush_ms
+    started = time.perf_counter()
+    ttfc, last, gaps, chunks, error, done = None, None, [], 0, None, False
+    try:
+        with http.get(f'{args.url}/api/chat', params=params, stream=True, timeout=args.timeout) as response:
+            if response.status_code != 200:
+                error = f'http_{response.status_code}'
+            else:
+                for line in response.iter_lines():
+                    if not line.startswith(b'data: '):
+                        continue
+                    event = json.loads(line[6:])
+                    if 'error' in event:
+                        error = 'error_event'
+                        break
+                    if event.get('chunk'):
+                        now = time.perf_counter()
+                        if ttfc is None:
+                            ttfc = now - started
+                        else:
+                            gaps.append(now - last)
+                        last = now
+                        chunks += 1
+                    if event.get('done'):
+                        done = True
+                        break
+                if not error and not done:
+                    error = 'incomplete_stream'
+    except requests.Timeout:
+        error = 'timeout'
+    except requests.RequestException:
+        error = 'connection_error'
+    if not error and ttfc is None:
+        error = 'no_chunks'
+    results.record(ttfc, gaps, time.perf_counter() - started, chunks, error)
+
+
+def session_worker(args, budget: threading.Semaphore, deadline: float, results: Results):
+    http = requests.Session()
+    session_id = f'load-{uuid.uuid4().hex[:12]}'
+    while time.perf_counter() < deadline and budget.acquire(blocking=False):
+        if args.fresh_sessions:
+            session_id = f'load-{uuid.uuid4().hex[:12]}'
+        chat(http, args, session_id, results)
+        if args.think_time:
+            time.sleep(args.think_time)
+    if not args.fresh_sessions:
+        try:
+            http.post(f'{args.url}/api/reset', json={'session_id': session_id}, timeout=args.timeout)
+        except requests.RequestException:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5012', help='Base URL of the chat app')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent chat sessions')
+    parser.add_argument('--requests', type=int, default=100, help='Total chats across all sessions')
+    parser.add_argument('--duration', type=float, default=None, help='Stop starting chats after this many seconds')
+    parser.add_argument('--message', default='Explain what a load balancer does in two sentences.')
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--flush-ms', type=float, default=None, help='Flush window the server batches tokens into')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Seconds a session waits between chats')
+    parser.add_argument('--fresh-sessions', action='store_true', help='New session_id for every chat')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--label', default=None, help='Free-form name stored in the report')
+    parser.add_argument('--report', default='load_test_report.json')
+    parser.add_argument('--baseline', default=None, help='Earlier report to compare against')
+    args = parser.parse_args()
+
+    results = Results()
+    budget = threading.Semaphore(args.requests)
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else float('inf')
+    workers = [threading.Thread(target=session_worker, args=(args, budget, deadline, results), daemon=True)
+               for _ in range(args.sessions)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+
+    attempted = results.completed + sum(results.errors.values())
+    report = {
+        'label': args.label,
+        'config': {key: value for key, value in vars(args).items() if key not in ('report', 'baseline')},
+        'wall_seconds': round(wall, 2),
+        'requests': attempted,
+        'completed': results.completed,
+        'error_rate': round(sum(results.errors.values()) / attempted, 4) if attempted else 0.0,
+        'errors': dict(results.errors),
+        'throughput': {
+            'requests_per_s': round(results.completed / wall, 2),
+            'chunks_per_s': round(results.chunks / wall, 1),
+        },
+        'time_to_first_chunk': latency_summary(results.ttfc),
+        'inter_chunk': latency_summary(results.inter_chunk),
+        'request_duration': latency_summary(results.durations),
+    }
+    write_report(args.report, report)
+
+    ttfc = report['time_to_first_chunk']
+    print(f"{attempted} chats in {wall:.1f}s, {report['throughput']['requests_per_s']} req/s, "
+          f"error rate {report['error_rate']:.2%}")
+    print(f"TTFC p50/p95/p99: {ttfc['p50_ms']} / {ttfc['p95_ms']} / {ttfc['p99_ms']} ms")
+    print(f"Report written to {args.report}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared to {args.baseline}:")
+        for line in compare({key: report[key] for key in ('error_rate', 'throughput', 'time_to_first_chunk',
+                                                          'inter_chunk', 'request_duration')}, baseline):
+            print(f"  {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+# benchmarks/mock_ollama.py
+"""Stand-in Ollama server for load testing without GPUs.
+
+    python benchmarks/mock_ollama.py --ports 11501 11502 --token-rate 40 --failure-rate 0.01
+
+Implements /api/tags, /api/ps, /api/version, /api/chat (NDJSON streaming or
+a single JSON reply) and /api/pull. Token rate, jitter, cold-load delay,
+failures, dropped streams and stalls are configurable so the proxy can be
+measured under realistic and adverse conditions. Models unload when their
+keep_alive runs out, so the next chat pays the cold-load delay again.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the model streams a reply one token at a time so the proxy can be measured "
+         "under load with realistic pacing and sentence boundaries.").split()
+
+
+def timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def parse_duration(value) -> float:
+    """Ollama keep_alive: seconds as a number, or a duration string like '30s', '5m', '1h'."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    value = str(value).strip()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class MockOllama:
+    """Behaviour and model state shared by the handlers of one mock instance."""
+
+    def __init__(self, args, port: int):
+        self.args = args
+        self.random = random.Random(None if args.seed is None else args.seed + port)
+        self.lock = threading.Lock()
+        self.installed = [name for name in args.models.split(',') if name]
+        loaded = args.loaded.split(',') if args.loaded is not None else self.installed
+        self.loaded = [name for name in loaded if name]
+        self.expires = {}  # model -> time its keep_alive runs out
+
+    def loaded_models(self) -> list:
+        """Loaded models, unloading the ones whose keep_alive ran out."""
+        now = time.time()
+        with self.lock:
+            self.loaded = [name for name in self.loaded if self.expires.get(name, now + 1) > now]
+            return list(self.loaded)
+
+    def touch(self, model: str, keep_alive):
+        """Restart the model's keep_alive timer like Ollama does on every request."""
+        seconds = parse_duration(keep_alive if keep_alive is not None else '5m')
+        with self.lock:
+            self.expires[model] = float('inf') if seconds < 0 else time.time() + seconds
+
+    def roll(self, probability: float) -> bool:
+        with self.lock:
+            return self.random.random() < probability
+
+    def token_delay(self) -> float:
+        delay = 1.0 / self.args.token_rate
+        with self.lock:
+            jitter = self.random.uniform(-self.args.jitter, self.args.jitter)
+        return max(0.0, delay * (1 + jitter))
+
+    def model_info(self, name: str) -> dict:
+        return {'name': name, 'model': name, 'size': 4_700_000_000,
+                'digest': f'{abs(hash(name)):064x}'[:64], 'modified_at': timestamp()}
+
+
+def make_handler(mock: MockOllama):
+    args = mock.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def send_json(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def start_stream(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+        def send_line(self, payload: dict):
+            line = (json.dumps(payload) + '\n').encode()
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+            self.wfile.flush()
+
+        def end_stream(self):
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+
+        def read_json(self) -> dict:
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if self.path == '/api/tags':
+                self.send_json({'models': [mock.model_info(name) for name in mock.installed]})
+            elif self.path == '/api/ps':
+                self.send_json({'models': [mock.model_info(name) for name in mock.loaded_models()]})
+            elif self.path == '/api/version':
+                self.send_json({'version': '0.0.0-mock'})
+            else:
+                self.send_json({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            if self.path == '/api/chat':
+                self.chat(self.read_json())
+            elif self.path == '/api/pull':
+                self.pull(self.read_json())
+            else:
+                self.send_json({'error': 'not found'}, 404)
+
+        def chat(self, body: dict):
+            model = body.get('model', '')
+            if model not in mock.installed:
+                self.send_json({'error': f'model "{model}" not found, try pulling it first'}, 404)
+                return
+            if mock.roll(args.failure_rate):
+                self.send_json({'error': 'injected failure'}, 500)
+                return
+
+            started = time.perf_counter()
+            if model not in mock.loaded_models():
+                time.sleep(args.load_delay)
+                with mock.lock:
+                    if model not in mock.loaded:
+                        mock.loaded.append(model)
+            mock.touch(model, body.get('keep_alive'))
+            if not body.get('messages'):
+                # An empty chat only loads the model
+                self.send_json({'model': model, 'created_at': timestamp(),
+                                'message': {'role': 'assistant', 'content': ''},
+                                'done': True, 'done_reason': 'load'})
+                return
+            time.sleep(args.first_token_delay)
+
+            # A trailing assistant message is a prefill: continue it instead of starting over
+            messages = body.get('messages') or [{}]
+            start = len(messages[-1].get('content', '').split()) if messages[-1].get('role') == 'assistant' else 0
+            tokens = [(' ' if index else '') + WORDS[index % len(WORDS)] for index in range(start, args.tokens)]
+            if not body.get('stream', True):
+                time.sleep(sum(mock.token_delay() for _ in tokens))
+                self.send_json({'model': model, 'created_at': timestamp(),
+                                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                                'done': True, 'done_reason': 'stop', 'eval_count': len(tokens),
+                                'total_duration': int((time.perf_counter() - started) * 1e9)})
+                return
+
+            drop_at = self.random_index(args.drop_rate)
+            stall_at = self.random_index(args.stall_rate)
+            self.start_stream()
+            try:
+                for index, token in enumerate(tokens):
+                    if index == drop_at:
+                        self.close_connection = True
+                        return  # Connection closes without the terminating chunk
+                    if index == stall_at:
+                        time.sleep(args.stall_seconds)
+                    self.send_line({'model': model, 'created_at': timestamp(),
+                                    'message': {'role': 'assistant', 'content': token}, 'done': False})
+                    time.sleep(mock.token_delay())
+                self.send_line({'model': model, 'created_at': timestamp(),
+                                'message': {'role': 'assistant', 'content': ''},
+                                'done': True, 'done_reason': 'stop', 'eval_count': len(tokens),
+                                'total_duration': int((time.perf_counter() - started) * 1e9)})
+                self.end_stream()
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def random_index(self, probability: float):
+            if args.tokens and mock.roll(probability):
+                with mock.lock:
+                    return mock.random.randrange(args.tokens)
+            return None
+
+        def pull(self, body: dict):
+            model = body.get('model') or body.get('name', '')
+            total = 4_700_000_000
+            steps = max(1, int(args.pull_seconds * 10))
+            if not body.get('stream', True):
+                time.sleep(args.pull_seconds)
+            else:
+                self.start_stream()
+                self.send_line({'status': 'pulling manifest'})
+                for step in range(1, steps + 1):
+                    time.sleep(args.pull_seconds / steps)
+                    self.send_line({'status': 'downloading', 'digest': 'sha256:mock',
+                                    'total': total, 'completed': total * step // steps})
+                self.send_line({'status': 'verifying sha256 digest'})
+            with mock.lock:
+                if model and model not in mock.installed:
+                    mock.installed.append(model)
+            if body.get('stream', True):
+                self.send_line({'status': 'success'})
+                self.end_stream()
+            else:
+                self.send_json({'status': 'success'})
+
+    return Handler
+
+
+def serve(args, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((args.host, port), make_handler(MockOllama(args, port)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'mock-ollama-{port}', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ports', type=int, nargs='+', default=[11501],
+                        help='One independent mock instance per port')
+    parser.add_argument('--models', default='llama3:8b,mistral:latest', help='Installed models')
+    parser.add_argument('--loaded', default=None, help='Models already in memory (default: all installed)')
+    parser.add_argument('--tokens', type=int, default=60, help='Tokens per reply')
+    parser.add_argument('--token-rate', type=float, default=30.0, help='Tokens per second per stream')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Random +/- fraction of each token delay')
+    parser.add_argument('--first-token-delay', type=float, default=0.1, help='Seconds of prompt processing')
+    parser.add_argument('--load-delay', type=float, default=2.0, help='Extra seconds when the model is cold')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Chance a chat fails with HTTP 500')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Chance a stream is cut off midway')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='Chance a stream pauses midway')
+    parser.add_argument('--stall-seconds', type=float, default=5.0)
+    parser.add_argument('--pull-seconds', type=float, default=3.0, help='Duration of a simulated pull')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    servers = [serve(args, port) for port in args.ports]
+    print(f"Mock Ollama listening on {', '.join(f'http://{args.host}:{port}' for port in args.ports)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
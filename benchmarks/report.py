@@ -0,0 +1,50 @@
+# benchmarks/report.py
+"""Percentiles and JSON reports shared by the benchmark scripts."""
+import json
+import platform
+import time
+from typing import Dict, List, Optional
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    """p50/p95/p99/mean/max of samples in seconds, reported in milliseconds."""
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+    return {
+        'count': len(samples),
+        'p50_ms': ms(percentile(samples, 50)),
+        'p95_ms': ms(percentile(samples, 95)),
+        'p99_ms': ms(percentile(samples, 99)),
+        'mean_ms': ms(sum(samples) / len(samples) if samples else None),
+        'max_ms': ms(max(samples) if samples else None),
+    }
+
+
+def write_report(path: str, report: Dict):
+    report = {'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'host': platform.node(), 'python': platform.python_version(), **report}
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def compare(current: Dict, baseline: Dict, prefix: str = '') -> List[str]:
+    """Lines describing how every numeric metric moved against a baseline report."""
+    lines = []
+    for key, value in current.items():
+        name = f'{prefix}{key}'
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            lines.extend(compare(value, old or {}, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(old, (int, float)):
+            change = f'{(value - old) / old * 100:+.1f}%' if old else 'n/a'
+            lines.append(f'{name}: {old} -> {value} ({change})')
+    return lines
@@ -0,0 +1,87 @@
+# benchmarks/translation_benchmark.py
+"""Compare translation latency of the configured backends.
+
+    python benchmarks/translation_benchmark.py --backends google local --runs 5
+
+Translates a fixed set of sentences English -> target one at a time, then
+all at once from a thread pool (which lets the local backend batch), and
+prints latency percentiles per backend.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import latency_summary  # noqa: E402
+from translator import create_translation_backend  # noqa: E402
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Could you explain how a hash map handles collisions?",
+    "Here is a short example written in Python.",
+    "Remember to close the file when you are done with it.",
+    "The results depend on the size of the input.",
+    "Let me know if you have any other questions.",
+    "This approach is simple, but it does not scale well.",
+    "You can install the package with pip.",
+]
+
+
+def timed_translate(backend, text, dest):
+    started = time.perf_counter()
+    backend.translate(text, dest, 'en')
+    return time.perf_counter() - started
+
+
+def run(name, settings, dest, runs, concurrency):
+    backend = create_translation_backend({**settings, 'backend': name})
+
+    started = time.perf_counter()
+    backend.translate(SENTENCES[0], dest, 'en')
+    warmup = time.perf_counter() - started
+
+    sequential = [timed_translate(backend, text, dest) for _ in range(runs) for text in SENTENCES]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        concurrent = list(pool.map(lambda text: timed_translate(backend, text, dest), SENTENCES * runs))
+        wall = time.perf_counter() - started
+
+    return {
+        'warmup_ms': round(warmup * 1000, 1),
+        'sequential': latency_summary(sequential),
+        'concurrent': {**latency_summary(concurrent),
+                       'sentences_per_s': round(len(concurrent) / wall, 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['google', 'local'])
+    parser.add_argument('--dest', default='sv', help='Target language')
+    parser.add_argument('--runs', type=int, default=3, help='Passes over the sentence set')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--config', default='ollama_config.json',
+                        help='Reads the "translation" section for backend settings')
+    args = parser.parse_args()
+
+    settings = {}
+    if os.path.exists(args.config):
+        with open(args.config) as f:
+            settings = json.load(f).get('translation', {})
+
+    report = {}
+    for name in args.backends:
+        try:
+            report[name] = run(name, settings, args.dest, args.runs, args.concurrency)
+        except Exception as e:
+            report[name] = {'error': str(e)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
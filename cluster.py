@@ -0,0 +1,253 @@
+# cluster.py
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker becomes a leader and probes on its own
+    fcntl = None
+
+from health_monitor import HealthMonitor
+from model_inventory import ModelInventory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLUSTER_CONFIG = {
+    "state_dir": None,      # Shared state and leader lock; default /dev/shm/llm_chat_lite, else the temp dir
+    "sync_interval": 1.0    # Seconds between publishing (leader) or copying (other workers) the shared state
+}
+
+
+def default_state_dir() -> str:
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'llm_chat_lite')
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedState:
+    """JSON values by key in a SQLite file that all worker processes of a host open."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated REAL NOT NULL
+            )""")
+
+    def put(self, key: str, value: Dict):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO state (key, value, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                (key, json.dumps(value), time.time())
+            )
+
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        """(value, time it was written), or None."""
+        with self._lock:
+            row = self._db.execute("SELECT value, updated FROM state WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+
+class SharedSlots:
+    """Stream slots per instance, counted across all worker processes of a host.
+
+    Each worker's open streams are one row per (instance, pid). take() reads
+    the instance's total and adds one in a single IMMEDIATE transaction, so
+    the workers together never exceed an instance's limit. Rows of workers
+    that exited without releasing their slots are removed by sweep().
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_CLUSTER_CONFIG, **(settings or {})}
+        state_dir = settings['state_dir'] or default_state_dir()
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, 'state.db')
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS slots (
+                url TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                streams INTEGER NOT NULL,
+                PRIMARY KEY (url, pid)
+            )""")
+            # Left behind by an earlier process that had this pid
+            self._db.execute("DELETE FROM slots WHERE pid = ?", (self.pid,))
+
+    def take(self, url: str, limit: int) -> bool:
+        """Count a new stream on the instance if all workers together have fewer than 'limit'."""
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    total = self._db.execute(
+                        "SELECT COALESCE(SUM(streams), 0) FROM slots WHERE url = ?", (url,)).fetchone()[0]
+                    if total >= limit:
+                        self._db.rollback()
+                        return False
+                    self._db.execute(
+                        "INSERT INTO slots (url, pid, streams) VALUES (?, ?, 1) "
+                        "ON CONFLICT(url, pid) DO UPDATE SET streams = streams + 1",
+                        (url, self.pid)
+                    )
+                    self._db.commit()
+                except BaseException:
+                    self._db.rollback()
+                    raise
+            except sqlite3.Error as e:
+                logger.error(f"Could not take a shared stream slot on {url}: {str(e)}")
+                return False
+        return True
+
+    def release(self, url: str):
+        with self._lock, self._db:
+            self._db.execute("UPDATE slots SET streams = MAX(streams - 1, 0) WHERE url = ? AND pid = ?",
+                             (url, self.pid))
+
+    def sweep(self) -> int:
+        """Drop the slots of workers that are gone; the number of workers swept."""
+        if fcntl is None:
+            return 0  # No leader election (and no signal 0) on Windows
+        with self._lock:
+            pids = [row[0] for row in self._db.execute("SELECT DISTINCT pid FROM slots")]
+            dead = [pid for pid in pids if not _alive(pid)]
+            if dead:
+                with self._db:
+                    self._db.executemany("DELETE FROM slots WHERE pid = ?", [(pid,) for pid in dead])
+        if dead:
+            logger.info(f"Released the stream slots of exited workers {dead}")
+        return len(dead)
+
+    def in_flight(self) -> Dict[str, int]:
+        """Open streams per instance across all workers."""
+        with self._lock:
+            return dict(self._db.execute("SELECT url, SUM(streams) FROM slots GROUP BY url").fetchall())
+
+
+class LeaderLock:
+    """An exclusive lock on a file, held by at most one live process.
+
+    The OS releases it when the holder exits, even after a crash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        f = open(self.path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+
+class ClusterSync:
+    """Shares one worker's health and model inventory with the other workers.
+
+    Every worker tries to take the leader lock. The leader runs the health
+    monitor and publishes its snapshots; the others never probe and copy the
+    published state every 'sync_interval' seconds. When the leader exits,
+    the next worker to try takes over. A circuit that opens on a
+    follower's request path asks the leader to probe right away.
+    """
+
+    def __init__(self, health: HealthMonitor, inventory: ModelInventory, settings: Optional[Dict] = None,
+                 slots: Optional[SharedSlots] = None):
+        settings = {**DEFAULT_CLUSTER_CONFIG, **(settings or {})}
+        self.state_dir = settings['state_dir'] or default_state_dir()
+        self.interval = settings['sync_interval']
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.state = SharedState(os.path.join(self.state_dir, 'state.db'))
+        self.lock = LeaderLock(os.path.join(self.state_dir, 'leader.lock'))
+        self.health = health
+        self.inventory = inventory
+        self.slots = slots
+        self.is_leader = False
+        self._applied = 0.0
+        self._seen_wake = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        health.add_state_listener(self._on_state_change)
+
+    def start(self):
+        self.sync()
+        self._thread = threading.Thread(target=self._run, name='cluster-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Cluster state sync failed: {str(e)}")
+
+    def sync(self):
+        if not self.is_leader and self.lock.try_acquire():
+            self.is_leader = True
+            logger.info(f"Worker {os.getpid()} leads: probing instances for all workers")
+            self.health.start()
+        if self.is_leader:
+            wake = self.state.get('wake')
+            if wake and wake[1] > self._seen_wake:
+                self._seen_wake = wake[1]
+                self.health.wake()
+            self.state.put('snapshot', {'health': self.health.snapshot, 'inventory': self.inventory.snapshot})
+            if self.slots:
+                self.slots.sweep()
+            return
+        published = self.state.get('snapshot')
+        if published and published[1] > self._applied:
+            self._applied = published[1]
+            self.health.apply(published[0]['health'])
+            self.inventory.replace(published[0]['inventory'])
+
+    def _on_state_change(self, url: str, previous: str, state: str):
+        # Fired for changes seen by this worker only; copied snapshots do not notify
+        if not self.is_leader and state == 'open':
+            self.state.put('wake', {'url': url, 'pid': os.getpid()})
+
+    def stats(self) -> Dict:
+        return {
+            'pid': os.getpid(),
+            'leader': self.is_leader,
+            'state_dir': self.state_dir,
+            'in_flight': self.slots.in_flight() if self.slots else None,
+            'last_sync_age_s': round(time.time() - self._applied, 1) if self._applied else None
+        }
@@ -1,6 +1,12 @@
 # config.py
 import json
+import logging
 import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = {
     "theme": "dark",  # or "bright"
@@ -12,31 +18,176 @@ DEFAULT_CONFIG = {
 
 CONFIG_PATH = "config.json"
 
+POLL_INTERVAL = 2.0  # Seconds between mtime checks of watched config files
+
+# Read once: os.umask() can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_json_atomic(path: str, data: Dict):
+    """Write JSON to a temporary file next to 'path' and rename it into place.
+
+    Readers see either the old or the new file, never a half-written one.
+    The file keeps its permissions; a new one gets the usual 0666 & ~umask
+    rather than mkstemp's 0600.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ConfigFile:
+    """A JSON config file parsed once and cached in memory.
+
+    get() never touches the disk: a background watcher compares the file's
+    mtime every POLL_INTERVAL seconds and re-parses it when it changed,
+    then notifies listeners. save() writes atomically and updates the cache
+    at once. If 'default' is given, a missing or invalid file is replaced
+    with it; otherwise the last good version is kept.
+    """
+
+    def __init__(self, path: str, default: Optional[Dict] = None,
+                 validate: Optional[Callable[[Dict], bool]] = None):
+        self.path = path
+        self.default = default
+        self.validate = validate or (lambda data: True)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._mtime: Optional[float] = None
+        self._data: Dict = self._load()
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> Dict:
+        mtime = self._stat()
+        try:
+            if mtime is None:
+                raise FileNotFoundError(self.path)
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if not self.validate(data):
+                raise ValueError("missing required fields")
+        except (json.JSONDecodeError, FileNotFoundError, ValueError) as e:
+            if self.default is None:
+                raise
+            logger.warning(f"Error loading {self.path}: {e}, using default")
+            data = json.loads(json.dumps(self.default))
+            self.save(data)
+            return data
+        self._mtime = mtime
+        return data
+
+    def get(self) -> Dict:
+        """The cached config. Treat it as read-only; change it with save()."""
+        return self._data
+
+    def save(self, data: Dict):
+        with self._lock:
+            write_json_atomic(self.path, data)
+            self._mtime = self._stat()
+            self._data = data
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        """Call listener(new_config) after the file changed on disk."""
+        self._listeners.append(listener)
+
+    def check(self) -> bool:
+        """Re-parse the file if its mtime changed; True if a new version was loaded."""
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+        with self._lock:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if not self.validate(data):
+                    raise ValueError("missing required fields")
+            except (json.JSONDecodeError, OSError, ValueError) as e:
+                logger.error(f"Ignoring invalid change to {self.path}: {e}")
+                self._mtime = mtime  # Don't retry until it changes again
+                return False
+            self._mtime = mtime
+            self._data = data
+        logger.info(f"Reloaded {self.path}")
+        for listener in self._listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f"Config listener for {self.path} failed: {str(e)}")
+        return True
+
+
+class ConfigWatcher:
+    """Background thread that polls watched config files for changes."""
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self._files: List[ConfigFile] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, config_file: ConfigFile) -> ConfigFile:
+        self._files.append(config_file)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+            self._thread.start()
+        return config_file
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for config_file in list(self._files):
+                try:
+                    config_file.check()
+                except Exception as e:
+                    logger.error(f"Could not check {config_file.path}: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
+
+
+watcher = ConfigWatcher()
+
+_app_config: Optional[ConfigFile] = None
+_app_config_lock = threading.Lock()
+
+
+def app_config() -> ConfigFile:
+    """The watched UI config file (config.json), created with defaults if missing."""
+    global _app_config
+    if _app_config is None:
+        with _app_config_lock:
+            if _app_config is None:
+                _app_config = watcher.watch(ConfigFile(
+                    CONFIG_PATH, DEFAULT_CONFIG, lambda data: all(key in data for key in DEFAULT_CONFIG)))
+    return _app_config
+
 def ensure_config_exists():
     """Create config file if it doesn't exist"""
-    if not os.path.exists(CONFIG_PATH):
-        save_config(DEFAULT_CONFIG)
-        print(f"Created new config file at {CONFIG_PATH}")
+    app_config()
 
 def load_config():
-    ensure_config_exists()
-    try:
-        with open(CONFIG_PATH, 'r') as f:
-            config = json.load(f)
-            # Validate config has required fields
-            if not all(key in config for key in DEFAULT_CONFIG.keys()):
-                print("Invalid config file, resetting to default")
-                save_config(DEFAULT_CONFIG)
-                return DEFAULT_CONFIG
-            return config
-    except (json.JSONDecodeError, FileNotFoundError) as e:
-        print(f"Error loading config: {e}, using default")
-        save_config(DEFAULT_CONFIG)
-        return DEFAULT_CONFIG
+    return app_config().get()
 
 def save_config(config):
-    with open(CONFIG_PATH, 'w') as f:
-        json.dump(config, f, indent=4)
+    app_config().save(config)
 
 def get_current_theme():
     config = load_config()
@@ -46,7 +197,7 @@ def get_current_theme():
 def set_theme(theme_name):
     if theme_name not in ['dark', 'bright']:
         raise ValueError("Invalid theme name. Use 'dark' or 'bright'")
-    
-    config = load_config()
+
+    config = dict(load_config())
     config['theme'] = theme_name
-    save_config(config)
\ No newline at end of file
+    save_config(config)
@@ -0,0 +1,221 @@
+# connection_pool.py
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONFIG = {
+    "pool_maxsize": 10,         # Keep-alive connections kept per instance
+    "pool_block": False,        # Wait for a free connection instead of opening extra ones
+    "connect_timeout": 2.0,     # Seconds to establish the TCP connection
+    "read_timeout": 120.0,      # Seconds between bytes on chat streams (covers model load)
+    "health_timeout": 2.0,      # Seconds to wait for health/tags responses
+    "pull_timeout": None,       # Model pulls can take minutes
+    "max_retries": 2,           # Retries on connect errors and 502/503/504 for GETs
+    "backoff_factor": 0.2,
+    "tcp_keepalive": True,
+    "async_max_connections": 1000  # Upstream connection cap for the async serving mode
+}
+
+
+class PoolStats:
+    """Thread-safe counters for one instance's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            reused = max(self.checkouts - self.new_connections, 0)
+            return {
+                'checkouts': self.checkouts,
+                'new_connections': self.new_connections,
+                'reused_connections': reused,
+                'reuse_ratio': round(reused / self.checkouts, 4) if self.checkouts else 0.0,
+                'avg_checkout_wait_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_checkout_wait_ms': round(self.wait_max * 1000, 3)
+            }
+
+
+# Per thread: called with each connection the thread checks out (see watch_checkouts)
+_checkouts = threading.local()
+
+
+@contextmanager
+def watch_checkouts(callback: Callable[[HTTPConnection], None]):
+    """Call callback(connection) for every pooled connection this thread checks out inside the block."""
+    previous = getattr(_checkouts, 'callback', None)
+    _checkouts.callback = callback
+    try:
+        yield
+    finally:
+        _checkouts.callback = previous
+
+
+def abort_connection(conn: HTTPConnection):
+    """Unblock, from another thread, a request waiting on 'conn'; the pool then discards it."""
+    sock = getattr(conn, 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _TimedPoolMixin:
+    """Records checkout wait time and new connections on a urllib3 pool."""
+    stats: Optional[PoolStats] = None
+
+    def _get_conn(self, timeout=None):
+        start = time.perf_counter()
+        conn = super()._get_conn(timeout=timeout)
+        if self.stats:
+            self.stats.record_checkout(time.perf_counter() - start)
+        callback = getattr(_checkouts, 'callback', None)
+        if callback:
+            callback(conn)
+        return conn
+
+    def _new_conn(self):
+        if self.stats:
+            self.stats.record_new_connection()
+        return super()._new_conn()
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report into a PoolStats."""
+
+    def __init__(self, stats: PoolStats, tcp_keepalive: bool = True, **kwargs):
+        # Must be set before HTTPAdapter.__init__ calls init_poolmanager
+        self.stats = stats
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.tcp_keepalive:
+            pool_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ])
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        stats = self.stats
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('TimedHTTPConnectionPool', (_TimedPoolMixin, HTTPConnectionPool), {'stats': stats}),
+            'https': type('TimedHTTPSConnectionPool', (_TimedPoolMixin, HTTPSConnectionPool), {'stats': stats})
+        }
+
+
+class ConnectionPoolManager:
+    """One tuned keep-alive requests.Session per Ollama instance."""
+
+    def __init__(self, instances: List[Dict], defaults: Optional[Dict] = None):
+        self.defaults = {**DEFAULT_POOL_CONFIG, **(defaults or {})}
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._settings: Dict[str, Dict] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        for instance in instances:
+            self.add_instance(instance)
+
+    def add_instance(self, instance: Dict):
+        """Create the session for an instance, honouring its optional 'pool' overrides."""
+        url = instance['url']
+        settings = {**self.defaults, **instance.get('pool', {})}
+        stats = PoolStats()
+        retry = Retry(
+            total=settings['max_retries'],
+            connect=settings['max_retries'],
+            read=0,  # Never re-send a request the backend may already be generating for
+            status=settings['max_retries'],
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            backoff_factor=settings['backoff_factor'],
+            raise_on_status=False
+        )
+        adapter = InstrumentedAdapter(
+            stats,
+            tcp_keepalive=settings['tcp_keepalive'],
+            pool_connections=1,
+            pool_maxsize=settings['pool_maxsize'],
+            pool_block=settings['pool_block'],
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.headers.update({'Connection': 'keep-alive'})
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        with self._lock:
+            old = self._sessions.get(url)
+            self._sessions[url] = session
+            self._settings[url] = settings
+            self._stats[url] = stats
+        if old:
+            old.close()
+        logger.debug(f"Connection pool ready for {url} (maxsize={settings['pool_maxsize']})")
+
+    def remove_instance(self, url: str):
+        with self._lock:
+            session = self._sessions.pop(url, None)
+            self._settings.pop(url, None)
+            self._stats.pop(url, None)
+        if session:
+            session.close()
+
+    def _session(self, url: str) -> requests.Session:
+        session = self._sessions.get(url)
+        if session is None:
+            self.add_instance({'url': url})
+            session = self._sessions[url]
+        return session
+
+    def timeout(self, url: str, kind: str = 'read') -> Tuple[float, Optional[float]]:
+        """Return a (connect, read) timeout tuple for the given request kind."""
+        settings = self._settings.get(url, self.defaults)
+        return settings['connect_timeout'], settings[f'{kind}_timeout']
+
+    def get(self, url: str, path: str, kind: str = 'health', **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout(url, kind))
+        return self._session(url).get(f"{url}{path}", **kwargs)
+
+    def post(self, url: str, path: str, kind: str = 'read', **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout(url, kind))
+        return self._session(url).post(f"{url}{path}", **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Pool statistics per instance URL."""
+        with self._lock:
+            items = list(self._stats.items())
+        return {url: {**stats.snapshot(), 'pool_maxsize': self._settings.get(url, self.defaults)['pool_maxsize']}
+                for url, stats in items}
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,130 @@
+# context_window.py
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from startup import startup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_CONFIG = {
+    "tokenizer": None,          # tokenizer.json path or Hugging Face id; None estimates from length
+    "default_budget": 2048,     # Prompt tokens sent to the model
+    "model_budgets": {},        # Per-model overrides, e.g. {"llama3:8b": 6144}
+    "message_overhead": 4,      # Tokens the chat template adds per message
+    "summarize": False,         # Fold trimmed turns into a rolling summary
+    "summary_max_tokens": 256
+}
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(name: str):
+    """Load and cache a tokenizer; returns None if it cannot be loaded."""
+    try:
+        from tokenizers import Tokenizer  # Imported here so startup does not pay for it
+    except ImportError:
+        logger.warning("tokenizers package not installed, estimating token counts")
+        return None
+    try:
+        if os.path.exists(name):
+            return Tokenizer.from_file(name)
+        return Tokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {name}, estimating token counts: {str(e)}")
+        return None
+
+
+class ContextWindow:
+    """Keeps the prompt sent to Ollama within a per-model token budget.
+
+    Each stored message carries its own 'tokens' count, computed once when it
+    is first seen, so trimming a long session is a walk over integers.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_CONTEXT_CONFIG, **(settings or {})}
+        self.tokenizer_name = settings['tokenizer']
+        self.default_budget = settings['default_budget']
+        self.model_budgets = settings['model_budgets']
+        self.message_overhead = settings['message_overhead']
+        self.summarize = settings['summarize']
+        self.summary_max_tokens = settings['summary_max_tokens']
+        self.tokenizer = None
+        if self.tokenizer_name:
+            # Loading from the Hub can take seconds; estimate until it is ready
+            threading.Thread(target=self._load_tokenizer, name='tokenizer-loader', daemon=True).start()
+
+    def _load_tokenizer(self):
+        with startup.phase('tokenizer', deferred=True):
+            self.tokenizer = load_tokenizer(self.tokenizer_name)
+        if self.tokenizer:
+            logger.info(f"Loaded tokenizer {self.tokenizer_name}")
+
+    def budget(self, model: Optional[str]) -> int:
+        return self.model_budgets.get(model, self.default_budget)
+
+    def count_tokens(self, text: str) -> int:
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return len(text) // 4 + 1
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def message_tokens(self, message: Dict) -> int:
+        """Token count of a message, cached on the message itself."""
+        if 'tokens' not in message:
+            message['tokens'] = self.count_tokens(message.get('content', '')) + self.message_overhead
+        return message['tokens']
+
+    def _split(self, messages: List[Dict], budget: int):
+        """Split history into (summary, dropped, kept) with kept fitting the budget."""
+        summary = messages[0] if messages and messages[0].get('summary') else None
+        history = messages[1:] if summary else messages
+        if summary:
+            budget -= self.message_tokens(summary)
+
+        kept_from = len(history)
+        used = 0
+        for index in range(len(history) - 1, -1, -1):
+            used += self.message_tokens(history[index])
+            # The newest message is always kept, even if it alone exceeds the budget
+            if used > budget and index < len(history) - 1:
+                break
+            kept_from = index
+        return summary, history[:kept_from], history[kept_from:]
+
+    def build(self, conversation: Dict, model: Optional[str]) -> List[Dict]:
+        """Messages to send for this turn, newest first until the budget is spent."""
+        summary, _, kept = self._split(conversation['messages'], self.budget(model))
+        window = ([summary] if summary else []) + kept
+        return [{'role': message['role'], 'content': message['content']} for message in window]
+
+    def compact(self, conversation: Dict, model: Optional[str]):
+        """Drop stored turns that no longer fit, folding them into the summary if enabled."""
+        summary, dropped, kept = self._split(conversation['messages'], self.budget(model))
+        if not dropped:
+            return
+        if self.summarize:
+            summary = self._fold(summary, dropped)
+        conversation['messages'] = ([summary] if summary else []) + kept
+        logger.debug(f"Trimmed {len(dropped)} messages from context")
+
+    def _fold(self, summary: Optional[Dict], dropped: List[Dict]) -> Dict:
+        """Extractive rolling summary: the first sentence of each folded message."""
+        lines = summary['content'][len(SUMMARY_PREFIX):].split('\n') if summary else []
+        for message in dropped:
+            first_sentence = _SENTENCE_END.split(message.get('content', '').strip(), 1)[0]
+            lines.append(f"{message['role']}: {first_sentence[:200]}")
+
+        # Keep the most recent lines that fit the summary budget
+        while len(lines) > 1 and self.count_tokens(SUMMARY_PREFIX + '\n'.join(lines)) > self.summary_max_tokens:
+            lines.pop(0)
+        content = SUMMARY_PREFIX + '\n'.join(lines)
+        folded = {'role': 'system', 'content': content, 'summary': True}
+        self.message_tokens(folded)
+        return folded
@@ -0,0 +1,303 @@
+# conversation_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_CONFIG = {
+    "backend": "memory",          # memory | sqlite
+    "max_sessions": 10000,        # LRU cap on stored sessions
+    "ttl": 86400,                 # Seconds of inactivity before a session expires
+    "max_memory_mb": 64,          # Memory backend: approximate cap on stored text
+    "path": "conversations.db",   # SQLite backend: database file shared by all workers
+    "purge_interval": 60          # SQLite backend: seconds between expiry sweeps
+}
+
+
+def new_conversation(language: Optional[str] = None) -> Dict:
+    return {'messages': [], 'language': language}
+
+
+def _conversation_size(conversation: Dict) -> int:
+    """Rough size in bytes of a conversation's text."""
+    return 64 + sum(len(message.get('content', '')) + 32 for message in conversation['messages'])
+
+
+class ConversationStore:
+    """Interface for session storage.
+
+    get() returns a copy; callers modify it and hand it back with put().
+    Changes that depend on what is stored go through update(), which reads
+    and writes in one step, so concurrent turns (in any worker process)
+    never overwrite each other.
+    """
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {'lru': 0, 'ttl': 0, 'memory': 0}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, conversation: Dict):
+        raise NotImplementedError
+
+    def update(self, session_id: str, change: Callable[[Optional[Dict]], Optional[Dict]]) -> Optional[Dict]:
+        """Atomically store change(copy of the session, or None).
+
+        If change() returns None the session is left as it is. Returns what
+        was stored, or None.
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _evicted(self, reason: str, count: int = 1):
+        if count:
+            with self._stats_lock:
+                self.evictions[reason] += count
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'sessions': len(self),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': dict(self.evictions)
+            }
+
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process LRU store with idle TTL and a memory cap."""
+    backend = 'memory'
+
+    def __init__(self, max_sessions: int, ttl: float, max_memory_mb: float):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[str, tuple]' = OrderedDict()  # id -> (conversation, size, touched)
+        self._bytes = 0
+
+    def _drop(self, session_id: str):
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _get(self, session_id: str) -> Optional[Dict]:
+        # Caller holds self._lock
+        entry = self._sessions.get(session_id)
+        if entry and time.time() - entry[2] > self.ttl:
+            self._drop(session_id)
+            self._evicted('ttl')
+            entry = None
+        if entry:
+            self._sessions.move_to_end(session_id)
+        self._count(entry is not None)
+        if entry is None:
+            return None
+        conversation = entry[0]
+        return {'messages': list(conversation['messages']), 'language': conversation['language']}
+
+    def _put(self, session_id: str, conversation: Dict):
+        # Caller holds self._lock
+        size = _conversation_size(conversation)
+        now = time.time()
+        if session_id in self._sessions:
+            self._drop(session_id)
+        self._sessions[session_id] = (
+            {'messages': list(conversation['messages']), 'language': conversation['language']}, size, now)
+        self._bytes += size
+        self._evict(now)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get(session_id)
+
+    def put(self, session_id: str, conversation: Dict):
+        with self._lock:
+            self._put(session_id, conversation)
+
+    def update(self, session_id: str, change: Callable[[Optional[Dict]], Optional[Dict]]) -> Optional[Dict]:
+        with self._lock:
+            conversation = change(self._get(session_id))
+            if conversation is not None:
+                self._put(session_id, conversation)
+        return conversation
+
+    def _evict(self, now: float):
+        # Caller holds self._lock; oldest entries are at the front
+        while self._sessions:
+            oldest_id, (_, _, touched) = next(iter(self._sessions.items()))
+            if now - touched > self.ttl:
+                reason = 'ttl'
+            elif len(self._sessions) > self.max_sessions:
+                reason = 'lru'
+            elif self._bytes > self.max_bytes and len(self._sessions) > 1:
+                reason = 'memory'
+            else:
+                return
+            self._drop(oldest_id)
+            self._evicted(reason)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['memory_bytes'] = self._bytes
+        return stats
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite (WAL mode) store that every worker process on the host can share."""
+    backend = 'sqlite'
+
+    def __init__(self, path: str, max_sessions: int, ttl: float, purge_interval: float):
+        super().__init__()
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            language TEXT,
+            messages TEXT NOT NULL,
+            updated REAL NOT NULL
+        )""")
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated)")
+        db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _read(self, db: sqlite3.Connection, session_id: str) -> Optional[Dict]:
+        row = db.execute(
+            "SELECT language, messages, updated FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row and time.time() - row[2] > self.ttl:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._evicted('ttl')
+            row = None
+        self._count(row is not None)
+        if row is None:
+            return None
+        return {'messages': json.loads(row[1]), 'language': row[0]}
+
+    @staticmethod
+    def _write(db: sqlite3.Connection, session_id: str, conversation: Dict, now: float):
+        db.execute(
+            "INSERT INTO sessions (session_id, language, messages, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET language = excluded.language, "
+            "messages = excluded.messages, updated = excluded.updated",
+            (session_id, conversation['language'], json.dumps(conversation['messages']), now)
+        )
+
+    def _purge_due(self, now: float):
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self.purge(now)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        db = self._db()
+        with db:
+            return self._read(db, session_id)
+
+    def put(self, session_id: str, conversation: Dict):
+        now = time.time()
+        db = self._db()
+        with db:
+            self._write(db, session_id, conversation, now)
+        self._purge_due(now)
+
+    def update(self, session_id: str, change: Callable[[Optional[Dict]], Optional[Dict]]) -> Optional[Dict]:
+        db = self._db()
+        # Takes the write lock before reading, so no other process can store the session in between
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            conversation = change(self._read(db, session_id))
+            now = time.time()
+            if conversation is not None:
+                self._write(db, session_id, conversation, now)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        self._purge_due(now)
+        return conversation
+
+    def purge(self, now: Optional[float] = None):
+        """Drop expired sessions and the least recently used ones beyond max_sessions."""
+        now = now or time.time()
+        db = self._db()
+        with db:
+            expired = db.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,)).rowcount
+            overflow = db.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+        self._evicted('ttl', expired)
+        self._evicted('lru', overflow)
+        if expired or overflow:
+            logger.info(f"Purged {expired} expired and {overflow} overflow sessions")
+
+    def delete(self, session_id: str):
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_conversation_store(settings: Optional[Dict] = None) -> ConversationStore:
+    """Build the configured conversation store."""
+    settings = {**DEFAULT_STORE_CONFIG, **(settings or {})}
+    if settings['backend'] == 'sqlite':
+        store = SQLiteConversationStore(settings['path'], settings['max_sessions'],
+                                        settings['ttl'], settings['purge_interval'])
+    elif settings['backend'] == 'memory':
+        store = MemoryConversationStore(settings['max_sessions'], settings['ttl'], settings['max_memory_mb'])
+    else:
+        raise ValueError(f"Unknown conversation store backend: {settings['backend']}")
+    logger.info(f"Using {store.backend} conversation store")
+    return store
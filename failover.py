@@ -0,0 +1,55 @@
+# failover.py
+import logging
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILOVER_CONFIG = {
+    "enabled": True,
+    "max_failovers": 2,   # Other instances tried after the first one fails
+    "resume": True        # Continue from the partial reply instead of starting over
+}
+
+
+class StreamInterrupted(Exception):
+    """The upstream stream ended before Ollama sent its final 'done' chunk."""
+
+
+class Failover:
+    """State of one reply across the instances it was streamed from.
+
+    Tracks the text delivered so far and the instances that failed, so the
+    next attempt avoids them and continues where the last one stopped: the
+    partial reply is sent as a trailing assistant message, which Ollama
+    completes instead of starting a new answer.
+    """
+
+    def __init__(self, messages: List[Dict], settings: Optional[Dict] = None):
+        settings = {**DEFAULT_FAILOVER_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        self.max_failovers = settings['max_failovers']
+        self.resume = settings['resume']
+        self.base_messages = messages
+        self.partial: List[str] = []
+        self.failed: Set[str] = set()
+
+    def record(self, content: str):
+        self.partial.append(content)
+
+    def messages(self) -> List[Dict]:
+        """Messages for the next attempt, ending in the partial reply when resuming."""
+        partial = ''.join(self.partial)
+        if not partial:
+            return self.base_messages
+        return self.base_messages + [{"role": "assistant", "content": partial}]
+
+    def should_retry(self, url: str, error: Exception) -> bool:
+        """Record the failed instance; True if another one should be tried."""
+        self.failed.add(url)
+        if not self.enabled or len(self.failed) > self.max_failovers:
+            return False
+        if self.partial and not self.resume:
+            return False  # Restarting would repeat text the client already has
+        logger.warning(f"Stream from {url} failed after {len(''.join(self.partial))} chars "
+                       f"({type(error).__name__}: {error}), failing over")
+        return True
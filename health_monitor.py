@@ -0,0 +1,250 @@
+# health_monitor.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_CONFIG = {
+    "interval": 10,           # Seconds between probe rounds
+    "failure_threshold": 2,   # Consecutive failures before the circuit opens
+    "open_backoff": 5,        # Seconds an open circuit waits before a trial probe
+    "max_backoff": 120        # Cap for the exponentially growing backoff
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+UNKNOWN = 'unknown'
+
+
+class StillDiscovering(Exception):
+    """No instance has the model yet, but some have not answered their first probe."""
+
+    def __init__(self, message: str = "Still discovering Ollama instances, please try again shortly",
+                 retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Per-instance circuit breaker with exponential backoff while open."""
+
+    def __init__(self, failure_threshold: int, open_backoff: float, max_backoff: float):
+        self.failure_threshold = failure_threshold
+        self.open_backoff = open_backoff
+        self.max_backoff = max_backoff
+        self.state = UNKNOWN
+        self.consecutive_failures = 0
+        self.open_count = 0       # Times opened in a row without recovering
+        self.retry_at = 0.0
+
+    def should_probe(self, now: float) -> bool:
+        if self.state == OPEN and now >= self.retry_at:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0
+
+    def record_failure(self, now: float):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            backoff = min(self.open_backoff * (2 ** self.open_count), self.max_backoff)
+            self.open_count += 1
+            self.state = OPEN
+            self.retry_at = now + backoff
+        elif self.state == UNKNOWN:
+            self.state = OPEN
+            self.retry_at = now + self.open_backoff
+
+    def trip(self, now: float):
+        """Open at once, regardless of the failure threshold."""
+        self.consecutive_failures = max(self.consecutive_failures, self.failure_threshold - 1)
+        self.record_failure(now)
+
+
+class HealthMonitor:
+    """Probes all instances concurrently in the background.
+
+    Readers get an immutable snapshot that is swapped in atomically after
+    every change, so request handlers never take a lock or wait on a probe.
+    """
+
+    def __init__(self, instances: List[Dict], probe: Callable[[str], bool], settings: Optional[Dict] = None):
+        settings = {**DEFAULT_HEALTH_CONFIG, **(settings or {})}
+        self.interval = settings['interval']
+        self.probe = probe
+        self._settings = settings
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._details: Dict[str, Dict] = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.instances: List[Dict] = []
+        self.snapshot: Dict[str, Dict] = {}
+        self._state_listeners: List[Callable[[str, str, str], None]] = []
+        self.set_instances(instances)
+
+    def set_instances(self, instances: List[Dict]):
+        """Replace the monitored instance list, keeping state for known URLs."""
+        with self._lock:
+            self.instances = list(instances)
+            urls = {instance['url'] for instance in instances}
+            for url in urls - self._breakers.keys():
+                self._breakers[url] = CircuitBreaker(
+                    self._settings['failure_threshold'],
+                    self._settings['open_backoff'],
+                    self._settings['max_backoff']
+                )
+                self._details[url] = {'last_check': None, 'latency_ms': None}
+            for url in set(self._breakers) - urls:
+                del self._breakers[url]
+                del self._details[url]
+            self._publish()
+        self._wake.set()
+
+    def add_state_listener(self, listener: Callable[[str, str, str], None]):
+        """Call listener(url, previous, state) whenever an instance's circuit changes state."""
+        self._state_listeners.append(listener)
+
+    def _publish(self):
+        # Caller holds self._lock
+        self.snapshot = {url: {
+            'state': breaker.state,
+            'healthy': breaker.state == CLOSED,
+            'consecutive_failures': breaker.consecutive_failures,
+            'retry_at': breaker.retry_at if breaker.state == OPEN else None,
+            **self._details[url]
+        } for url, breaker in self._breakers.items()}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.instances), 1),
+                                            thread_name_prefix='health-probe')
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+        logger.info(f"Health monitor started (interval={self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Health monitor round failed: {str(e)}")
+            self._wake.wait(self._next_delay())
+            self._wake.clear()
+
+    def _next_delay(self) -> float:
+        # Wake early if an open circuit is due for its trial probe
+        now = time.time()
+        due = [b.retry_at - now for b in list(self._breakers.values()) if b.state == OPEN]
+        return max(min([self.interval] + due), 0.5)
+
+    def check_all(self):
+        """Probe every instance whose circuit allows it, concurrently."""
+        now = time.time()
+        with self._lock:
+            urls = [url for url, breaker in self._breakers.items() if breaker.should_probe(now)]
+            self._publish()
+        if not urls:
+            return
+        executor = self._executor or ThreadPoolExecutor(max_workers=len(urls))
+        futures = {url: executor.submit(self._timed_probe, url) for url in urls}
+        for url, future in futures.items():
+            healthy, latency = future.result()
+            self._record(url, healthy, latency)
+        if executor is not self._executor:
+            executor.shutdown(wait=False)
+
+    def _timed_probe(self, url: str):
+        start = time.perf_counter()
+        try:
+            healthy = self.probe(url)
+        except Exception as e:
+            logger.error(f"Health probe for {url} raised: {str(e)}")
+            healthy = False
+        return healthy, time.perf_counter() - start
+
+    def _record(self, url: str, healthy: bool, latency: Optional[float] = None, trip: bool = False):
+        now = time.time()
+        with self._lock:
+            breaker = self._breakers.get(url)
+            if breaker is None:
+                return
+            previous = breaker.state
+            if healthy:
+                breaker.record_success()
+            elif trip:
+                breaker.trip(now)
+            else:
+                breaker.record_failure(now)
+            self._details[url] = {
+                'last_check': now,
+                'latency_ms': round(latency * 1000, 1) if latency is not None else self._details[url]['latency_ms']
+            }
+            self._publish()
+        if previous != breaker.state:
+            logger.info(f"Circuit for {url}: {previous} -> {breaker.state}")
+            for listener in self._state_listeners:
+                try:
+                    listener(url, previous, breaker.state)
+                except Exception as e:
+                    logger.error(f"Circuit listener failed for {url}: {str(e)}")
+
+    def apply(self, snapshot: Dict[str, Dict]):
+        """Adopt a snapshot published by another process's monitor (see cluster.py).
+
+        State listeners are not called: the publishing process already acted
+        on those changes.
+        """
+        with self._lock:
+            for url, entry in snapshot.items():
+                breaker = self._breakers.get(url)
+                if breaker is None:
+                    continue
+                breaker.state = entry['state']
+                breaker.consecutive_failures = entry['consecutive_failures']
+                breaker.retry_at = entry['retry_at'] or 0.0
+                self._details[url] = {'last_check': entry['last_check'], 'latency_ms': entry['latency_ms']}
+            self._publish()
+
+    def wake(self):
+        """Run a probe round now instead of at the next interval."""
+        self._wake.set()
+
+    def report_failure(self, url: str):
+        """Record a failure observed on the request path."""
+        self._record(url, False)
+        self._wake.set()
+
+    def mark_down(self, url: str):
+        """Open the circuit right away, e.g. after a stream died mid-generation."""
+        self._record(url, False, trip=True)
+        self._wake.set()
+
+    def report_success(self, url: str):
+        """Record a success observed on the request path."""
+        if self.snapshot.get(url, {}).get('state') != CLOSED:
+            self._record(url, True)
+
+    def is_available(self, url: str) -> bool:
+        """True if requests may be routed to the instance (healthy or not yet probed)."""
+        state = self.snapshot.get(url, {}).get('state', UNKNOWN)
+        return state in (CLOSED, UNKNOWN)
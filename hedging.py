@@ -0,0 +1,317 @@
+# hedging.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from admission import Admission
+from model_inventory import normalize_model_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGING_CONFIG = {
+    "enabled": False,        # Opt-in: a hedge sends the same prompt to a second instance
+    "percentile": 90,        # Hedge once the first token takes longer than this TTFT percentile
+    "min_samples": 20,       # TTFT samples per model before the percentile is trusted
+    "default_delay": 2.0,    # Seconds to wait before hedging until then
+    "min_delay": 0.25,
+    "max_delay": 10.0,
+    "max_hedge_rate": 0.1,   # Share of recent requests that may start a hedge
+    "window": 200            # Recent TTFT samples and requests considered
+}
+
+T = TypeVar('T')
+
+# (winning admission, its opened stream, outcome)
+RaceResult = Tuple[Admission, T, str]
+
+
+class HedgePolicy:
+    """Decides when to hedge a slow first token and keeps the extra load bounded.
+
+    The hedge deadline is a percentile of recent time-to-first-token per
+    model, clamped to [min_delay, max_delay]. At most 'max_hedge_rate' of
+    recent requests may hedge. TTFTs cut short by a winning hedge are not
+    sampled, so hedging does not pull its own deadline down.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_HEDGING_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        self.percentile = settings['percentile']
+        self.min_samples = settings['min_samples']
+        self.default_delay = settings['default_delay']
+        self.min_delay = settings['min_delay']
+        self.max_delay = settings['max_delay']
+        self.max_hedge_rate = settings['max_hedge_rate']
+        self.window = settings['window']
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._recent: Deque[bool] = deque(maxlen=self.window)  # Whether each recent request hedged
+        self.counts = {'requests': 0, 'hedged': 0, 'primary_won': 0, 'hedge_won': 0, 'skipped': 0}
+
+    def record_ttft(self, model: str, seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault(normalize_model_name(model), deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def delay(self, model: str) -> float:
+        """Seconds to wait for the first token before hedging."""
+        with self._lock:
+            samples = sorted(self._samples.get(normalize_model_name(model), ()))
+        if len(samples) < self.min_samples:
+            delay = self.default_delay
+        else:
+            delay = samples[min(len(samples) - 1, int(round(self.percentile / 100 * (len(samples) - 1))))]
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def allow(self) -> bool:
+        """Whether the hedge budget has room for one more."""
+        with self._lock:
+            return sum(self._recent) < self.max_hedge_rate * max(len(self._recent), 1)
+
+    def record(self, outcome: str):
+        """Count one raced request by outcome: 'not_needed', 'skipped', 'primary_won',
+        'hedge_won' or 'failed' (every entrant failed after a hedge).
+        """
+        hedged = outcome in ('primary_won', 'hedge_won', 'failed')
+        with self._lock:
+            self.counts['requests'] += 1
+            self._recent.append(hedged)
+            if hedged:
+                self.counts['hedged'] += 1
+            if outcome in self.counts:
+                self.counts[outcome] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models = list(self._samples)
+            rate = round(sum(self._recent) / len(self._recent), 4) if self._recent else 0.0
+        return {
+            'enabled': self.enabled,
+            'hedge_rate': rate,
+            'delay_ms': {model: round(self.delay(model) * 1000, 1) for model in models},
+            **self.counts
+        }
+
+
+class Abort:
+    """Lets race() stop a losing entrant whose open_stream() is still blocked.
+
+    open_stream() registers what would unblock it (e.g. shutting down the
+    socket it waits on) with on_abort(). Once the race is decided for
+    another entrant, the callbacks run; one registered after that runs at
+    once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.aborted = False
+
+    def on_abort(self, callback: Callable[[], None]):
+        with self._lock:
+            if not self.aborted:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def abort(self):
+        with self._lock:
+            if self.aborted:
+                return
+            self.aborted = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Aborting a losing entrant failed: {str(e)}")
+
+
+class _Entrant(Generic[T]):
+    """One admission racing for the first token."""
+
+    def __init__(self, admission: Admission):
+        self.admission = admission
+        self.abort = Abort()
+        self.started = time.perf_counter()
+        self.stream: Optional[T] = None
+        self.error: Optional[Exception] = None
+        self.elapsed = 0.0
+
+    def finish(self, stream: Optional[T], error: Optional[Exception]):
+        self.stream = stream
+        self.error = error
+        self.elapsed = time.perf_counter() - self.started
+
+
+def _settle(policy: HedgePolicy, model: str, entrants: List[_Entrant], failed: List[_Entrant],
+            winner: Optional[_Entrant], hedged: bool, skipped: bool,
+            report_failure: Callable[[Admission, Exception], None]) -> RaceResult:
+    """Record the race in the policy and build its result; raises the primary's error if all failed.
+
+    Every entrant in 'failed' (those that failed before the race was
+    decided, not the losers it aborted) goes to report_failure(), except the
+    primary when its error is raised: the caller handles that one.
+    """
+    primary = entrants[0]
+    if winner is None:
+        outcome = 'failed' if hedged else ('skipped' if skipped else 'not_needed')
+    elif hedged:
+        outcome = 'primary_won' if winner is primary else 'hedge_won'
+    else:
+        outcome = 'skipped' if skipped else 'not_needed'
+    if winner is primary:
+        policy.record_ttft(model, winner.elapsed)
+    policy.record(outcome)
+    for entrant in failed:
+        entrant.admission.cancel()
+        if winner is not None or entrant is not primary:
+            report_failure(entrant.admission, entrant.error)
+    if winner is None:
+        raise primary.error
+    return winner.admission, winner.stream, outcome
+
+
+def race(open_stream: Callable[[Admission, Abort], T], close_stream: Callable[[T], None], primary: Admission,
+         backup: Callable[[], Optional[Admission]], policy: HedgePolicy, model: str,
+         report_failure: Callable[[Admission, Exception], None]) -> RaceResult:
+    """Open the primary stream and, if its first token is late, a hedge on backup().
+
+    open_stream(admission, abort) must block until the stream's first token
+    (or its end). The first entrant to get there wins. Entrants still
+    blocked then are aborted and their admissions cancelled at once, so a
+    loser holds neither its slot nor its connection; its stream is closed
+    when its open_stream() call returns. Failed entrants go to
+    report_failure(); raises the primary's error if every entrant fails.
+    """
+    results: 'queue.Queue[_Entrant]' = queue.Queue()
+    lock = threading.Lock()
+    decided = False
+
+    def run(entrant: _Entrant):
+        try:
+            entrant.finish(open_stream(entrant.admission, entrant.abort), None)
+        except Exception as e:
+            entrant.finish(None, e)
+        with lock:
+            late = decided
+            if not late:
+                results.put(entrant)
+        if late:
+            _discard(entrant, close_stream)
+
+    def start(admission: Admission) -> _Entrant:
+        entrant = _Entrant(admission)
+        threading.Thread(target=run, args=(entrant,), name='hedge-race', daemon=True).start()
+        return entrant
+
+    entrants = [start(primary)]
+    hedged = skipped = False
+    try:
+        finished = results.get(timeout=policy.delay(model))
+    except queue.Empty:
+        finished = None
+        hedge = backup() if policy.allow() else None
+        if hedge is None:
+            skipped = True
+        else:
+            hedged = True
+            entrants.append(start(hedge))
+            logger.debug(f"First token from {primary.ticket.instance['url']} is late, "
+                         f"hedging on {hedge.ticket.instance['url']}")
+
+    winner = None
+    failed = []
+    for _ in entrants:
+        finished = finished or results.get()
+        if finished.error is None:
+            winner = finished
+            break
+        failed.append(finished)
+        finished = None
+    with lock:
+        decided = True
+    # Entrants that finished while the winner was being picked
+    while True:
+        try:
+            _discard(results.get_nowait(), close_stream)
+        except queue.Empty:
+            break
+    for entrant in entrants:
+        if entrant is not winner and entrant not in failed:
+            entrant.abort.abort()
+            entrant.admission.cancel()
+    return _settle(policy, model, entrants, failed, winner, hedged, skipped, report_failure)
+
+
+async def arace(open_stream: Callable[[Admission], Awaitable[T]], close_stream: Callable[[T], Awaitable[None]],
+                primary: Admission, backup: Callable[[], Optional[Admission]],
+                policy: HedgePolicy, model: str,
+                report_failure: Callable[[Admission, Exception], None]) -> RaceResult:
+    """asyncio version of race(); losing entrants are cancelled at once.
+
+    open_stream() must close whatever it opened if it is cancelled.
+    """
+    async def run(entrant: _Entrant):
+        try:
+            entrant.finish(await open_stream(entrant.admission), None)
+        except Exception as e:
+            entrant.finish(None, e)
+
+    entrants = [_Entrant(primary)]
+    tasks = [asyncio.ensure_future(run(entrants[0]))]
+    hedged = skipped = False
+    winner = None
+    failed = []
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=policy.delay(model))
+        if not done:
+            hedge = backup() if policy.allow() else None
+            if hedge is None:
+                skipped = True
+            else:
+                hedged = True
+                entrants.append(_Entrant(hedge))
+                tasks.append(asyncio.ensure_future(run(entrants[1])))
+                logger.debug(f"First token from {primary.ticket.instance['url']} is late, "
+                             f"hedging on {hedge.ticket.instance['url']}")
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished = [entrant for task, entrant in zip(tasks, entrants) if task in done]
+            failed.extend(entrant for entrant in finished if entrant.error is not None)
+            winner = next((entrant for entrant in finished if entrant.error is None), None)
+    except BaseException:
+        winner = None  # The request itself was cancelled: close every stream
+        raise
+    finally:
+        for task, entrant in zip(tasks, entrants):
+            if not task.done():
+                task.cancel()
+                entrant.admission.cancel()
+            elif entrant is not winner:
+                await _adiscard(entrant, close_stream)
+    return _settle(policy, model, entrants, failed, winner, hedged, skipped, report_failure)
+
+
+def _discard(entrant: _Entrant, close_stream: Callable):
+    if entrant.stream is not None:
+        try:
+            close_stream(entrant.stream)
+        except Exception as e:
+            logger.debug(f"Closing a losing stream failed: {str(e)}")
+    entrant.admission.cancel()
+
+
+async def _adiscard(entrant: _Entrant, close_stream: Callable):
+    if entrant.stream is not None:
+        try:
+            await close_stream(entrant.stream)
+        except Exception as e:
+            logger.debug(f"Closing a losing stream failed: {str(e)}")
+    entrant.admission.cancel()
@@ -3,7 +3,7 @@
 # Create systemd service file
 sudo cat > /etc/systemd/system/llm_chat_lite.service << 'EOF'
 [Unit]
-Description=LLM Chat Lite Flask Application
+Description=LLM Chat Lite (uvicorn, one worker per core)
 After=network-online.target
 Wants=network-online.target
 
@@ -13,11 +13,15 @@ User=wartem
 Group=wartem
 WorkingDirectory=/home/wartem/proj/llm_chat_lite
 Environment="PATH=/home/wartem/proj/llm_chat_lite/.venv/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
-Environment="FLASK_APP=app.py"
 Environment="FLASK_ENV=production"
-ExecStart=/home/wartem/proj/llm_chat_lite/.venv/bin/python3 /home/wartem/proj/llm_chat_lite/app.py
+ExecStart=/home/wartem/proj/llm_chat_lite/.venv/bin/python3 /home/wartem/proj/llm_chat_lite/serve.py
 Restart=always
-RestartSec=3
+# The app serves within a few hundred ms of starting, so come back quickly
+RestartSec=200ms
+# SIGTERM goes to the launcher, which drains the workers' open streams
+# (server.graceful_timeout) before systemd kills what is left
+KillMode=mixed
+TimeoutStopSec=40
 
 # Hardening
 ProtectSystem=full
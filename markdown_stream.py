@@ -0,0 +1,133 @@
+# markdown_stream.py
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import markdown2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARKDOWN_CONFIG = {
+    "enabled": True,
+    "extras": ["fenced-code-blocks", "tables", "strike", "cuddled-lists"],
+    "safe_mode": "escape",   # Raw HTML in replies is shown as text, never injected into the page
+    "tail_growth": 0.25,     # Render the unfinished last block again once it grew by this share...
+    "tail_interval_ms": 100  # ...or this long after its last render
+}
+
+_FENCE = re.compile(r' {0,3}(`{3,}|~{3,})')
+_BULLET = re.compile(r' {0,3}[-*+][ \t]')
+_ORDERED = re.compile(r' {0,3}\d{1,9}[.)][ \t]')
+
+
+def _list_kind(line: str) -> Optional[str]:
+    if _BULLET.match(line):
+        return 'bullet'
+    if _ORDERED.match(line):
+        return 'ordered'
+    return None
+
+
+def _continues(block_first: str, line: str) -> bool:
+    """Whether 'line', after a blank line, still belongs to the block starting with 'block_first'."""
+    if line[0] in ' \t':
+        return True  # Indented: list item paragraph or code
+    kind = _list_kind(line)
+    return kind is not None and kind == _list_kind(block_first)
+
+
+class IncrementalMarkdown:
+    """Renders a streaming reply to HTML, one finished block at a time.
+
+    Text is split into blocks at blank lines outside fenced code. A block is
+    finished once the next complete line starts a new block (and is not a
+    further item of the same list); its HTML is returned once and never
+    changes. Only the trailing unfinished block is rendered again, and only
+    once it grew by 'tail_growth' of its size or 'tail_interval_ms' passed,
+    so a long paragraph or code block costs work linear in its length rather
+    than one full render per token.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_MARKDOWN_CONFIG, **(settings or {})}
+        self._markdown = markdown2.Markdown(extras=settings['extras'], safe_mode=settings['safe_mode'])
+        self.tail_growth = settings['tail_growth']
+        self.tail_interval = settings['tail_interval_ms'] / 1000
+        self.pending = ''
+        self._html: List[str] = []
+        self._tail_chars = 0          # Length of the pending text when the tail was last rendered
+        self._tail_rendered = 0.0
+        self._reset_scan()
+
+    def _reset_scan(self):
+        # Block scanning state over the complete lines of self.pending, so each line is read once
+        self._scanned = 0
+        self._fence: Optional[str] = None
+        self._blank = False
+        self._block_first: Optional[str] = None
+
+    def _render(self, text: str) -> str:
+        return self._markdown.convert(text) if text.strip() else ''
+
+    def _finished(self) -> int:
+        """Length of the leading part of the pending text made of finished blocks."""
+        boundary = 0
+        end = self.pending.rfind('\n', self._scanned) + 1  # Can't tell yet what an incomplete line starts
+        pos = self._scanned
+        for line in self.pending[self._scanned:end].splitlines(keepends=True):
+            stripped = line.strip()
+            if self._fence:
+                if stripped.startswith(self._fence) and not stripped.strip(self._fence[0]):
+                    self._fence = None
+            elif stripped:
+                if self._block_first is None or (self._blank and not _continues(self._block_first, line)):
+                    if self._blank:
+                        boundary = pos
+                    self._block_first = line
+                match = _FENCE.match(line)
+                if match:
+                    self._fence = match.group(1)
+            self._blank = not stripped and self._fence is None
+            pos += len(line)
+        self._scanned = max(end, self._scanned)
+        return boundary
+
+    def _tail_due(self) -> bool:
+        grown = len(self.pending) - self._tail_chars
+        return (grown >= self.tail_growth * self._tail_chars
+                or time.perf_counter() - self._tail_rendered >= self.tail_interval)
+
+    def feed(self, text: str) -> Tuple[str, Optional[str]]:
+        """Add streamed text. Returns (HTML of newly finished blocks, HTML of the unfinished tail).
+
+        The tail is None when it was not rendered again this time; the
+        previous one still stands.
+        """
+        self.pending += text
+        boundary = self._finished()
+        html = ''
+        if boundary:
+            html = self._render(self.pending[:boundary])
+            self.pending = self.pending[boundary:]
+            self._html.append(html)
+            # The remaining lines start the next block; scan them again from its start
+            self._reset_scan()
+            self._finished()
+        elif not self._tail_due():
+            return html, None
+        self._tail_chars = len(self.pending)
+        self._tail_rendered = time.perf_counter()
+        return html, self._render(self.pending)
+
+    def finish(self, text: str = '') -> str:
+        """The stream ended (with 'text', if given): HTML of the remaining text, which is now finished too."""
+        html = self._render(self.pending + text)
+        self.pending = ''
+        self._reset_scan()
+        self._html.append(html)
+        return html
+
+    def html(self) -> str:
+        """HTML of all finished blocks so far."""
+        return ''.join(self._html)
@@ -0,0 +1,287 @@
+# metrics.py
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "recent_requests": 200,   # Per-request timing breakdowns kept for /api/timings
+    "latency_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+}
+
+STAGES = ('translate_in', 'health_check', 'select', 'queue', 'first_byte', 'stream', 'translate_out')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}'] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_format_labels(self.labels, key)} {value}' for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Gauge whose values are either set directly or read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, *args, collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        if self.collect:
+            values = self.collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.labels, key)} {value}' for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: List[float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = sorted(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {entry[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {entry[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {entry[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """A minimal Prometheus text-format registry (no client library needed)."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = (), collect=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labels, collect=collect))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Optional[List[float]] = None) -> Histogram:
+        return self._register(Histogram(name, documentation, labels,
+                                        buckets=buckets or DEFAULT_METRICS_CONFIG['latency_buckets']))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Could not collect metric {metric.name}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+class RequestTimings:
+    """Timing spans of one chat turn.
+
+    Stages: translate_in, health_check (model resolution and candidate
+    instances), select (scheduler), queue (waiting for a free slot on a busy
+    instance), first_byte (request sent until the first token), stream
+    (first token until the stream ends), translate_out (wait for the
+    translation after the stream ended).
+    """
+
+    def __init__(self, session_id: str = ''):
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans: Dict[str, float] = {}
+        self.instance: Optional[str] = None
+        self.model: Optional[str] = None
+        self.bytes_streamed = 0
+        self.outcome = 'ok'
+        self.source = 'ollama'  # ollama | cache | coalesced
+        self.failed_over: List[str] = []  # Instances the stream failed on before completing
+        self.hedges: List[str] = []  # Outcome of each hedged first-token race, see hedging.HedgePolicy.record
+        self._sent: Optional[float] = None
+        self._first_byte: Optional[float] = None
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[stage] = self.spans.get(stage, 0.0) + time.perf_counter() - started
+
+    def request_sent(self):
+        self._sent = time.perf_counter()
+
+    def first_byte(self):
+        if self._first_byte is None and self._sent is not None:
+            self._first_byte = time.perf_counter()
+            self.spans['first_byte'] = self._first_byte - self._sent
+
+    def stream_ended(self):
+        if self._first_byte is not None and 'stream' not in self.spans:
+            self.spans['stream'] = time.perf_counter() - self._first_byte
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'started': self.wall_started,
+            'instance': self.instance,
+            'model': self.model,
+            'outcome': self.outcome,
+            'source': self.source,
+            'failed_over': self.failed_over,
+            'hedges': self.hedges,
+            'bytes_streamed': self.bytes_streamed,
+            'total_ms': round(self.total() * 1000, 1),
+            'spans_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.spans.items()}
+        }
+
+
+class ChatMetrics:
+    """Chat latency, throughput and health metrics exposed on /metrics."""
+
+    def __init__(self, settings: Optional[Dict] = None,
+                 in_flight: Optional[Callable[[], Dict[str, int]]] = None,
+                 circuits: Optional[Callable[[], Dict[str, str]]] = None,
+                 queued: Optional[Callable[[], Dict[str, int]]] = None):
+        settings = {**DEFAULT_METRICS_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        buckets = settings['latency_buckets']
+        self.registry = MetricsRegistry()
+        self._recent: Deque[Dict] = deque(maxlen=settings['recent_requests'])
+
+        self.requests = self.registry.counter(
+            'llm_chat_requests_total', 'Chat turns by instance, model, outcome and reply source',
+            ('backend', 'model', 'outcome', 'source'))
+        self.stage_seconds = self.registry.histogram(
+            'llm_chat_stage_seconds', 'Time spent per chat stage', ('stage', 'backend', 'model'), buckets)
+        self.request_seconds = self.registry.histogram(
+            'llm_chat_request_seconds', 'Total chat turn duration', ('backend', 'model'), buckets)
+        self.bytes_streamed = self.registry.counter(
+            'llm_chat_streamed_bytes_total', 'Reply bytes streamed to clients', ('backend', 'model'))
+        self.failovers = self.registry.counter(
+            'llm_chat_failovers_total', 'Chat streams that failed mid-request, by the instance they failed on', ('backend',))
+        self.hedges = self.registry.counter(
+            'llm_chat_hedges_total', 'First-token races by outcome (not_needed, skipped, primary_won, hedge_won)',
+            ('result',))
+        self.probe_seconds = self.registry.histogram(
+            'llm_chat_health_probe_seconds', 'Health probe duration', ('backend', 'result'), buckets)
+        if in_flight:
+            self.registry.gauge('llm_chat_in_flight_streams', 'Open chat streams per instance', ('backend',),
+                                collect=lambda: {(url,): count for url, count in in_flight().items()})
+        if circuits:
+            self.registry.gauge('llm_chat_instance_up', 'Whether the instance circuit is closed', ('backend',),
+                                collect=lambda: {(url,): int(state == 'closed') for url, state in circuits().items()})
+        if queued:
+            self.registry.gauge('llm_chat_queued_requests', 'Requests waiting for a stream slot per model',
+                                ('model',), collect=lambda: {(model,): count for model, count in queued().items()})
+
+    def observe_request(self, timings: RequestTimings):
+        if not self.enabled:
+            return
+        labels = {'backend': timings.instance or '', 'model': timings.model or ''}
+        self.requests.inc(outcome=timings.outcome, source=timings.source, **labels)
+        for stage, seconds in timings.spans.items():
+            self.stage_seconds.observe(seconds, stage=stage, **labels)
+        self.request_seconds.observe(timings.total(), **labels)
+        self.bytes_streamed.inc(timings.bytes_streamed, **labels)
+        for url in timings.failed_over:
+            self.failovers.inc(backend=url)
+        for outcome in timings.hedges:
+            self.hedges.inc(result=outcome)
+        self._recent.append(timings.as_dict())
+        logger.debug(f"Chat timings: {timings.as_dict()}")
+
+    def observe_probe(self, url: str, seconds: float, healthy: bool):
+        if self.enabled:
+            self.probe_seconds.observe(seconds, backend=url, result='ok' if healthy else 'failed')
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent per-request breakdowns, newest first."""
+        items = list(self._recent)[::-1]
+        return items[:limit] if limit else items
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -0,0 +1,75 @@
+# model_inventory.py
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+def normalize_model_name(name: str) -> str:
+    """Ollama treats 'llama3' and 'llama3:latest' as the same model."""
+    return name if ':' in name else f"{name}:latest"
+
+
+class ModelInventory:
+    """Which models each instance has installed and currently loaded.
+
+    Installed models come from /api/tags and loaded ones from /api/ps. Like
+    the health snapshot, the index is replaced wholesale on every update so
+    readers never lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.snapshot: Dict[str, Dict] = {}
+
+    def update(self, url: str, installed: Optional[List[str]] = None, loaded: Optional[List[str]] = None):
+        """Record fresh data for an instance; None leaves that part unchanged."""
+        with self._lock:
+            current = self.snapshot.get(url, {'installed': (), 'loaded': (), 'updated': None})
+            entry = {
+                'installed': tuple(installed) if installed is not None else current['installed'],
+                'loaded': tuple(loaded) if loaded is not None else current['loaded'],
+                'updated': time.time()
+            }
+            self.snapshot = {**self.snapshot, url: entry}
+
+    def mark_loaded(self, url: str, model: str):
+        """Note that a model was just used on an instance, ahead of the next /api/ps refresh."""
+        entry = self.snapshot.get(url)
+        if entry and model not in entry['loaded']:
+            self.update(url, loaded=list(entry['loaded']) + [model])
+
+    def replace(self, snapshot: Dict[str, Dict]):
+        """Adopt a snapshot published by another process (see cluster.py)."""
+        with self._lock:
+            self.snapshot = {url: {
+                'installed': tuple(entry['installed']),
+                'loaded': tuple(entry['loaded']),
+                'updated': entry['updated']
+            } for url, entry in snapshot.items()}
+
+    def remove(self, url: str):
+        with self._lock:
+            self.snapshot = {u: e for u, e in self.snapshot.items() if u != url}
+
+    def has_model(self, url: str, model: str) -> Optional[bool]:
+        """Whether the instance has the model installed, or None if it has not been inventoried."""
+        entry = self.snapshot.get(url)
+        if entry is None:
+            return None
+        wanted = normalize_model_name(model)
+        return any(normalize_model_name(name) == wanted for name in entry['installed'])
+
+    def is_loaded(self, url: str, model: str) -> bool:
+        entry = self.snapshot.get(url)
+        if entry is None:
+            return False
+        wanted = normalize_model_name(model)
+        return any(normalize_model_name(name) == wanted for name in entry['loaded'])
+
+    def all_models(self, urls: Iterable[str]) -> List[str]:
+        """Installed models across the given instances, models already loaded somewhere first."""
+        snapshot = self.snapshot
+        entries = [snapshot[url] for url in urls if url in snapshot]
+        installed = list(dict.fromkeys(name for entry in entries for name in entry['installed']))
+        loaded = {normalize_model_name(name) for entry in entries for name in entry['loaded']}
+        return sorted(installed, key=lambda name: normalize_model_name(name) not in loaded)
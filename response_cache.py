@@ -0,0 +1,304 @@
+# response_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    "enabled": False,             # Opt-in: replies are reused across sessions
+    "coalesce": True,             # Identical in-flight requests share one upstream stream
+    "ttl": 3600,                  # Seconds a cached reply stays valid
+    "max_entries": 1000,
+    "max_memory_mb": 32,          # Approximate cap on cached reply text
+    "max_reply_chars": 20000,     # Longer replies are streamed but not cached
+    "case_sensitive": False,      # "Hi" and "hi" share an entry unless true
+    "cache_sampled": False        # Also cache when sampling is random (no seed, temperature > 0)
+}
+
+Event = Tuple[str, object]  # ('chunk', text) or ('queue_position', n)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def is_deterministic(options: Optional[Dict]) -> bool:
+    """Whether Ollama sampling options give the same reply for the same prompt."""
+    options = options or {}
+    return options.get('temperature') == 0 or options.get('seed') is not None
+
+
+class Flight:
+    """One upstream stream fanned out to every request that asked for it.
+
+    The producer appends events; each subscriber reads them from the start
+    at its own pace, blocking (threads) or awaiting (asyncio) for new ones.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Event] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+
+    def _notify(self):
+        # Caller holds self._cond
+        self._cond.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def append(self, event: Event):
+        with self._cond:
+            self.events.append(event)
+            self._notify()
+
+    def finish(self, error: Optional[Exception] = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._notify()
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    @property
+    def abandoned(self) -> bool:
+        return self.subscribers <= 0
+
+    def chunks(self) -> List[str]:
+        return [value for kind, value in self.events if kind == 'chunk']
+
+    def read(self) -> Iterator[Event]:
+        """Every event from the start, blocking for new ones (sync subscribers)."""
+        index = 0
+        while True:
+            with self._cond:
+                while index == len(self.events) and not self.done:
+                    self._cond.wait()
+                events = self.events[index:]
+                done, error = self.done, self.error
+            index += len(events)
+            yield from events
+            if done and index == len(self.events):
+                if error:
+                    raise error
+                return
+
+    async def aread(self) -> AsyncIterator[Event]:
+        """Every event from the start, awaiting new ones (asyncio subscribers)."""
+        loop = asyncio.get_event_loop()
+        changed = asyncio.Event()
+        listener = lambda: loop.call_soon_threadsafe(changed.set)  # noqa: E731
+        with self._cond:
+            self._listeners.append(listener)
+        try:
+            index = 0
+            while True:
+                with self._cond:
+                    events = self.events[index:]
+                    done, error = self.done, self.error
+                    changed.clear()
+                index += len(events)
+                for event in events:
+                    yield event
+                if done and index == len(self.events):
+                    if error:
+                        raise error
+                    return
+                if not events:
+                    await changed.wait()
+        finally:
+            with self._cond:
+                self._listeners.remove(listener)
+
+
+class ResponseCache:
+    """Exact-match cache of completed replies plus coalescing of identical in-flight requests.
+
+    Keys cover the model, the normalized message history and the sampling
+    options. Entries expire after 'ttl' and the least recently used ones are
+    evicted beyond 'max_entries' or 'max_memory_mb'.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_RESPONSE_CACHE_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        self.coalesce = settings['coalesce']
+        self.ttl = settings['ttl']
+        self.max_entries = settings['max_entries']
+        self.max_bytes = int(settings['max_memory_mb'] * 1024 * 1024)
+        self.max_reply_chars = settings['max_reply_chars']
+        self.case_sensitive = settings['case_sensitive']
+        self.cache_sampled = settings['cache_sampled']
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[List[str], int, float]]' = OrderedDict()  # key -> (chunks, size, stored)
+        self._flights: Dict[str, Flight] = {}
+        self._bytes = 0
+        self.counts = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stored': 0, 'evicted': 0}
+
+    def _normalize(self, text: str) -> str:
+        text = _WHITESPACE.sub(' ', text).strip()
+        return text if self.case_sensitive else text.casefold()
+
+    def key(self, model: str, messages: List[Dict], options: Optional[Dict] = None) -> Optional[str]:
+        """Cache key for a request, or None if it must not be cached or coalesced."""
+        if not self.enabled or not (self.cache_sampled or is_deterministic(options)):
+            return None
+        history = [[message['role'], self._normalize(message.get('content', ''))] for message in messages]
+        raw = json.dumps([model, history, options or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[2] > self.ttl:
+                self._drop(key)
+                self.counts['evicted'] += 1
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self.counts['hits'] += 1
+                return entry[0]
+            return None
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def put(self, key: str, chunks: List[str]):
+        size = sum(len(chunk) for chunk in chunks)
+        if not chunks or size > self.max_reply_chars:
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (chunks, size, now)
+            self._bytes += size
+            self.counts['stored'] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.counts['evicted'] += 1
+
+    def _join(self, key: str) -> Tuple[Flight, bool]:
+        """The in-flight stream for 'key' and whether the caller must start it."""
+        with self._lock:
+            flight = self._flights.get(key) if self.coalesce else None
+            if flight:
+                self.counts['coalesced'] += 1
+                flight.subscribe()
+                return flight, False
+            self.counts['misses'] += 1
+            flight = Flight(key)
+            flight.subscribe()
+            if self.coalesce:
+                self._flights[key] = flight
+            return flight, True
+
+    def _land(self, flight: Flight, error: Optional[Exception]):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if error is None:
+            self.put(flight.key, flight.chunks())
+        flight.finish(error)
+
+    def _pump(self, flight: Flight, producer: Iterator[Event]):
+        error = None
+        try:
+            for event in producer:
+                flight.append(event)
+                if flight.abandoned:
+                    error = Exception("All clients disconnected")
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            producer.close()
+            self._land(flight, error)
+
+    async def _apump(self, flight: Flight, producer: AsyncIterator[Event]):
+        error = None
+        try:
+            async for event in producer:
+                flight.append(event)
+                if flight.abandoned:
+                    error = Exception("All clients disconnected")
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            await producer.aclose()
+            self._land(flight, error)
+
+    def stream(self, key: Optional[str], produce: Callable[[], Iterator[Event]]) -> Tuple[str, Iterator[Event]]:
+        """Events for a request: replayed from the cache, shared with an identical
+        in-flight request, or produced upstream. Returns (source, events).
+        """
+        if key is None:
+            return 'ollama', produce()
+        cached = self.get(key)
+        if cached is not None:
+            return 'cache', (('chunk', chunk) for chunk in cached)
+        flight, leader = self._join(key)
+        if leader:
+            threading.Thread(target=self._pump, args=(flight, produce()), name='response-pump', daemon=True).start()
+        return ('ollama' if leader else 'coalesced'), self._follow(flight)
+
+    def astream(self, key: Optional[str],
+                produce: Callable[[], AsyncIterator[Event]]) -> Tuple[str, AsyncIterator[Event]]:
+        """asyncio version of stream(); the upstream runs as a task on the current loop."""
+        if key is None:
+            return 'ollama', produce()
+        cached = self.get(key)
+        if cached is not None:
+            return 'cache', _replay(cached)
+        flight, leader = self._join(key)
+        if leader:
+            asyncio.ensure_future(self._apump(flight, produce()))
+        return ('ollama' if leader else 'coalesced'), self._afollow(flight)
+
+    @staticmethod
+    def _follow(flight: Flight) -> Iterator[Event]:
+        try:
+            yield from flight.read()
+        finally:
+            flight.unsubscribe()
+
+    @staticmethod
+    async def _afollow(flight: Flight) -> AsyncIterator[Event]:
+        try:
+            async for event in flight.aread():
+                yield event
+        finally:
+            flight.unsubscribe()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counts['hits'] + self.counts['misses'] + self.counts['coalesced']
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'memory_bytes': self._bytes,
+                'in_flight': len(self._flights),
+                'hit_rate': round((self.counts['hits'] + self.counts['coalesced']) / lookups, 4) if lookups else 0.0,
+                **self.counts
+            }
+
+
+async def _replay(chunks: List[str]) -> AsyncIterator[Event]:
+    for chunk in chunks:
+        yield 'chunk', chunk
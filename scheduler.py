@@ -0,0 +1,163 @@
+# scheduler.py
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+Limit = Callable[[Dict], Optional[int]]
+Reserve = Callable[[Dict], bool]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER_CONFIG = {
+    "strategy": "least_outstanding",  # least_outstanding | weighted | latency | priority
+    "ewma_alpha": 0.3                 # Weight of the newest time-to-first-token sample
+}
+
+
+class InstanceLoad:
+    """In-flight and latency bookkeeping for one instance."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.total_requests = 0
+        self.ewma_ttft: Optional[float] = None  # seconds
+
+
+class StreamTicket:
+    """Handle for one in-flight stream; release it when the stream ends."""
+
+    def __init__(self, scheduler: 'InstanceScheduler', instance: Dict):
+        self.scheduler = scheduler
+        self.instance = instance
+        self.model: Optional[str] = None
+        self.started = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.released = False
+
+    def first_token(self):
+        """Record time-to-first-token for this stream (only the first call counts)."""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+            self.scheduler.record_ttft(self.instance['url'], self.ttft)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self.instance['url'])
+
+
+class InstanceScheduler:
+    """Spreads chat streams across all healthy instances.
+
+    Strategies:
+      least_outstanding - fewest in-flight streams
+      weighted          - fewest in-flight streams per unit of 'capacity'
+      latency           - lowest EWMA time-to-first-token scaled by queue depth
+      priority          - always the highest priority instance (plain failover)
+    Instance priority breaks ties in every strategy.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_SCHEDULER_CONFIG, **(settings or {})}
+        self.strategy = settings['strategy']
+        self.ewma_alpha = settings['ewma_alpha']
+        self._scores: Dict[str, Callable[[Dict, InstanceLoad], float]] = {
+            'least_outstanding': self._least_outstanding,
+            'weighted': self._weighted,
+            'latency': self._latency,
+            'priority': lambda instance, load: 0
+        }
+        if self.strategy not in self._scores:
+            raise ValueError(f"Unknown scheduler strategy: {self.strategy}")
+        self._lock = threading.Lock()
+        self._loads: Dict[str, InstanceLoad] = {}
+        self._release_listeners: List[Callable[[str], None]] = []
+
+    def add_release_listener(self, listener: Callable[[str], None]):
+        """Call 'listener(url)' whenever a stream on an instance ends."""
+        self._release_listeners.append(listener)
+
+    def _load(self, url: str) -> InstanceLoad:
+        load = self._loads.get(url)
+        if load is None:
+            load = self._loads[url] = InstanceLoad()
+        return load
+
+    @staticmethod
+    def _least_outstanding(instance: Dict, load: InstanceLoad) -> float:
+        return load.in_flight
+
+    @staticmethod
+    def _weighted(instance: Dict, load: InstanceLoad) -> float:
+        return (load.in_flight + 1) / max(instance.get('capacity', 1), 1e-6)
+
+    def _latency(self, instance: Dict, load: InstanceLoad) -> float:
+        # Unmeasured instances score 0 so every instance gets sampled
+        if load.ewma_ttft is None:
+            return 0.0
+        return load.ewma_ttft * (load.in_flight + 1)
+
+    def _has_room(self, instance: Dict, limit: Optional[Limit]) -> bool:
+        # Caller holds self._lock
+        cap = limit(instance) if limit else None
+        return cap is None or self._load(instance['url']).in_flight < cap
+
+    def has_capacity(self, candidates: List[Dict], limit: Optional[Limit] = None) -> bool:
+        with self._lock:
+            return any(self._has_room(instance, limit) for instance in candidates)
+
+    def acquire(self, candidates: List[Dict], warm: Optional[Set[str]] = None,
+                limit: Optional[Limit] = None, reserve: Optional[Reserve] = None) -> Optional[StreamTicket]:
+        """Pick the best candidate and count a new in-flight stream on it.
+
+        Candidates whose URL is in 'warm' (model already loaded) win over cold
+        ones; the strategy then decides among the preferred group. With a
+        'limit' (max streams per instance), full instances are skipped and
+        None is returned when all of them are full. 'reserve(instance)' may
+        still turn the pick down (e.g. when other processes fill the
+        instance), in which case the next best candidate is tried.
+        """
+        if not candidates:
+            return None
+        score = self._scores[self.strategy]
+        warm = warm or set()
+        with self._lock:
+            candidates = [instance for instance in candidates if self._has_room(instance, limit)]
+            while True:
+                if not candidates:
+                    return None
+                instance = min(candidates, key=lambda i: (
+                    i['url'] not in warm, score(i, self._load(i['url'])), i['priority']))
+                if reserve is None or reserve(instance):
+                    break
+                candidates.remove(instance)
+            load = self._load(instance['url'])
+            load.in_flight += 1
+            load.total_requests += 1
+        logger.debug(f"Scheduled stream on {instance['name']} ({self.strategy})")
+        return StreamTicket(self, instance)
+
+    def release(self, url: str):
+        with self._lock:
+            load = self._load(url)
+            load.in_flight = max(load.in_flight - 1, 0)
+        for listener in self._release_listeners:
+            listener(url)
+
+    def record_ttft(self, url: str, ttft: float):
+        with self._lock:
+            load = self._load(url)
+            if load.ewma_ttft is None:
+                load.ewma_ttft = ttft
+            else:
+                load.ewma_ttft = self.ewma_alpha * ttft + (1 - self.ewma_alpha) * load.ewma_ttft
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Load statistics per instance URL."""
+        with self._lock:
+            return {url: {
+                'in_flight': load.in_flight,
+                'total_requests': load.total_requests,
+                'ewma_ttft_ms': round(load.ewma_ttft * 1000, 1) if load.ewma_ttft is not None else None
+            } for url, load in self._loads.items()}
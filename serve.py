@@ -0,0 +1,64 @@
+# serve.py
+"""Production launcher: the async app under uvicorn, one worker process per core.
+
+    python3 serve.py                   # workers, host and port from the "server" section
+    python3 serve.py --workers 4 --port 5012
+
+Each worker is a separate process with its own event loop, so all cores
+serve requests. Workers share sessions (SQLite conversation store), the
+translation cache, and the health and model state published by one leader
+worker (see cluster.py). On SIGTERM, workers stop accepting connections and
+let open chat streams finish for up to graceful_timeout seconds.
+"""
+import argparse
+import json
+import logging
+import os
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_CONFIG = {
+    "host": "0.0.0.0",
+    "port": 5012,
+    "workers": 0,             # 0: one per CPU core
+    "graceful_timeout": 30    # Seconds open streams get to finish on shutdown
+}
+
+
+def server_settings(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read {path}: {e}, using default server settings")
+        config = {}
+    return {**DEFAULT_SERVER_CONFIG, **config.get('server', {})}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core)')
+    args = parser.parse_args()
+
+    settings = server_settings(os.environ.get('OLLAMA_CONFIG', 'ollama_config.json'))
+    workers = args.workers or settings['workers'] or os.cpu_count() or 1
+    # Read by app.py in every worker, which then shares state between them
+    os.environ['LLM_CHAT_WORKERS'] = str(workers)
+    logger.info(f"Starting {workers} worker(s)")
+    uvicorn.run(
+        'asgi_app:app',
+        host=args.host or settings['host'],
+        port=args.port or settings['port'],
+        workers=workers,
+        timeout_graceful_shutdown=settings['graceful_timeout'],
+        log_level='info'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# startup.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_CONFIG = {
+    "lazy": True,      # Create the translation backend on first use instead of at import
+    "prewarm": True    # ...but start creating it in the background once the app is serving
+}
+
+
+class StartupTimer:
+    """Times the phases of startup and the initialization deferred past it.
+
+    Phases run before ready() make up the time to serve. Deferred phases
+    (lazy initialization, discovery) are recorded with the time since
+    startup at which they finished.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._phases: List[Dict] = []
+
+    def record(self, name: str, seconds: float, deferred: bool = False):
+        with self._lock:
+            self._phases.append({
+                'name': name,
+                'ms': round(seconds * 1000, 1),
+                'deferred': deferred,
+                'at_ms': round((time.perf_counter() - self.started) * 1000, 1)
+            })
+        if deferred:
+            logger.info(f"Deferred startup phase {name} took {seconds * 1000:.0f}ms")
+
+    @contextmanager
+    def phase(self, name: str, deferred: bool = False):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, deferred)
+
+    def mark(self, name: str):
+        """Record a deferred milestone, e.g. an instance discovered, at the current time."""
+        self.record(name, 0.0, deferred=True)
+
+    def ready(self):
+        """The app can serve requests now."""
+        self.ready_at = time.perf_counter()
+        with self._lock:
+            phases = [f"{phase['name']} {phase['ms']:.0f}ms" for phase in self._phases if not phase['deferred']]
+        logger.info(f"Ready to serve in {(self.ready_at - self.started) * 1000:.0f}ms ({', '.join(phases)})")
+
+    def report(self) -> Dict:
+        with self._lock:
+            phases = list(self._phases)
+        return {
+            'started': self.wall_started,
+            'ready_ms': round((self.ready_at - self.started) * 1000, 1) if self.ready_at else None,
+            'phases': [phase for phase in phases if not phase['deferred']],
+            'deferred': [phase for phase in phases if phase['deferred']]
+        }
+
+
+# Created when this module is first imported, which app.py does before anything heavy
+startup = StartupTimer()
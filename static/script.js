@@ -29,6 +29,11 @@ async function checkModels() {
             modelSpan.textContent = currentModel;
             enableChat();
             await updateInstanceStatus();
+        } else if (data.discovering) {
+            // The server just started and is still probing its instances
+            modelSpan.textContent = 'Discovering models...';
+            disableChat();
+            setTimeout(checkModels, 1000);
         } else {
             console.log("No models found. Data:", data);
             modelSpan.textContent = 'No model available';
@@ -113,6 +118,26 @@ async function resetChat() {
     }
 }
 
+// Server-rendered markdown (render=html): finished blocks are appended as they
+// arrive and only the unfinished trailing block is replaced
+function createRenderedView(contentDiv) {
+    contentDiv.innerHTML = '';
+    const blocks = document.createElement('div');
+    const tail = document.createElement('div');
+    contentDiv.append(blocks, tail);
+    return {
+        update(html, tailHtml) {
+            if (html) {
+                blocks.insertAdjacentHTML('beforeend', html);
+            }
+            // Left out while the server has not rendered the tail again
+            if (tailHtml !== undefined) {
+                tail.innerHTML = tailHtml;
+            }
+        }
+    };
+}
+
 async function sendMessage() {
     const message = userInput.value.trim();
     if (!message) return;
@@ -122,15 +147,23 @@ async function sendMessage() {
     userInput.value = '';
 
     try {
-        const eventSource = new EventSource(`/api/chat?session_id=${sessionId}&message=${encodeURIComponent(message)}`);
+        let url = `/api/chat?session_id=${sessionId}&message=${encodeURIComponent(message)}&render=html`;
+        if (currentModel) {
+            url += `&model=${encodeURIComponent(currentModel)}`;
+        }
+        const eventSource = new EventSource(url);
         let currentMessageDiv = null;
         let currentMessageContent = '';
+        let currentTranslation = '';
+        let replyView = null;
+        let translationView = null;
 
         eventSource.onmessage = function(event) {
             const data = JSON.parse(event.data);
             
             if (data.error) {
-                addMessage(`Error: ${data.error}`, false, new Date().toISOString());
+                const retry = data.retry_after ? `. Please try again in ${data.retry_after} seconds.` : '';
+                addMessage(`Error: ${data.error}${retry}`, false, new Date().toISOString());
                 eventSource.close();
                 enableChat();
                 return;
@@ -147,14 +180,42 @@ async function sendMessage() {
                 chatMessages.appendChild(currentMessageDiv);
             }
         
-            if (data.chunk) {
-                currentMessageContent += data.chunk;
+            if (data.queue_position) {
                 const contentDiv = currentMessageDiv.querySelector('.message-content');
-                contentDiv.innerHTML = marked.parse(currentMessageContent);
-                scrollToBottom(); // Add scroll after chunk update
+                contentDiv.textContent = `Waiting for a free model slot (position ${data.queue_position} in queue)...`;
+            }
+        
+            if (data.html !== undefined) {
+                // Once translated text arrives, show that instead of the English text
+                if (!translationView) {
+                    if (!replyView) {
+                        replyView = createRenderedView(currentMessageDiv.querySelector('.message-content'));
+                    }
+                    replyView.update(data.html, data.html_tail);
+                    scrollToBottom();
+                }
+            } else if (data.chunk) {
+                currentMessageContent += data.chunk;
+                // Once translated sentences arrive, show those instead of the English text
+                if (!currentTranslation) {
+                    const contentDiv = currentMessageDiv.querySelector('.message-content');
+                    contentDiv.innerHTML = marked.parse(currentMessageContent);
+                    scrollToBottom(); // Add scroll after chunk update
+                }
             }
         
-            if (data.translation) {
+            if (data.translation_html !== undefined) {
+                if (!translationView) {
+                    translationView = createRenderedView(currentMessageDiv.querySelector('.message-content'));
+                }
+                translationView.update(data.translation_html, data.translation_html_tail);
+                scrollToBottom();
+            } else if (data.translation_chunk) {
+                currentTranslation += data.translation_chunk;
+                const contentDiv = currentMessageDiv.querySelector('.message-content');
+                contentDiv.innerHTML = marked.parse(currentTranslation);
+                scrollToBottom();
+            } else if (data.translation) {
                 const contentDiv = currentMessageDiv.querySelector('.message-content');
                 contentDiv.innerHTML = marked.parse(data.translation);
                 scrollToBottom(); // Add scroll after translation
@@ -174,6 +235,10 @@ async function sendMessage() {
 
         eventSource.onerror = function(error) {
             console.error('EventSource error:', error);
+            if (!currentMessageDiv) {
+                // Rejected before the stream started (e.g. 503 when the server is busy)
+                addMessage('The server is busy or unreachable. Please try again shortly.', false, new Date().toISOString());
+            }
             eventSource.close();
             enableChat();
         };
@@ -248,7 +313,7 @@ async function toggleTheme() {
 // Optional: Add theme-specific button icon
 function updateThemeButton() {
     const themeButton = document.querySelector('.theme-button');
-    if (document.styleSheets[0].href.includes('bright_style.css')) {
+    if (document.styleSheets[0].href.includes('bright_style')) {
         themeButton.innerHTML = '🌙'; // Moon for dark mode
     } else {
         themeButton.innerHTML = '☀️'; // Sun for light mode
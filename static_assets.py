@@ -0,0 +1,168 @@
+# static_assets.py
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATIC_CONFIG = {
+    "fingerprint": True,     # Serve /static/name.<hash>.ext with an immutable, year-long Cache-Control
+    "compress": True,        # Precompressed brotli (if installed) and gzip variants
+    "min_size": 512,         # Bytes; smaller files are always sent as they are
+    "max_age": 31536000      # Seconds fingerprinted files may be cached
+}
+
+# Types worth compressing; images and fonts already are
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def negotiate(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """The best of the 'available' encodings (in preference order) that the client accepts."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    for encoding in available:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+class CompressedBody:
+    """A response body with its ETag, compressed once per encoding and then reused.
+
+    Variants are made on first request (or by warm()) instead of at
+    startup, so a slow brotli pass never delays serving.
+    """
+
+    def __init__(self, data: bytes, mimetype: str, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_STATIC_CONFIG, **(settings or {})}
+        self.data = data
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.etag = self.digest[:16]
+        self._lock = threading.Lock()
+        self._variants: Dict[str, bytes] = {}
+        self.encodings: Tuple[str, ...] = ()
+        if settings['compress'] and len(data) >= settings['min_size'] and mimetype.startswith(_COMPRESSIBLE):
+            self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def _compress(self, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(self.data, quality=11)
+        return gzip.compress(self.data, compresslevel=9, mtime=0)
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.data
+        with self._lock:
+            if encoding not in self._variants:
+                self._variants[encoding] = self._compress(encoding)
+            return self._variants[encoding]
+
+    def select(self, accept_encoding: str) -> Tuple[Optional[str], bytes, str]:
+        """(encoding or None, body, ETag) for a client's Accept-Encoding header.
+
+        A compressed variant is only used when it is actually smaller.
+        """
+        encoding = negotiate(accept_encoding, self.encodings)
+        body = self.variant(encoding)
+        if encoding is None or len(body) >= len(self.data):
+            return None, self.data, self.etag
+        return encoding, body, f"{self.etag}-{encoding}"
+
+    def warm(self):
+        for encoding in self.encodings:
+            self.variant(encoding)
+
+
+class AssetManifest:
+    """The files of the static folder, each under a name that changes with its content.
+
+    build() hashes every file once at startup. url('/static/style.css')
+    then gives '/static/style.<hash>.css', which browsers may cache for a
+    year: an edited file gets a new name, and the page links to it.
+    """
+
+    def __init__(self, static_dir: str, url_prefix: str = '/static', settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_STATIC_CONFIG, **(settings or {})}
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.max_age = self.settings['max_age']
+        self._assets: Dict[str, CompressedBody] = {}
+        self._fingerprinted: Dict[str, str] = {}   # Original name -> fingerprinted name
+        self._originals: Dict[str, str] = {}       # Fingerprinted name -> original name
+
+    def build(self) -> 'AssetManifest':
+        for root, _, files in os.walk(self.static_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                asset = CompressedBody(data, mimetype, self.settings)
+                self._assets[name] = asset
+                if self.settings['fingerprint']:
+                    stem, ext = os.path.splitext(name)
+                    fingerprinted = f"{stem}.{asset.digest[:10]}{ext}"
+                    self._fingerprinted[name] = fingerprinted
+                    self._originals[fingerprinted] = name
+        logger.info(f"Indexed {len(self._assets)} static files")
+        return self
+
+    def url(self, path: str) -> str:
+        """The fingerprinted URL of a static file, given its name or its plain (possibly relative) static URL."""
+        prefix = self.url_prefix + '/'
+        name = path.lstrip('/')
+        if name.startswith(prefix.lstrip('/')):
+            name = name[len(prefix) - 1:]
+        if name in self._fingerprinted:
+            return prefix + self._fingerprinted[name]
+        return prefix + name if name in self._assets else path
+
+    def lookup(self, name: str) -> Tuple[Optional[CompressedBody], bool]:
+        """(asset or None, whether 'name' is a fingerprinted, immutable name)."""
+        if name in self._originals:
+            return self._assets[self._originals[name]], True
+        return self._assets.get(name), False
+
+    def warm(self):
+        """Compress every asset now, e.g. from a background thread after startup."""
+        for asset in list(self._assets.values()):
+            asset.warm()
+
+
+class PageCache:
+    """Rendered pages kept per variant (e.g. theme), re-rendered only when their inputs change."""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._pages: Dict[str, Tuple[Tuple, CompressedBody]] = {}
+
+    def get(self, variant: str, inputs: Tuple, render) -> CompressedBody:
+        """The page for 'variant', calling render() only if 'inputs' differ from the cached page's."""
+        with self._lock:
+            cached = self._pages.get(variant)
+            if cached and cached[0] == inputs:
+                return cached[1]
+        page = CompressedBody(render().encode('utf-8'), 'text/html', self.settings)
+        with self._lock:
+            self._pages[variant] = (inputs, page)
+        return page
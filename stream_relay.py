@@ -0,0 +1,242 @@
+# stream_relay.py
+import asyncio
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib json module is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_RELAY_CONFIG = {
+    "flush_ms": 0,         # Default flush window; 0 sends every token as its own event
+    "max_flush_ms": 250,   # Upper bound for windows requested by clients (flush_ms parameter)
+    "flush_chars": 256     # Send early once this many characters are pending
+}
+
+if orjson is not None:
+    def loads(data: bytes):
+        return orjson.loads(data)
+
+    def dumps(payload: Dict) -> str:
+        return orjson.dumps(payload).decode('utf-8')
+else:
+    def loads(data: bytes):
+        return json.loads(data)
+
+    def dumps(payload: Dict) -> str:
+        return json.dumps(payload)
+
+
+def iter_ndjson(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """Parse NDJSON objects straight from raw response bytes, as they arrive."""
+    buffer = b''
+    for data in chunks:
+        buffer = buffer + data if buffer else data
+        start = 0
+        end = buffer.find(b'\n')
+        while end != -1:
+            if end > start:
+                yield loads(buffer[start:end])
+            start = end + 1
+            end = buffer.find(b'\n', start)
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield loads(buffer)
+
+
+async def aiter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """asyncio version of iter_ndjson()."""
+    buffer = b''
+    async for data in chunks:
+        buffer = buffer + data if buffer else data
+        start = 0
+        end = buffer.find(b'\n')
+        while end != -1:
+            if end > start:
+                yield loads(buffer[start:end])
+            start = end + 1
+            end = buffer.find(b'\n', start)
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield loads(buffer)
+
+
+Event = Tuple[str, str]
+
+
+class ChunkBatcher:
+    """Coalesces reply tokens into flush windows.
+
+    Pending text is released with the first token that arrives 'window_ms'
+    or more after the oldest pending one, or once 'max_chars' are pending.
+    A window of 0 releases every token as it comes. add() alone only runs
+    when a token arrives; batched() and abatched() also flush once
+    remaining() runs out, so a pause in the model's output never holds back
+    the tokens before it.
+    """
+
+    def __init__(self, window_ms: float = 0, max_chars: int = 256):
+        self.window = window_ms / 1000
+        self.max_chars = max_chars
+        self._pending: List[str] = []
+        self._chars = 0
+        self._since = 0.0
+
+    def add(self, text: str) -> Optional[str]:
+        """Queue a token; returns the text to send now, if the window is due."""
+        if not self.window:
+            return text
+        if not self._pending:
+            self._since = time.perf_counter()
+        self._pending.append(text)
+        self._chars += len(text)
+        if self._chars >= self.max_chars or time.perf_counter() - self._since >= self.window:
+            return self.flush()
+        return None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the pending text is due; None if nothing is pending."""
+        if not self._pending:
+            return None
+        return max(self._since + self.window - time.perf_counter(), 0.0)
+
+    def flush(self) -> Optional[str]:
+        """Release whatever is pending, e.g. when the stream ends."""
+        if not self._pending:
+            return None
+        text = ''.join(self._pending)
+        self._pending = []
+        self._chars = 0
+        return text
+
+
+class _End:
+    """Marks the end of the events read on batched()'s helper thread."""
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+def batched(events: Iterator[Event], batcher: ChunkBatcher) -> Iterator[Event]:
+    """Relay (kind, content) events with the 'chunk' contents coalesced by 'batcher'.
+
+    Pending text goes out when its window is due, even if no event arrives;
+    for that, 'events' is read on a helper thread while this side waits with
+    a timeout. Closing the result closes 'events'.
+    """
+    if not batcher.window:
+        try:
+            yield from events
+        finally:
+            events.close()
+        return
+
+    items: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        end = _End()
+        try:
+            for event in events:
+                if stop.is_set():
+                    break
+                items.put(event)
+        except Exception as e:
+            end.error = e
+        finally:
+            events.close()
+            items.put(end)
+
+    threading.Thread(target=pump, name='stream-relay', daemon=True).start()
+    try:
+        while True:
+            try:
+                event = items.get(timeout=batcher.remaining())
+            except queue.Empty:
+                yield 'chunk', batcher.flush()
+                continue
+            if isinstance(event, _End):
+                if event.error:
+                    raise event.error  # Pending text stays in the batcher for the caller to flush
+                break
+            kind, content = event
+            text = batcher.add(content) if kind == 'chunk' else batcher.flush()
+            if text:
+                yield 'chunk', text
+            if kind != 'chunk':
+                yield event
+        text = batcher.flush()
+        if text:
+            yield 'chunk', text
+    finally:
+        # The helper stops and closes 'events' once its current read returns
+        stop.set()
+
+
+async def abatched(events: AsyncIterator[Event], batcher: ChunkBatcher) -> AsyncIterator[Event]:
+    """asyncio version of batched(): the next event is awaited with the window as timeout.
+
+    The read is not cancelled when the window runs out, only waited for
+    again, so the upstream stream is never interrupted.
+    """
+    if not batcher.window:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+        return
+
+    iterator = events.__aiter__()
+    next_event: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_event}, timeout=batcher.remaining())
+            if not done:
+                yield 'chunk', batcher.flush()
+                continue
+            try:
+                kind, content = next_event.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_event = None
+            text = batcher.add(content) if kind == 'chunk' else batcher.flush()
+            if text:
+                yield 'chunk', text
+            if kind != 'chunk':
+                yield kind, content
+        text = batcher.flush()
+        if text:
+            yield 'chunk', text
+    finally:
+        if next_event is not None:
+            # Cancels the read, which runs the upstream's cleanup like a client disconnect does
+            next_event.cancel()
+            try:
+                await next_event
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+        await events.aclose()
+
+
+def flush_window(requested, settings: Optional[Dict] = None) -> float:
+    """The client's requested window in ms, falling back to the default and capped at max_flush_ms."""
+    settings = {**DEFAULT_STREAM_RELAY_CONFIG, **(settings or {})}
+    try:
+        window = float(requested) if requested not in (None, '') else settings['flush_ms']
+    except (TypeError, ValueError):
+        window = settings['flush_ms']
+    if not math.isfinite(window):
+        window = settings['flush_ms']  # NaN would slip through the clamp below and never flush
+    return min(max(window, 0.0), settings['max_flush_ms'])
@@ -0,0 +1,117 @@
+# streaming_translation.py
+import logging
+import re
+from collections import deque
+from typing import Callable, Deque, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAMING_TRANSLATION_CONFIG = {
+    "enabled": True,
+    "min_chars": 40,     # Don't send segments shorter than this unless the stream ended
+    "max_workers": 4     # Translation calls running at once across all streams
+}
+
+# Sentence ends followed by whitespace, or line breaks (markdown blocks, list items).
+# A digit before the period is not a boundary, so "1. Item" stays whole.
+_BOUNDARY = re.compile(r'(?<=[^\d\s][.!?])[ \t]+|\n+')
+_CODE_FENCE = '```'
+
+
+class SentenceSegmenter:
+    """Cuts a token stream into translatable segments at sentence boundaries.
+
+    Never cuts inside a fenced code block, so code reaches the translator
+    whole. Segments keep their surrounding whitespace so joining them
+    reproduces the original text.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self.buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        cut = None
+        for match in _BOUNDARY.finditer(self.buffer):
+            end = match.end()
+            if end >= self.min_chars and self.buffer.count(_CODE_FENCE, 0, end) % 2 == 0:
+                cut = end
+        if cut is None:
+            return []
+        segment, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return [segment]
+
+    def flush(self) -> List[str]:
+        segment, self.buffer = self.buffer, ''
+        return [segment] if segment else []
+
+
+def _split_whitespace(segment: str) -> Tuple[str, str, str]:
+    core = segment.strip()
+    if not core:
+        return segment, '', ''
+    start = segment.index(core)
+    return segment[:start], core, segment[start + len(core):]
+
+
+class StreamingTranslation:
+    """Translates a generation sentence by sentence while it is still streaming.
+
+    Segments are handed to 'submit' (an executor's submit, or an asyncio
+    run_in_executor wrapper) as soon as they are complete, and translated
+    pieces are released strictly in order.
+    """
+
+    def __init__(self, translate: Callable[[str], str], submit: Callable, min_chars: int = 40):
+        self.translate = translate
+        self.submit = submit
+        self.segmenter = SentenceSegmenter(min_chars)
+        self._futures: Deque = deque()
+        self._pieces: List[str] = []
+
+    def _translate_segment(self, segment: str) -> str:
+        leading, core, trailing = _split_whitespace(segment)
+        if not core:
+            return segment
+        try:
+            return leading + self.translate(core) + trailing
+        except Exception as e:
+            logger.error(f"Segment translation failed: {str(e)}")
+            return segment
+
+    def _submit(self, segments: List[str]):
+        for segment in segments:
+            self._futures.append(self.submit(self._translate_segment, segment))
+
+    def feed(self, text: str):
+        self._submit(self.segmenter.feed(text))
+
+    def finish(self):
+        """Send the trailing partial sentence once generation has ended."""
+        self._submit(self.segmenter.flush())
+
+    def ready(self) -> List[str]:
+        """Translated pieces that are done, in order, without blocking."""
+        pieces = []
+        while self._futures and self._futures[0].done():
+            pieces.append(self._futures.popleft().result())
+        self._pieces.extend(pieces)
+        return pieces
+
+    def drain(self):
+        """Yield the remaining pieces in order, blocking on each (sync callers)."""
+        while self._futures:
+            self._futures[0].result()
+            yield from self.ready()
+
+    async def adrain(self):
+        """Yield the remaining pieces in order, awaiting each (asyncio callers)."""
+        while self._futures:
+            await self._futures[0]
+            for piece in self.ready():
+                yield piece
+
+    def text(self) -> str:
+        """Everything translated so far."""
+        return ''.join(self._pieces)
@@ -0,0 +1,51 @@
+# conftest.py
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+# The modules live at the repository root, next to app.py
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_ollama_server(*args: str, count: int = 2):
+    """Run benchmarks/mock_ollama.py on 'count' free ports; yields the ports."""
+    ports = [free_port() for _ in range(count)]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO, 'benchmarks', 'mock_ollama.py'), '--ports', *map(str, ports), *args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 10
+        for port in ports:
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                    break
+                except OSError:
+                    assert time.monotonic() < deadline, "mock Ollama did not start"
+                    time.sleep(0.05)
+        yield ports
+    finally:
+        server.terminate()
+        server.wait(5)
+
+
+@pytest.fixture
+def mock_ollama():
+    """Two fast mock Ollama instances."""
+    with mock_ollama_server('--tokens', '5', '--token-rate', '500', '--first-token-delay', '0',
+                            '--load-delay', '0') as ports:
+        yield ports
@@ -0,0 +1,155 @@
+# test_admission.py
+import asyncio
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, QueueFull, QueueTimeout
+from conftest import mock_ollama_server
+from scheduler import InstanceScheduler
+
+INSTANCE = {'url': 'http://a', 'name': 'A', 'priority': 1, 'max_concurrent': 1}
+
+
+def controller(**settings):
+    return AdmissionController(InstanceScheduler(), settings)
+
+
+def test_waiting_requests_are_served_in_order_per_model():
+    admission = controller()
+    first = admission.enqueue('m', [INSTANCE])
+    second, third = admission.enqueue('m', [INSTANCE]), admission.enqueue('m', [INSTANCE])
+    assert first.granted
+    assert (second.position(), third.position()) == (1, 2)
+
+    first.ticket.release()
+    assert second.granted and not third.granted
+    assert third.position() == 1
+    second.ticket.release()
+    assert third.granted and third.position() == 0
+
+
+def test_freed_slots_rotate_between_models():
+    admission = controller()
+    running = admission.enqueue('a', [INSTANCE])
+    a1, a2, b1 = (admission.enqueue(model, [INSTANCE]) for model in ('a', 'a', 'b'))
+
+    order = []
+    for _ in range(3):
+        running.ticket.release()
+        running = next(waiting for waiting in (a1, a2, b1) if waiting.granted and waiting not in order)
+        order.append(running)
+    # A busy model does not starve the other: b1 goes before the second 'a' request
+    assert order == [a1, b1, a2]
+
+
+def test_queue_positions_are_reported_as_they_change():
+    admission = controller()
+    running = [admission.enqueue('m', [INSTANCE]), admission.enqueue('m', [INSTANCE])]
+    waiting = admission.enqueue('m', [INSTANCE])
+
+    def release_in_turn():
+        for granted in (running[0], running[1]):
+            time.sleep(0.1)
+            granted.ticket.release()
+
+    threading.Thread(target=release_in_turn).start()
+    assert list(waiting.updates(interval=0.02)) == [2, 1]
+    assert waiting.granted
+
+
+def test_async_queue_positions_are_reported_as_they_change():
+    admission = controller()
+    running = admission.enqueue('m', [INSTANCE])
+    waiting = admission.enqueue('m', [INSTANCE])
+
+    async def watch():
+        asyncio.get_event_loop().call_later(0.1, running.ticket.release)
+        return [position async for position in waiting.aupdates(interval=0.02)]
+
+    assert asyncio.run(watch()) == [1]
+    assert waiting.granted
+
+
+def test_full_queue_rejects_with_retry_after():
+    admission = controller(max_queue_per_model=1, retry_after=7)
+    admission.enqueue('m', [INSTANCE])
+    admission.enqueue('m', [INSTANCE])
+    with pytest.raises(QueueFull) as rejected:
+        admission.enqueue('m', [INSTANCE])
+    assert rejected.value.retry_after == 7
+    with pytest.raises(QueueFull):
+        admission.check('m', [INSTANCE])
+    assert admission.stats()['rejected'] == 1
+
+
+def test_waiting_too_long_times_out_and_leaves_the_queue():
+    admission = controller(queue_timeout=0.05)
+    admission.enqueue('m', [INSTANCE])
+    waiting = admission.enqueue('m', [INSTANCE])
+    with pytest.raises(QueueTimeout):
+        list(waiting.updates(interval=0.01))
+    assert admission.depth() == {}
+    assert admission.stats()['timed_out'] == 1
+
+
+def test_cancel_leaves_the_queue_or_gives_the_slot_back():
+    admission = controller()
+    running = admission.enqueue('m', [INSTANCE])
+    gone, waiting = admission.enqueue('m', [INSTANCE]), admission.enqueue('m', [INSTANCE])
+
+    gone.cancel()  # Client disconnected while queued
+    assert waiting.position() == 1 and admission.stats()['cancelled'] == 1
+    running.cancel()  # Client disconnected while streaming
+    assert waiting.granted and not gone.granted
+
+
+@pytest.fixture(scope='module')
+def app_client(tmp_path_factory):
+    """The Flask app on one slow mock instance with a single stream slot and no queue."""
+    with mock_ollama_server('--tokens', '400', '--token-rate', '40', '--first-token-delay', '0',
+                            '--load-delay', '0', count=1) as ports:
+        config = tmp_path_factory.mktemp('admission') / 'ollama_config.json'
+        config.write_text(json.dumps({
+            'ollama_instances': [{'url': f'http://127.0.0.1:{ports[0]}', 'priority': 1, 'name': 'Mock',
+                                  'description': 'test', 'max_concurrent': 1}],
+            'admission': {'max_queue_per_model': 0, 'retry_after': 7},
+            'translation': {'backend': 'local', 'cache': {'path': None}},
+            'conversation_store': {'backend': 'memory'},
+            'response_cache': {'enabled': False}
+        }))
+        os.environ['OLLAMA_CONFIG'] = str(config)
+        try:
+            app = importlib.import_module('app')
+        finally:
+            del os.environ['OLLAMA_CONFIG']
+        assert app.ollama_manager.wait_discovered(10)
+        yield app.app.test_client()
+        app.ollama_manager.stop_health_monitor()
+        sys.modules.pop('app', None)
+
+
+def open_chat(client, session_id):
+    return client.get('/api/chat', query_string={'message': 'Please tell me a long story about the sea',
+                                                  'session_id': session_id}, buffered=False)
+
+
+def test_http_rejection_and_release_on_disconnect(app_client):
+    streaming = open_chat(app_client, 'first')
+    body = streaming.response
+    assert b'"chunk"' in next(iter(body))  # Holds the only slot now
+
+    rejected = open_chat(app_client, 'second')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '7'
+    assert 'busy' in rejected.get_json()['error']
+
+    streaming.close()  # The client went away mid-reply
+    accepted = open_chat(app_client, 'third')
+    assert accepted.status_code == 200
+    accepted.close()
@@ -0,0 +1,71 @@
+# test_batch.py
+import json
+import os
+import subprocess
+import sys
+
+from batch import BatchJob, BatchRunner
+from conftest import REPO
+from health_monitor import StillDiscovering
+
+
+def write_lines(path, items):
+    with open(path, 'w') as f:
+        for item in items:
+            f.write(json.dumps(item) + '\n')
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_cli_waits_for_discovery_instead_of_failing_every_item(tmp_path, mock_ollama):
+    config = tmp_path / 'ollama_config.json'
+    config.write_text(json.dumps({
+        'ollama_instances': [{'url': f'http://127.0.0.1:{port}', 'priority': i, 'name': f'Mock {i}',
+                              'description': 'test'} for i, port in enumerate(mock_ollama, 1)],
+        'translation': {'backend': 'local', 'cache': {'path': None}},
+        'conversation_store': {'backend': 'memory'}
+    }))
+    write_lines(tmp_path / 'in.jsonl', [{'id': i, 'message': f'hello {i}', 'language': 'en'} for i in range(4)])
+
+    run = subprocess.run([sys.executable, 'batch.py', str(tmp_path / 'in.jsonl'), str(tmp_path / 'out.jsonl')],
+                         cwd=REPO, env={**os.environ, 'OLLAMA_CONFIG': str(config)},
+                         capture_output=True, text=True, timeout=60)
+
+    assert run.returncode == 0, run.stderr
+    results = read_lines(tmp_path / 'out.jsonl')
+    assert sorted(result['id'] for result in results) == [0, 1, 2, 3]
+    assert all(result.get('reply') and not result.get('error') for result in results)
+    assert 'interpreter shutdown' not in run.stderr
+
+
+def test_still_discovering_is_retried_not_recorded_as_failed(tmp_path):
+    calls = []
+
+    def run_item(item):
+        calls.append(item['id'])
+        if len(calls) < 3:
+            raise StillDiscovering(retry_after=0)
+        return {'id': item['id'], 'line': item['line'], 'reply': 'hi'}
+
+    write_lines(tmp_path / 'in.jsonl', [{'id': 'a', 'message': 'hello'}])
+    runner = BatchRunner(run_item, lambda: 1, {'discovery_timeout': 5}, lambda timeout: False)
+    job = runner.run(BatchJob(str(tmp_path / 'in.jsonl'), str(tmp_path / 'out.jsonl')))
+
+    assert (job.completed, job.failed) == (1, 0)
+    assert calls == ['a', 'a', 'a']
+    assert read_lines(tmp_path / 'out.jsonl')[0]['reply'] == 'hi'
+
+
+def test_still_discovering_fails_the_item_after_the_discovery_timeout(tmp_path):
+    def run_item(item):
+        raise StillDiscovering(retry_after=0)
+
+    write_lines(tmp_path / 'in.jsonl', [{'id': 'a', 'message': 'hello'}])
+    runner = BatchRunner(run_item, lambda: 1, {'discovery_timeout': 0})
+    job = runner.run(BatchJob(str(tmp_path / 'in.jsonl'), str(tmp_path / 'out.jsonl')))
+
+    assert (job.completed, job.failed) == (0, 1)
+    assert 'discovering' in read_lines(tmp_path / 'out.jsonl')[0]['error']
@@ -0,0 +1,58 @@
+# test_cluster.py
+import multiprocessing
+
+from admission import AdmissionController
+from cluster import SharedSlots
+from scheduler import InstanceScheduler
+
+INSTANCE = {'url': 'http://a', 'name': 'A', 'priority': 1, 'max_concurrent': 3}
+
+
+def take_slots(state_dir, attempts, start, results):
+    slots = SharedSlots({'state_dir': state_dir})
+    start.wait()
+    results.put(sum(slots.take(INSTANCE['url'], INSTANCE['max_concurrent']) for _ in range(attempts)))
+
+
+def test_workers_together_stay_within_max_concurrent(tmp_path):
+    SharedSlots({'state_dir': str(tmp_path)})  # Creates the table before the workers race
+    context = multiprocessing.get_context('spawn')
+    start, results = context.Event(), context.Queue()
+    workers = [context.Process(target=take_slots, args=(str(tmp_path), 5, start, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    taken = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(10)
+    assert sum(taken) == INSTANCE['max_concurrent']
+
+
+def test_controllers_share_an_instance_and_free_slots_on_release(tmp_path):
+    # Two controllers with their own schedulers stand in for two worker processes
+    first = AdmissionController(InstanceScheduler(), {'max_queue': 4}, slots=SharedSlots({'state_dir': str(tmp_path)}))
+    second = AdmissionController(InstanceScheduler(), {'max_queue': 4}, slots=SharedSlots({'state_dir': str(tmp_path)}))
+    instance = {**INSTANCE, 'max_concurrent': 1}
+
+    granted = first.enqueue('m', [instance])
+    waiting = second.enqueue('m', [instance])
+    assert granted.granted and not waiting.granted
+
+    granted.ticket.release()
+    assert waiting.wait(1)  # Polling dispatch() picks up the slot the other worker freed
+    assert first.slots.in_flight() == {instance['url']: 1}
+
+
+def test_sweep_frees_the_slots_of_exited_workers(tmp_path):
+    slots = SharedSlots({'state_dir': str(tmp_path)})
+    context = multiprocessing.get_context('spawn')
+    start, results = context.Event(), context.Queue()
+    start.set()
+    worker = context.Process(target=take_slots, args=(str(tmp_path), 2, start, results))
+    worker.start()
+    assert results.get(timeout=30) == 2
+    worker.join(10)
+
+    assert slots.in_flight() == {INSTANCE['url']: 2}
+    assert slots.sweep() == 1
+    assert slots.in_flight() == {}
@@ -0,0 +1,105 @@
+# test_config.py
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+import config
+from config import ConfigFile, write_json_atomic
+
+
+def write_external(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))  # A distinct mtime even within the clock's resolution
+
+
+def test_save_keeps_the_file_mode(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('{}')
+    os.chmod(path, 0o644)
+    write_json_atomic(str(path), {'theme': 'dark'})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert json.loads(path.read_text()) == {'theme': 'dark'}
+
+
+def test_new_file_gets_the_umask_mode(tmp_path):
+    path = tmp_path / 'config.json'
+    write_json_atomic(str(path), {'theme': 'dark'})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~config._UMASK
+
+
+def test_external_edit_is_reloaded_and_announced(tmp_path):
+    path = tmp_path / 'ollama_config.json'
+    write_external(path, '{"ollama_instances": []}', 1_000_000_000)
+    config_file = ConfigFile(str(path), validate=lambda data: 'ollama_instances' in data)
+    seen = []
+    config_file.add_listener(seen.append)
+
+    assert not config_file.check()  # Unchanged
+    write_external(path, '{"ollama_instances": [{"url": "http://a"}]}', 2_000_000_000)
+    assert config_file.check()
+    assert config_file.get() == {'ollama_instances': [{'url': 'http://a'}]}
+    assert seen == [config_file.get()]
+
+
+def test_malformed_edit_keeps_the_last_good_version(tmp_path):
+    path = tmp_path / 'ollama_config.json'
+    write_external(path, '{"ollama_instances": []}', 1_000_000_000)
+    config_file = ConfigFile(str(path), validate=lambda data: 'ollama_instances' in data)
+
+    write_external(path, '{"ollama_instances": [', 2_000_000_000)
+    assert not config_file.check()
+    write_external(path, '{"other": 1}', 3_000_000_000)
+    assert not config_file.check()
+    assert config_file.get() == {'ollama_instances': []}
+
+
+def test_malformed_file_is_replaced_with_the_default(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('not json')
+    config_file = ConfigFile(str(path), {'theme': 'dark'})
+    assert config_file.get() == {'theme': 'dark'}
+    assert json.loads(path.read_text()) == {'theme': 'dark'}
+
+
+def test_malformed_file_without_default_raises(tmp_path):
+    path = tmp_path / 'ollama_config.json'
+    path.write_text('{')
+    with pytest.raises(json.JSONDecodeError):
+        ConfigFile(str(path))
+
+
+def test_concurrent_saves_leave_one_complete_file(tmp_path):
+    path = tmp_path / 'config.json'
+    config_file = ConfigFile(str(path), {'theme': 'dark', 'writer': None})
+    errors = []
+
+    def save(writer):
+        try:
+            for turn in range(20):
+                config_file.save({'theme': 'dark', 'writer': writer, 'turn': turn, 'padding': 'x' * 4096})
+        except Exception as e:
+            errors.append(e)
+
+    def poll():
+        # A watcher checking meanwhile never sees a half-written file
+        try:
+            for _ in range(200):
+                config_file.check()
+                json.loads(path.read_text())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(writer,)) for writer in range(4)]
+    threads.append(threading.Thread(target=poll))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    on_disk = json.loads(path.read_text())
+    assert on_disk == config_file.get() and on_disk['turn'] == 19
+    assert os.listdir(tmp_path) == ['config.json']  # No temporary files left behind
@@ -0,0 +1,137 @@
+# test_conversation_store.py
+import multiprocessing
+import time
+
+import pytest
+
+from conversation_store import (MemoryConversationStore, SQLiteConversationStore, create_conversation_store,
+                                new_conversation)
+
+
+def sqlite_store(path):
+    return SQLiteConversationStore(str(path), max_sessions=100, ttl=3600, purge_interval=60)
+
+
+def append_turns(path, worker, turns, start):
+    store = sqlite_store(path)
+    start.wait()
+    for turn in range(turns):
+        def append(conversation):
+            conversation = conversation or new_conversation('en')
+            conversation['messages'].append({'role': 'user', 'content': f'{worker}-{turn}'})
+            return conversation
+        store.update('s', append)
+
+
+def test_concurrent_updates_from_several_processes_lose_no_message(tmp_path):
+    path = tmp_path / 'conversations.db'
+    sqlite_store(path)
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    workers = [context.Process(target=append_turns, args=(path, worker, 25, start)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    contents = {message['content'] for message in sqlite_store(path).get('s')['messages']}
+    assert contents == {f'{worker}-{turn}' for worker in range(4) for turn in range(25)}
+
+
+def test_update_returning_none_leaves_the_session_alone(tmp_path):
+    store = sqlite_store(tmp_path / 'conversations.db')
+    store.put('s', {'messages': [{'role': 'user', 'content': 'hi'}], 'language': 'sv'})
+    assert store.update('s', lambda conversation: None) is None
+    assert store.update('missing', lambda conversation: conversation) is None
+    assert store.get('s') == {'messages': [{'role': 'user', 'content': 'hi'}], 'language': 'sv'}
+    assert store.get('missing') is None
+
+
+def conversation(text='hi', language='en'):
+    return {'messages': [{'role': 'user', 'content': text}], 'language': language}
+
+
+def test_memory_store_returns_copies():
+    store = MemoryConversationStore(max_sessions=10, ttl=3600, max_memory_mb=1)
+    store.put('s', conversation())
+    copy = store.get('s')
+    copy['messages'].append({'role': 'assistant', 'content': 'hello'})
+    assert store.get('s') == conversation()
+
+
+def test_memory_store_evicts_least_recently_used_sessions():
+    store = MemoryConversationStore(max_sessions=2, ttl=3600, max_memory_mb=1)
+    store.put('a', conversation())
+    store.put('b', conversation())
+    store.get('a')  # Now more recent than b
+    store.put('c', conversation())
+    assert store.get('b') is None
+    assert store.get('a') and store.get('c')
+    assert store.stats()['evictions']['lru'] == 1
+
+
+def test_memory_store_expires_idle_sessions():
+    store = MemoryConversationStore(max_sessions=10, ttl=0.05, max_memory_mb=1)
+    store.put('a', conversation())
+    time.sleep(0.1)
+    assert store.get('a') is None
+    assert store.stats()['evictions']['ttl'] == 1 and len(store) == 0
+
+
+def test_memory_store_keeps_within_its_memory_cap():
+    store = MemoryConversationStore(max_sessions=10, ttl=3600, max_memory_mb=1000 / (1024 * 1024))
+    store.put('a', conversation('x' * 600))
+    store.put('b', conversation('y' * 600))
+    assert store.get('a') is None and store.get('b')
+    assert store.stats()['evictions']['memory'] == 1
+    assert store.stats()['memory_bytes'] < 1000
+    # A single session larger than the cap is still kept
+    store.put('c', conversation('z' * 2000))
+    assert store.get('c') and len(store) == 1
+
+
+def test_sqlite_sessions_are_shared_through_the_file(tmp_path):
+    sqlite_store(tmp_path / 'conversations.db').put('s', conversation('hej', 'sv'))
+    assert sqlite_store(tmp_path / 'conversations.db').get('s') == conversation('hej', 'sv')
+
+
+def test_sqlite_expired_session_is_dropped_on_read(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / 'conversations.db'), max_sessions=10, ttl=0.05,
+                                    purge_interval=3600)
+    store.put('s', conversation())
+    time.sleep(0.1)
+    assert store.get('s') is None
+    assert len(store) == 0 and store.stats()['evictions']['ttl'] == 1
+
+
+def test_sqlite_purge_drops_expired_and_least_recently_used_sessions(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / 'conversations.db'), max_sessions=2, ttl=60,
+                                    purge_interval=3600)
+    for session_id in ('old', 'a', 'b', 'c'):
+        store.put(session_id, conversation())
+        time.sleep(0.01)
+    with store._db() as db:
+        db.execute("UPDATE sessions SET updated = updated - 120 WHERE session_id = 'old'")
+
+    store.purge()
+    assert [session_id for session_id in ('old', 'a', 'b', 'c') if store.get(session_id)] == ['b', 'c']
+    assert store.stats()['evictions'] == {'lru': 1, 'ttl': 1, 'memory': 0}
+
+
+def test_sqlite_put_purges_every_purge_interval(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / 'conversations.db'), max_sessions=1, ttl=3600,
+                                    purge_interval=0)
+    store.put('a', conversation())
+    time.sleep(0.01)
+    store.put('b', conversation())
+    assert len(store) == 1 and store.get('b')
+
+
+def test_create_conversation_store_picks_the_backend(tmp_path):
+    assert create_conversation_store().backend == 'memory'
+    store = create_conversation_store({'backend': 'sqlite', 'path': str(tmp_path / 'sub' / 'conversations.db')})
+    assert store.backend == 'sqlite'
+    with pytest.raises(ValueError):
+        create_conversation_store({'backend': 'redis'})
@@ -0,0 +1,65 @@
+# test_failover.py
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO, mock_ollama_server
+from failover import Failover, StreamInterrupted
+
+MESSAGES = [{'role': 'user', 'content': 'Tell me a story'}]
+
+
+def test_partial_reply_is_sent_as_an_assistant_prefill():
+    failover = Failover(MESSAGES)
+    assert failover.messages() == MESSAGES
+    failover.record('Once upon')
+    failover.record(' a time')
+    assert failover.messages() == MESSAGES + [{'role': 'assistant', 'content': 'Once upon a time'}]
+    assert MESSAGES == [{'role': 'user', 'content': 'Tell me a story'}]  # The prompt itself is untouched
+
+
+def test_failed_instances_are_tried_at_most_max_failovers_times():
+    failover = Failover(MESSAGES, {'max_failovers': 2})
+    assert failover.should_retry('a', StreamInterrupted())
+    assert failover.should_retry('b', StreamInterrupted())
+    assert not failover.should_retry('c', StreamInterrupted())
+    assert failover.failed == {'a', 'b', 'c'}
+
+
+def test_no_retry_when_it_would_repeat_text_or_is_disabled():
+    restart = Failover(MESSAGES, {'resume': False})
+    assert restart.should_retry('a', StreamInterrupted())  # Nothing sent yet: starting over is fine
+    restart.record('Once')
+    assert not restart.should_retry('b', StreamInterrupted())
+    assert not Failover(MESSAGES, {'enabled': False}).should_retry('a', StreamInterrupted())
+
+
+def test_reply_continues_on_another_instance_after_a_dropped_stream(tmp_path):
+    fast = ('--tokens', '20', '--token-rate', '500', '--first-token-delay', '0', '--load-delay', '0')
+    with mock_ollama_server(*fast, '--drop-rate', '1', '--seed', '3', count=1) as (dropping,), \
+            mock_ollama_server(*fast, count=1) as (healthy,):
+        config = tmp_path / 'ollama_config.json'
+        config.write_text(json.dumps({
+            'ollama_instances': [
+                {'url': f'http://127.0.0.1:{dropping}', 'priority': 1, 'name': 'Dropping', 'description': 'test'},
+                {'url': f'http://127.0.0.1:{healthy}', 'priority': 2, 'name': 'Healthy', 'description': 'test'}
+            ],
+            'translation': {'backend': 'local', 'cache': {'path': None}},
+            'conversation_store': {'backend': 'memory'}
+        }))
+        (tmp_path / 'in.jsonl').write_text(json.dumps({'id': 1, 'message': 'Tell me a story', 'language': 'en'}))
+
+        run = subprocess.run([sys.executable, 'batch.py', str(tmp_path / 'in.jsonl'), str(tmp_path / 'out.jsonl'),
+                              '--concurrency', '1'],
+                             cwd=REPO, env={**os.environ, 'OLLAMA_CONFIG': str(config)},
+                             capture_output=True, text=True, timeout=60)
+
+    assert run.returncode == 0, run.stderr
+    result = json.loads((tmp_path / 'out.jsonl').read_text())
+    sys.path.insert(0, os.path.join(REPO, 'benchmarks'))
+    from mock_ollama import WORDS
+    # Every word once, in order: the healthy instance continued the partial reply instead of restarting
+    assert result['reply'].split() == [WORDS[index % len(WORDS)] for index in range(20)]
+    assert result['failed_over'] == [f'http://127.0.0.1:{dropping}']
+    assert result['instance'] == f'http://127.0.0.1:{healthy}'
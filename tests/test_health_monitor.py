@@ -0,0 +1,122 @@
+# test_health_monitor.py
+from health_monitor import CLOSED, HALF_OPEN, OPEN, UNKNOWN, CircuitBreaker, HealthMonitor
+
+
+def breaker():
+    return CircuitBreaker(failure_threshold=2, open_backoff=5, max_backoff=12)
+
+
+def test_first_failed_probe_opens_an_unknown_circuit():
+    circuit = breaker()
+    assert circuit.state == UNKNOWN
+    circuit.record_failure(now=100)
+    assert (circuit.state, circuit.retry_at) == (OPEN, 105)
+
+
+def test_closed_circuit_opens_after_the_failure_threshold():
+    circuit = breaker()
+    circuit.record_success()
+    circuit.record_failure(now=100)
+    assert circuit.state == CLOSED
+    circuit.record_failure(now=100)
+    assert (circuit.state, circuit.retry_at) == (OPEN, 105)
+
+
+def test_open_circuit_waits_then_half_opens_for_one_trial():
+    circuit = breaker()
+    circuit.trip(now=100)
+    assert circuit.state == OPEN
+    assert not circuit.should_probe(now=104)
+    assert circuit.should_probe(now=105)
+    assert circuit.state == HALF_OPEN
+
+    circuit.record_success()
+    assert (circuit.state, circuit.consecutive_failures, circuit.open_count) == (CLOSED, 0, 0)
+
+
+def test_failed_trials_back_off_exponentially_up_to_the_cap():
+    circuit = breaker()
+    circuit.trip(now=0)
+    waits = []
+    for _ in range(3):
+        assert circuit.should_probe(now=circuit.retry_at)
+        opened = circuit.retry_at
+        circuit.record_failure(now=opened)  # The half-open trial failed
+        assert circuit.state == OPEN
+        waits.append(circuit.retry_at - opened)
+    assert waits == [10, 12, 12]
+
+
+class Probe:
+    def __init__(self, healthy):
+        self.healthy = dict(healthy)
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return self.healthy[url]
+
+
+INSTANCES = [{'url': 'http://a'}, {'url': 'http://b'}]
+
+
+def monitor(probe, **settings):
+    return HealthMonitor(INSTANCES, probe, {'failure_threshold': 1, 'open_backoff': 60, **settings})
+
+
+def test_probe_rounds_update_the_snapshot_and_notify_listeners():
+    probe = Probe({'http://a': True, 'http://b': False})
+    health = monitor(probe)
+    changes = []
+    health.add_state_listener(lambda url, previous, state: changes.append((url, previous, state)))
+    # Not probed yet: routable, so startup does not wait for the first round
+    assert health.is_available('http://a') and health.is_available('http://b')
+
+    health.check_all()
+    assert health.snapshot['http://a']['state'] == CLOSED and health.snapshot['http://a']['healthy']
+    assert health.snapshot['http://b']['state'] == OPEN and health.snapshot['http://b']['retry_at']
+    assert sorted(changes) == [('http://a', UNKNOWN, CLOSED), ('http://b', UNKNOWN, OPEN)]
+    assert not health.is_available('http://b')
+
+    health.check_all()  # b's circuit is open: only a is probed again
+    assert probe.calls.count('http://b') == 1 and probe.calls.count('http://a') == 2
+
+
+def test_failures_seen_on_the_request_path_open_the_circuit():
+    health = monitor(Probe({'http://a': True, 'http://b': True}), failure_threshold=3)
+    health.check_all()
+    health.report_failure('http://a')
+    assert health.snapshot['http://a']['state'] == CLOSED  # Below the threshold
+    health.mark_down('http://a')
+    assert health.snapshot['http://a']['state'] == OPEN
+    health.report_success('http://b')
+    assert health.snapshot['http://b']['state'] == CLOSED
+
+
+def test_raising_probe_counts_as_a_failure():
+    def probe(url):
+        raise ConnectionError("refused")
+    health = monitor(probe)
+    health.check_all()
+    assert {entry['state'] for entry in health.snapshot.values()} == {OPEN}
+
+
+def test_instance_list_changes_keep_known_state():
+    health = monitor(Probe({'http://a': False, 'http://b': True}))
+    health.check_all()
+    health.set_instances([{'url': 'http://a'}, {'url': 'http://c'}])
+    assert health.snapshot['http://a']['state'] == OPEN
+    assert health.snapshot['http://c']['state'] == UNKNOWN
+    assert 'http://b' not in health.snapshot
+
+
+def test_applied_snapshot_is_adopted_without_notifying():
+    leader = monitor(Probe({'http://a': True, 'http://b': False}))
+    leader.check_all()
+    follower = monitor(Probe({}))
+    changes = []
+    follower.add_state_listener(lambda *change: changes.append(change))
+    follower.apply(leader.snapshot)
+    assert {url: entry['state'] for url, entry in follower.snapshot.items()} == {'http://a': CLOSED,
+                                                                                'http://b': OPEN}
+    assert changes == []
@@ -0,0 +1,63 @@
+# test_hedging.py
+import threading
+import time
+
+import pytest
+
+from hedging import HedgePolicy, race
+
+
+class FakeAdmission:
+    def __init__(self, url):
+        self.ticket = type('Ticket', (), {'instance': {'url': url}})()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def policy():
+    return HedgePolicy({'enabled': True, 'default_delay': 0.05, 'min_delay': 0.05, 'max_hedge_rate': 1.0})
+
+
+def test_losing_entrant_is_aborted_when_the_hedge_wins():
+    primary, hedge = FakeAdmission('slow'), FakeAdmission('fast')
+    unblocked = threading.Event()
+
+    def open_stream(admission, abort):
+        if admission is primary:
+            # Stands in for a request still waiting for its response headers
+            released = threading.Event()
+            abort.on_abort(released.set)
+            released.wait(10)
+            unblocked.set()
+            raise ConnectionError("aborted")
+        return 'stream'
+
+    reported = []
+    winner, stream, outcome = race(open_stream, lambda stream: None, primary, lambda: hedge, policy(), 'm',
+                                   lambda admission, error: reported.append(admission))
+    assert (winner, stream, outcome) == (hedge, 'stream', 'hedge_won')
+    # The loser's slot is given back and its call unblocked at once, not after its timeout
+    assert primary.cancelled.is_set()
+    assert unblocked.wait(1)
+    time.sleep(0.05)
+    assert reported == []  # Aborting a loser is not a failure of its instance
+
+
+def test_every_failed_entrant_is_reported():
+    primary, hedge = FakeAdmission('a'), FakeAdmission('b')
+
+    def open_stream(admission, abort):
+        if admission is primary:
+            time.sleep(0.1)
+            raise ConnectionError("primary down")
+        raise ConnectionError("hedge down")
+
+    reported = []
+    with pytest.raises(ConnectionError, match="primary down"):
+        race(open_stream, lambda stream: None, primary, lambda: hedge, policy(), 'm',
+             lambda admission, error: reported.append((admission, str(error))))
+    # The primary's error is raised for the caller to report; the hedge's is reported here
+    assert reported == [(hedge, "hedge down")]
+    assert primary.cancelled.is_set() and hedge.cancelled.is_set()
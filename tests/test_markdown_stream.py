@@ -0,0 +1,71 @@
+# test_markdown_stream.py
+import random
+
+import markdown2
+
+from markdown_stream import DEFAULT_MARKDOWN_CONFIG, IncrementalMarkdown
+
+DOCUMENT = """Here is an answer with **bold** and `code`.
+
+Second paragraph
+continues here.
+
+- item one
+- item two
+
+- item three after blank
+
+Some code:
+
+```python
+def f():
+
+    return 1
+```
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+<script>alert(1)</script>
+
+Final line without newline"""
+
+
+def stream(renderer, text, size):
+    """Feed 'text' in chunks of 'size' chars; returns the appended HTML and every tail sent."""
+    html, tails = [], []
+    for start in range(0, len(text), size):
+        block, tail = renderer.feed(text[start:start + size])
+        html.append(block)
+        if tail is not None:
+            tails.append(tail)
+    html.append(renderer.finish())
+    return ''.join(html), tails
+
+
+def normalized(html):
+    return ''.join(html.split())
+
+
+def test_blocks_match_a_full_render():
+    full = markdown2.Markdown(extras=DEFAULT_MARKDOWN_CONFIG['extras'], safe_mode='escape').convert(DOCUMENT)
+    rng = random.Random(0)
+    for _ in range(10):
+        html, _ = stream(IncrementalMarkdown(), DOCUMENT, rng.randint(1, 12))
+        assert normalized(html) == normalized(full)
+    assert '&lt;script&gt;' in html
+
+
+def test_long_block_is_not_rendered_per_token():
+    # One 20k-char paragraph and one long fenced code block, streamed 4 chars at a time
+    for text in (' '.join(['word'] * 4000), '```\n' + 'x = 1\n' * 3000):
+        renderer = IncrementalMarkdown({'tail_interval_ms': 10 ** 6})
+        renders = []
+        convert = renderer._markdown.convert
+        renderer._markdown.convert = lambda source: renders.append(source) or convert(source)
+        _, tails = stream(renderer, text, 4)
+        tokens = len(text) // 4
+        assert len(renders) < 60 < tokens
+        # Bytes of tail HTML sent stay a small multiple of the block itself, not tokens x block
+        assert sum(len(tail) for tail in tails) < 10 * len(text)
@@ -0,0 +1,190 @@
+# test_response_cache.py
+import asyncio
+import threading
+import time
+
+from response_cache import ResponseCache
+
+MESSAGES = [{'role': 'user', 'content': 'Hello  there'}]
+
+
+def cache(**settings):
+    return ResponseCache({'enabled': True, **settings})
+
+
+def test_only_deterministic_requests_get_a_key():
+    assert ResponseCache().key('m', MESSAGES, {'temperature': 0}) is None  # Disabled by default
+    assert cache().key('m', MESSAGES, None) is None
+    assert cache().key('m', MESSAGES, {'temperature': 0.7}) is None
+    assert cache().key('m', MESSAGES, {'temperature': 0}) is not None
+    assert cache().key('m', MESSAGES, {'seed': 42, 'temperature': 0.7}) is not None
+    assert cache(cache_sampled=True).key('m', MESSAGES, None) is not None
+
+
+def test_key_normalizes_whitespace_and_case_but_not_options_or_model():
+    responses = cache()
+    key = responses.key('m', MESSAGES, {'temperature': 0})
+    assert responses.key('m', [{'role': 'user', 'content': ' hello there '}], {'temperature': 0}) == key
+    assert responses.key('m', MESSAGES, {'temperature': 0, 'seed': 1}) != key
+    assert responses.key('other', MESSAGES, {'temperature': 0}) != key
+    sensitive = cache(case_sensitive=True)
+    assert (sensitive.key('m', [{'role': 'user', 'content': 'Hi'}], {'temperature': 0})
+            != sensitive.key('m', [{'role': 'user', 'content': 'hi'}], {'temperature': 0}))
+
+
+class Upstream:
+    """A producer that streams its chunks only once released, counting how often it was started."""
+
+    def __init__(self, chunks, error=None, delay=0.0):
+        self.chunks = chunks
+        self.error = error
+        self.delay = delay
+        self.started = 0
+        self.closed = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started += 1
+        return self._events()
+
+    def _events(self):
+        try:
+            self.release.wait(5)
+            for chunk in self.chunks:
+                time.sleep(self.delay)
+                yield 'chunk', chunk
+            if self.error:
+                raise self.error
+        finally:
+            self.closed.set()
+
+
+def collect(events, into):
+    try:
+        into.extend(content for _, content in events)
+    except Exception as e:
+        into.append(e)
+
+
+def test_identical_requests_share_one_upstream_stream_and_then_hit_the_cache():
+    responses = cache()
+    upstream = Upstream(['Hi', ' there'])
+    key = responses.key('m', MESSAGES, {'temperature': 0})
+
+    sources, results, threads = [], [], []
+    for _ in range(3):
+        source, events = responses.stream(key, upstream)
+        sources.append(source)
+        results.append([])
+        threads.append(threading.Thread(target=collect, args=(events, results[-1])))
+    for thread in threads:
+        thread.start()
+    upstream.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sources == ['ollama', 'coalesced', 'coalesced']
+    assert upstream.started == 1
+    assert results == [['Hi', ' there']] * 3
+
+    source, events = responses.stream(key, upstream)
+    assert (source, list(events)) == ('cache', [('chunk', 'Hi'), ('chunk', ' there')])
+    assert upstream.started == 1
+    assert responses.stats()['hits'] == 1 and responses.stats()['coalesced'] == 2
+
+
+def test_an_upstream_error_reaches_every_follower_and_is_not_cached():
+    responses = cache()
+    upstream = Upstream(['Hi'], error=ConnectionError("instance died"))
+    key = responses.key('m', MESSAGES, {'temperature': 0})
+
+    results = [[], []]
+    threads = [threading.Thread(target=collect, args=(responses.stream(key, upstream)[1], result))
+               for result in results]
+    for thread in threads:
+        thread.start()
+    upstream.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    for result in results:
+        assert result[0] == 'Hi' and isinstance(result[1], ConnectionError)
+    assert responses.get(key) is None
+
+
+def test_upstream_stops_once_every_follower_is_gone():
+    responses = cache()
+    upstream = Upstream(['a'] * 1000, delay=0.01)
+    key = responses.key('m', MESSAGES, {'temperature': 0})
+    _, events = responses.stream(key, upstream)
+    upstream.release.set()
+    next(events)
+    events.close()  # The only client disconnected
+
+    assert upstream.closed.wait(1)  # Long before the reply would have ended
+    time.sleep(0.05)
+    assert responses.get(key) is None  # A cut-off reply is never cached
+
+
+def test_async_followers_share_one_upstream_stream():
+    responses = cache()
+    key = responses.key('m', MESSAGES, {'temperature': 0})
+    started = []
+
+    async def produce():
+        started.append(True)
+        await asyncio.sleep(0.05)
+        for chunk in ('Hi', ' there'):
+            yield 'chunk', chunk
+
+    async def run():
+        streams = [responses.astream(key, produce) for _ in range(2)]
+
+        async def read(events):
+            return [content async for _, content in events]
+        replies = await asyncio.gather(*(read(events) for _, events in streams))
+        return [source for source, _ in streams], replies
+
+    sources, replies = asyncio.run(run())
+    assert sources == ['ollama', 'coalesced']
+    assert replies == [['Hi', ' there']] * 2
+    assert started == [True]
+    assert responses.get(key) == ['Hi', ' there']
+
+
+def test_entries_are_evicted_least_recently_used_first():
+    responses = cache(max_entries=2, max_reply_chars=10)
+    responses.put('a', ['aa'])
+    responses.put('b', ['bb'])
+    responses.get('a')
+    responses.put('c', ['cc'])
+    assert responses.get('b') is None  # Least recently used
+    assert responses.get('a') == ['aa'] and responses.get('c') == ['cc']
+
+    responses.put('long', ['x' * 11])
+    assert responses.get('long') is None  # Streamed, but too long to keep
+
+
+def test_entries_expire_after_the_ttl():
+    responses = cache(ttl=0.05)
+    responses.put('a', ['aa'])
+    assert responses.get('a') == ['aa']
+    time.sleep(0.1)
+    assert responses.get('a') is None
+    assert responses.stats()['evicted'] == 1
+
+
+def test_memory_cap_evicts_old_entries():
+    responses = cache(max_memory_mb=10 / (1024 * 1024))  # 10 characters
+    responses.put('a', ['x' * 6])
+    responses.put('b', ['y' * 6])
+    assert responses.get('a') is None
+    assert responses.get('b') == ['y' * 6]
+    assert responses.stats()['memory_bytes'] == 6
+
+
+def test_requests_without_a_key_go_straight_upstream():
+    upstream = Upstream(['Hi'])
+    upstream.release.set()
+    source, events = cache().stream(None, upstream)
+    assert (source, list(events)) == ('ollama', [('chunk', 'Hi')])
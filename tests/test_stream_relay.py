@@ -0,0 +1,76 @@
+# test_stream_relay.py
+import asyncio
+import threading
+import time
+
+from stream_relay import DEFAULT_STREAM_RELAY_CONFIG, ChunkBatcher, abatched, batched, flush_window
+
+
+def test_flush_window_rejects_non_finite_values():
+    default = DEFAULT_STREAM_RELAY_CONFIG['flush_ms']
+    for requested in ('nan', float('nan'), 'inf', '-inf'):
+        assert flush_window(requested) == default
+    assert flush_window('-5') == 0.0
+    assert flush_window('1e9') == DEFAULT_STREAM_RELAY_CONFIG['max_flush_ms']
+
+
+def stalled_events(stall, closed):
+    try:
+        yield 'queue_position', 1
+        yield 'chunk', 'a'
+        yield 'chunk', 'b'
+        time.sleep(stall)  # The model pauses mid-reply
+        yield 'chunk', 'c'
+    finally:
+        closed.set()
+
+
+async def astalled_events(stall, closed):
+    try:
+        yield 'queue_position', 1
+        yield 'chunk', 'a'
+        yield 'chunk', 'b'
+        await asyncio.sleep(stall)
+        yield 'chunk', 'c'
+    finally:
+        closed.set()
+
+
+def test_pending_tokens_are_flushed_while_the_stream_stalls():
+    closed = threading.Event()
+    started = time.perf_counter()
+    received = [(event, time.perf_counter() - started)
+                for event in batched(stalled_events(1.0, closed), ChunkBatcher(50, 256))]
+
+    assert [event for event, _ in received] == [('queue_position', 1), ('chunk', 'ab'), ('chunk', 'c')]
+    assert received[1][1] < 0.5  # Sent within the window, not after the stall
+    assert received[2][1] >= 1.0
+    assert closed.is_set()
+
+
+def test_async_pending_tokens_are_flushed_while_the_stream_stalls():
+    async def consume():
+        closed = asyncio.Event()
+        started = time.perf_counter()
+        received = [(event, time.perf_counter() - started)
+                    async for event in abatched(astalled_events(1.0, closed), ChunkBatcher(50, 256))]
+        return received, closed.is_set()
+
+    received, closed = asyncio.run(consume())
+    assert [event for event, _ in received] == [('queue_position', 1), ('chunk', 'ab'), ('chunk', 'c')]
+    assert received[1][1] < 0.5
+    assert received[2][1] >= 1.0
+    assert closed
+
+
+def test_closing_during_a_stall_closes_the_upstream():
+    async def consume():
+        closed = asyncio.Event()
+        events = abatched(astalled_events(10, closed), ChunkBatcher(50, 256))
+        async for kind, content in events:
+            if kind == 'chunk':
+                break  # Client went away
+        await events.aclose()
+        return closed.is_set()
+
+    assert asyncio.run(asyncio.wait_for(consume(), 2))
@@ -0,0 +1,14 @@
+# test_translator.py
+from concurrent.futures import ThreadPoolExecutor
+
+from translator import LocalTranslationBackend
+
+ENGLISH = "The quick brown fox jumps over the lazy dog and keeps running through the field."
+
+
+def test_concurrent_detection_is_consistent():
+    # Fresh backend, so the threads race the first detection that loads the language profiles
+    backend = LocalTranslationBackend()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: backend.detect(ENGLISH), range(300)))
+    assert set(results) == {'en'}
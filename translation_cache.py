@@ -0,0 +1,182 @@
+# translation_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSLATION_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 5000,            # In-process LRU size
+    "max_text_chars": 4000,         # Longer texts are translated but not cached
+    "path": "translations.db",      # SQLite file shared by all workers; null keeps the cache in memory only
+    "max_disk_entries": 200000,     # Least recently used rows beyond this are purged
+    "purge_interval": 300           # Seconds between disk purges
+}
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form of a text: Unicode NFC without surrounding whitespace."""
+    return unicodedata.normalize('NFC', text.strip())
+
+
+class TranslationCache:
+    """Two-level cache of translations: an in-process LRU in front of SQLite.
+
+    Entries are keyed by (normalized text, src, dest, backend). Language
+    detection results are stored with empty src and dest.
+    """
+
+    def __init__(self, max_entries: int, max_text_chars: int, path: Optional[str],
+                 max_disk_entries: int, purge_interval: float):
+        self.max_entries = max_entries
+        self.max_text_chars = max_text_chars
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Tuple[str, str]]' = OrderedDict()
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            db = self._db()
+            db.execute("""CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                src TEXT,
+                used REAL NOT NULL
+            )""")
+            db.execute("CREATE INDEX IF NOT EXISTS translations_used ON translations(used)")
+            db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _disk_key(key: Tuple) -> str:
+        return hashlib.sha1('\x1f'.join(key).encode('utf-8')).hexdigest()
+
+    def _remember(self, key: Tuple, value: Tuple[str, str]):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, text: str, src: str, dest: str, backend: str) -> Optional[Tuple[str, str]]:
+        """Return (translation, src) or None."""
+        text = normalize_text(text)
+        if len(text) > self.max_text_chars:
+            return None
+        key = (text, src or '', dest or '', backend)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        if self.path:
+            try:
+                db = self._db()
+                disk_key = self._disk_key(key)
+                row = db.execute("SELECT translation, src FROM translations WHERE key = ?",
+                                 (disk_key,)).fetchone()
+                if row is not None:
+                    with db:
+                        db.execute("UPDATE translations SET used = ? WHERE key = ?", (time.time(), disk_key))
+                    value = (row[0], row[1])
+                    self._remember(key, value)
+                    with self._lock:
+                        self.disk_hits += 1
+                    return value
+            except sqlite3.Error as e:
+                logger.warning(f"Translation cache read failed: {str(e)}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, src: str, dest: str, backend: str, translation: str, detected_src: str = ''):
+        text = normalize_text(text)
+        if len(text) > self.max_text_chars:
+            return
+        key = (text, src or '', dest or '', backend)
+        self._remember(key, (translation, detected_src))
+        if not self.path:
+            return
+
+        now = time.time()
+        try:
+            db = self._db()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO translations (key, translation, src, used) VALUES (?, ?, ?, ?)",
+                    (self._disk_key(key), translation, detected_src, now)
+                )
+            if now - self._last_purge > self.purge_interval:
+                self._last_purge = now
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache write failed: {str(e)}")
+
+    def purge(self):
+        """Drop the least recently used rows beyond max_disk_entries."""
+        db = self._db()
+        with db:
+            removed = db.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            ).rowcount
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            logger.info(f"Purged {removed} cached translations")
+
+    def stats(self) -> Dict:
+        disk_entries = None
+        if self.path:
+            try:
+                disk_entries = self._db().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'memory_entries': len(self._entries),
+                'disk_entries': disk_entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+def create_translation_cache(settings: Optional[Dict] = None) -> Optional[TranslationCache]:
+    """Build the configured translation cache, or None if caching is disabled."""
+    settings = {**DEFAULT_TRANSLATION_CACHE_CONFIG, **(settings or {})}
+    if not settings['enabled']:
+        return None
+    return TranslationCache(settings['max_entries'], settings['max_text_chars'], settings['path'],
+                            settings['max_disk_entries'], settings['purge_interval'])
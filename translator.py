@@ -1,25 +1,288 @@
-from googletrans import Translator
 import logging
-from typing import Tuple
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
 from time import sleep
-from functools import lru_cache
+
+from startup import startup
+from translation_cache import create_translation_cache
 
 logger = logging.getLogger(__name__)
 
-class TranslationService:
+DEFAULT_TRANSLATION_CONFIG = {
+    "backend": "google",  # google | local
+    "local": {
+        "model_template": "Helsinki-NLP/opus-mt-{src}-{dest}",
+        "local_files_only": True,   # Never reach out to the network for weights
+        "num_threads": 2,           # torch intra-op threads
+        "max_loaded_models": 4,     # Language pairs kept in memory
+        "max_batch_size": 8,
+        "batch_wait_ms": 10,        # How long to wait for more requests to batch with
+        "max_length": 512,
+        "num_beams": 1
+    }
+}
+
+
+def _normalize_language(lang: str) -> str:
+    if lang.startswith('sv'):
+        return 'sv'
+    return 'en' if lang == 'en' else lang
+
+
+class TranslationBackend:
+    """Interface for translation engines used by TranslationService."""
+    name = 'base'
+    retryable = True  # Whether failures are worth retrying (network hiccups)
+
+    def translate(self, text: str, dest: str, src: Optional[str] = None) -> Tuple[str, str]:
+        """Return (translated_text, source_language)."""
+        raise NotImplementedError
+
+    def detect(self, text: str) -> str:
+        raise NotImplementedError
+
+    def reset(self):
+        """Recreate any client state after a failure."""
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    """Remote Google Translate via googletrans."""
+    name = 'google'
+
     def __init__(self):
-        """Initialize the translation service with retries."""
-        self.translator = None
+        from googletrans import Translator
+        self._translator_class = Translator
+        self.translator = Translator()
+
+    def reset(self):
+        self.translator = self._translator_class()
+
+    def translate(self, text: str, dest: str, src: Optional[str] = None) -> Tuple[str, str]:
+        translation = self.translator.translate(
+            text,
+            dest=dest,
+            src=src if src else 'auto'
+        )
+        return translation.text, translation.src
+
+    def detect(self, text: str) -> str:
+        return self.translator.detect(text).lang
+
+
+class _PairWorker:
+    """Batches concurrent requests for one language pair through a single model."""
+
+    def __init__(self, backend: 'LocalTranslationBackend', src: str, dest: str):
+        self.backend = backend
+        self.src = src
+        self.dest = dest
+        self.requests: 'queue.Queue[Optional[Tuple[str, Future]]]' = queue.Queue()
+        self.model = None
+        self.tokenizer = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.thread = threading.Thread(target=self._run, name=f'translate-{src}-{dest}', daemon=True)
+        self.thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception(RuntimeError(f"Translation model {self.src}->{self.dest} was unloaded"))
+            else:
+                self.requests.put((text, future))
+        return future
+
+    def stop(self):
+        """Finish queued requests, then release the model."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.requests.put(None)
+
+    def _load(self):
+        name = self.backend.model_template.format(src=self.src, dest=self.dest)
+        logger.info(f"Loading local translation model {name}")
+        from transformers import MarianMTModel, MarianTokenizer
+        self.tokenizer = MarianTokenizer.from_pretrained(name, local_files_only=self.backend.local_files_only)
+        self.model = MarianMTModel.from_pretrained(name, local_files_only=self.backend.local_files_only)
+        self.model.eval()
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as e:
+            logger.error(f"Could not load translation model {self.src}->{self.dest}: {str(e)}")
+            self.backend._discard(self)
+            self.stop()
+            for request in iter(self.requests.get, None):
+                request[1].set_exception(e)
+            return
+
+        wait = self.backend.batch_wait_ms / 1000
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            try:
+                while len(batch) < self.backend.max_batch_size:
+                    request = self.requests.get(timeout=wait)
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+            except queue.Empty:
+                pass
+            try:
+                results = self._translate_batch([text for text, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+        self.model = self.tokenizer = None
+
+    def _translate_batch(self, texts: List[str]) -> List[str]:
+        import torch
+        with torch.inference_mode():
+            inputs = self.tokenizer(texts, return_tensors='pt', padding=True,
+                                    truncation=True, max_length=self.backend.max_length)
+            outputs = self.model.generate(**inputs, max_new_tokens=self.backend.max_length,
+                                          num_beams=self.backend.num_beams)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class LocalTranslationBackend(TranslationBackend):
+    """Offline translation on the CPU with MarianMT models and langdetect.
+
+    Models load lazily, one per language pair, and the least recently used
+    pair is unloaded beyond max_loaded_models. Requests for the same pair
+    arriving within batch_wait_ms are translated as one batch.
+    """
+    name = 'local'
+    retryable = False
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = {**DEFAULT_TRANSLATION_CONFIG['local'], **(settings or {})}
+        self.model_template = settings['model_template']
+        self.local_files_only = settings['local_files_only']
+        self.num_threads = settings['num_threads']
+        self.max_loaded_models = settings['max_loaded_models']
+        self.max_batch_size = settings['max_batch_size']
+        self.batch_wait_ms = settings['batch_wait_ms']
+        self.max_length = settings['max_length']
+        self.num_beams = settings['num_beams']
+        self._lock = threading.Lock()
+        self._workers: 'OrderedDict[Tuple[str, str], _PairWorker]' = OrderedDict()
+        self._torch_configured = False
+        self._detector_lock = threading.Lock()
+        self._detectors = None
+
+    def _configure_torch(self):
+        if not self._torch_configured:
+            import torch
+            torch.set_num_threads(self.num_threads)
+            self._torch_configured = True
+
+    def _worker(self, src: str, dest: str) -> _PairWorker:
+        with self._lock:
+            worker = self._workers.get((src, dest))
+            if worker is None:
+                self._configure_torch()
+                worker = self._workers[(src, dest)] = _PairWorker(self, src, dest)
+                while len(self._workers) > self.max_loaded_models:
+                    (old_src, old_dest), old_worker = self._workers.popitem(last=False)
+                    logger.info(f"Unloading translation model {old_src}->{old_dest}")
+                    old_worker.stop()
+            self._workers.move_to_end((src, dest))
+            return worker
+
+    def _discard(self, worker: _PairWorker):
+        with self._lock:
+            if self._workers.get((worker.src, worker.dest)) is worker:
+                del self._workers[(worker.src, worker.dest)]
+
+    def translate(self, text: str, dest: str, src: Optional[str] = None) -> Tuple[str, str]:
+        src = src or self.detect(text)
+        if src == dest:
+            return text, src
+        return self._worker(src, dest).submit(text).result(), src
+
+    def _detector_factory(self):
+        # langdetect's module-level detect() loads its shared factory without a lock, so threads
+        # racing the first call can see half-loaded profiles; load our own exactly once instead
+        with self._detector_lock:
+            if self._detectors is None:
+                from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+                factory = DetectorFactory()
+                factory.seed = 0  # Deterministic detection
+                factory.load_profile(PROFILES_DIRECTORY)
+                self._detectors = factory
+            return self._detectors
+
+    def detect(self, text: str) -> str:
+        # Each detector has its own seeded random generator, so detection itself needs no lock
+        detector = self._detector_factory().create()
+        detector.append(text)
+        return detector.detect()
+
+
+def create_translation_backend(settings: Optional[Dict] = None) -> TranslationBackend:
+    settings = {**DEFAULT_TRANSLATION_CONFIG, **(settings or {})}
+    if settings['backend'] == 'local':
+        return LocalTranslationBackend(settings.get('local'))
+    if settings['backend'] == 'google':
+        return GoogleTranslateBackend()
+    raise ValueError(f"Unknown translation backend: {settings['backend']}")
+
+
+class TranslationService:
+    def __init__(self, settings: Optional[Dict] = None, lazy: bool = False):
+        """Initialize the translation service with retries.
+
+        With 'lazy', the backend (and the packages it imports) is created on
+        first use instead, so constructing the service costs nothing.
+        """
+        self.settings = settings or {}
+        self.backend_name = {**DEFAULT_TRANSLATION_CONFIG, **self.settings}['backend']
+        self._backend: Optional[TranslationBackend] = None
+        self._init_lock = threading.Lock()
         self.retry_count = 3
         self.retry_delay = 1  # seconds
-        self._initialize_translator()
+        self.cache = create_translation_cache(self.settings.get('cache'))
+        if not lazy:
+            self._initialize_translator()
+
+    @property
+    def backend(self) -> TranslationBackend:
+        if self._backend is None:
+            with self._init_lock:
+                if self._backend is None:
+                    with startup.phase('translator', deferred=True):
+                        self._initialize_translator()
+        return self._backend
+
+    def warm(self):
+        """Create the backend now if it was deferred; errors are logged, not raised."""
+        try:
+            self.backend
+        except Exception as e:
+            logger.error(f"Could not initialize the translator: {str(e)}")
 
     def _initialize_translator(self):
         """Initialize translator with retry mechanism."""
         for attempt in range(self.retry_count):
             try:
-                self.translator = Translator()
-                logger.info("Translation service initialized successfully")
+                if self._backend:
+                    self._backend.reset()
+                else:
+                    self._backend = create_translation_backend(self.settings)
+                logger.info(f"Translation service initialized successfully ({self._backend.name} backend)")
                 return
             except Exception as e:
                 logger.warning(f"Attempt {attempt + 1} failed to initialize translator: {str(e)}")
@@ -31,48 +294,46 @@ class TranslationService:
 
     def _translate_with_retry(self, text: str, dest: str, src: str = None) -> Tuple[str, str]:
         """Perform translation with retry mechanism."""
+        if self.cache:
+            cached = self.cache.get(text, src, dest, self.backend_name)
+            if cached:
+                return cached
+
         last_error = None
-        
-        for attempt in range(self.retry_count):
+        attempts = self.retry_count if self.backend.retryable else 1
+
+        for attempt in range(attempts):
             try:
-                if not self.translator:
-                    self._initialize_translator()
-                
-                translation = self.translator.translate(
-                    text, 
-                    dest=dest,
-                    src=src if src else 'auto'
-                )
-                
-                return translation.text, translation.src
-                
+                translated_text, detected_lang = self.backend.translate(text, dest, src)
+                if self.cache:
+                    self.cache.put(text, src, dest, self.backend_name, translated_text, detected_lang)
+                return translated_text, detected_lang
+
             except Exception as e:
                 last_error = e
                 logger.warning(f"Translation attempt {attempt + 1} failed: {str(e)}")
-                
-                if attempt < self.retry_count - 1:
+
+                if attempt < attempts - 1:
                     sleep(self.retry_delay)
                     # Reinitialize translator for next attempt
                     self._initialize_translator()
-        
-        logger.error(f"Translation failed after {self.retry_count} attempts")
+
+        logger.error(f"Translation failed after {attempts} attempts")
         return text, 'en'  # Return original text if all attempts fail
 
-    @lru_cache(maxsize=100)
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text with caching."""
         try:
-            if not self.translator:
-                self._initialize_translator()
-            
-            detection = self.translator.detect(text)
-            detected_lang = detection.lang
-            
-            # Normalize language codes
-            if detected_lang.startswith('sv'):
-                return 'sv'
-            return 'en' if detected_lang == 'en' else detected_lang
-            
+            # Detections share the translation cache, keyed with empty src and dest
+            if self.cache:
+                cached = self.cache.get(text, '', '', self.backend_name)
+                if cached:
+                    return cached[0]
+            detected_lang = _normalize_language(self.backend.detect(text))
+            if self.cache:
+                self.cache.put(text, '', '', self.backend_name, detected_lang)
+            return detected_lang
+
         except Exception as e:
             logger.error(f"Language detection error: {str(e)}")
             return 'en'
@@ -85,17 +346,20 @@ class TranslationService:
         try:
             if not source_lang:
                 source_lang = self.detect_language(text)
-            
+
             if source_lang == 'en':
                 return text, source_lang
-            
+
             translated_text, detected_lang = self._translate_with_retry(text, 'en', source_lang)
             return translated_text, detected_lang
-            
+
         except Exception as e:
             logger.error(f"Translation to English error: {str(e)}")
             return text, 'en'
 
+    def cache_stats(self) -> Optional[Dict]:
+        return self.cache.stats() if self.cache else None
+
     def translate_from_english(self, text: str, dest_lang: str) -> str:
         """Translate text from English to target language."""
         if not text.strip() or dest_lang == 'en':
@@ -104,7 +368,7 @@ class TranslationService:
         try:
             translated_text, _ = self._translate_with_retry(text, dest_lang, 'en')
             return translated_text
-            
+
         except Exception as e:
             logger.error(f"Translation from English error: {str(e)}")
-            return text
\ No newline at end of file
+            return text
@@ -0,0 +1,254 @@
+# warmup.py
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Union
+
+import requests
+
+from connection_pool import ConnectionPoolManager
+from model_inventory import ModelInventory, normalize_model_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_CONFIG = {
+    "enabled": True,
+    "preload": [],               # Models loaded on every instance that has them, at startup and after recovery
+    "pull_missing": False,       # Pull preload models that an instance does not have yet
+    "default_model": "llama2",   # Pulled in the background when no instance has any model
+    "keep_alive": {},            # Fixed keep_alive per model, e.g. {"llama3:8b": -1} (never unload)
+    "idle_keep_alive": 300,      # Seconds a lightly used model stays loaded after its last request
+    "busy_keep_alive": 3600,     # Seconds for a model with at least busy_requests in traffic_window
+    "busy_requests": 10,
+    "traffic_window": 600,       # Seconds of chat traffic considered per model
+    "max_parallel_pulls": 2,
+    "pull_history": 50           # Finished pull jobs kept for /api/pulls
+}
+
+KeepAlive = Union[int, str]
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class PullJob:
+    """A background /api/pull of one model on one instance."""
+
+    def __init__(self, url: str, model: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.model = model
+        self.status = QUEUED
+        self.detail = ''
+        self.total = 0
+        self.completed = 0
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def update(self, progress: Dict):
+        """Apply one line of Ollama's pull progress stream."""
+        self.detail = progress.get('status', self.detail)
+        if progress.get('total'):
+            self.total = progress['total']
+            self.completed = progress.get('completed', 0)
+
+    def as_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'instance': self.url,
+            'model': self.model,
+            'status': self.status,
+            'detail': self.detail,
+            'completed': self.completed,
+            'total': self.total,
+            'percent': round(self.completed / self.total * 100, 1) if self.total else None,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+
+class WarmupManager:
+    """Keeps models resident on the instances so users do not pay cold loads.
+
+    Preload models are loaded on an instance whenever its circuit closes,
+    which covers both startup and recovery. Every chat carries a keep_alive
+    chosen from the model's recent traffic, and model pulls run as tracked
+    background jobs instead of inside a request.
+    """
+
+    def __init__(self, pools: ConnectionPoolManager, inventory: ModelInventory,
+                 refresh: Callable[[str], bool], settings: Optional[Dict] = None):
+        settings = {**DEFAULT_WARMUP_CONFIG, **(settings or {})}
+        self.enabled = settings['enabled']
+        self.preload = settings['preload']
+        self._preload_names = {normalize_model_name(name) for name in self.preload}
+        self.pull_missing = settings['pull_missing']
+        self.default_model = settings['default_model']
+        self.fixed_keep_alive = {normalize_model_name(name): value for name, value in settings['keep_alive'].items()}
+        self.idle_keep_alive = settings['idle_keep_alive']
+        self.busy_keep_alive = settings['busy_keep_alive']
+        self.busy_requests = settings['busy_requests']
+        self.traffic_window = settings['traffic_window']
+        self.pull_history = settings['pull_history']
+        self.pools = pools
+        self.inventory = inventory
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._traffic: Dict[str, Deque[float]] = {}
+        self._jobs: 'OrderedDict[str, PullJob]' = OrderedDict()
+        self._pulls = ThreadPoolExecutor(max_workers=settings['max_parallel_pulls'], thread_name_prefix='pull')
+        self._loads = ThreadPoolExecutor(max_workers=2, thread_name_prefix='warmup')
+        self.counts = {'preloads': 0, 'preload_failures': 0}
+
+    def on_circuit_change(self, url: str, previous: str, state: str):
+        """Health monitor listener: warm an instance up when it becomes healthy."""
+        if self.enabled and state == 'closed' and previous != 'closed':
+            self._loads.submit(self.preload_instance, url)
+
+    def preload_instance(self, url: str):
+        """Load the preload models on an instance, pulling missing ones if configured."""
+        for model in self.preload:
+            if self.inventory.has_model(url, model) is False:
+                if self.pull_missing:
+                    self.pull(model, url)
+                else:
+                    logger.warning(f"Preload model {model} is not installed on {url}")
+                continue
+            if not self.inventory.is_loaded(url, model):
+                self.load(url, model)
+
+    def load(self, url: str, model: str) -> bool:
+        """Load a model into memory with an empty chat, which Ollama answers once it is resident."""
+        started = time.perf_counter()
+        try:
+            response = self.pools.post(url, '/api/chat', json={
+                "model": model,
+                "messages": [],
+                "stream": False,
+                "keep_alive": self.keep_alive(model)
+            })
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                self.counts['preload_failures'] += 1
+            logger.error(f"Could not preload {model} on {url}: {str(e)}")
+            return False
+        with self._lock:
+            self.counts['preloads'] += 1
+        self.inventory.mark_loaded(url, model)
+        logger.info(f"Preloaded {model} on {url} in {time.perf_counter() - started:.1f}s")
+        return True
+
+    def record_use(self, model: str):
+        now = time.time()
+        with self._lock:
+            history = self._traffic.setdefault(normalize_model_name(model), deque())
+            history.append(now)
+            while history and now - history[0] > self.traffic_window:
+                history.popleft()
+
+    def _recent_requests(self, model: str) -> int:
+        now = time.time()
+        with self._lock:
+            history = self._traffic.get(normalize_model_name(model), ())
+            return sum(1 for stamp in history if now - stamp <= self.traffic_window)
+
+    def keep_alive(self, model: str) -> KeepAlive:
+        """keep_alive to send with a request: fixed per model, else longer for busy models."""
+        fixed = self.fixed_keep_alive.get(normalize_model_name(model))
+        if fixed is not None:
+            return fixed
+        if self._recent_requests(model) >= self.busy_requests:
+            return self.busy_keep_alive
+        return self.idle_keep_alive
+
+    def pull(self, model: str, url: str) -> PullJob:
+        """Start a background pull, or return the one already running for this model and instance."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.url == url and job.model == model:
+                    return job
+            job = PullJob(url, model)
+            self._jobs[job.id] = job
+            finished = [key for key, old in self._jobs.items() if not old.active]
+            for key in finished[:max(len(finished) - self.pull_history, 0)]:
+                del self._jobs[key]
+        self._pulls.submit(self._run_pull, job)
+        logger.info(f"Queued pull of {model} on {url} (job {job.id})")
+        return job
+
+    def pull_default(self, url: str) -> Optional[PullJob]:
+        """Pull the default model when an instance has none; never blocks the caller."""
+        if not self.enabled or not self.default_model:
+            return None
+        return self.pull(self.default_model, url)
+
+    def _run_pull(self, job: PullJob):
+        job.status = RUNNING
+        try:
+            response = self.pools.post(job.url, '/api/pull', kind='pull',
+                                       json={"model": job.model, "stream": True}, stream=True)
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    progress = json.loads(line.decode('utf-8'))
+                    if 'error' in progress:
+                        raise Exception(progress['error'])
+                    job.update(progress)
+            finally:
+                response.close()
+            job.status = DONE
+            logger.info(f"Pulled {job.model} on {job.url}")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"Pull of {job.model} on {job.url} failed: {str(e)}")
+        finally:
+            job.finished = time.time()
+        if job.status == DONE:
+            try:
+                self.refresh(job.url)
+            except Exception as e:
+                logger.error(f"Could not refresh models on {job.url}: {str(e)}")
+            if normalize_model_name(job.model) in self._preload_names:
+                self.load(job.url, job.model)
+
+    def active_pulls(self) -> List[PullJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.active]
+
+    def job(self, job_id: str) -> Optional[PullJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Dict]:
+        """Pull jobs, newest first."""
+        with self._lock:
+            return [job.as_dict() for job in reversed(self._jobs.values())]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models = list(self._traffic)
+            counts = dict(self.counts)
+        return {
+            'enabled': self.enabled,
+            'preload': self.preload,
+            'keep_alive': {model: self.keep_alive(model) for model in models},
+            'recent_requests': {model: self._recent_requests(model) for model in models},
+            'active_pulls': len(self.active_pulls()),
+            **counts
+        }